@@ -4,9 +4,10 @@ Chạy: python add_more_products.py
 """
 
 from datetime import datetime, timedelta
-from app.database import (
-    db, categories_collection, products_collection, get_next_sequence
-)
+from app.database import sync_db as db, get_next_sequence_sync as get_next_sequence
+
+categories_collection = db["categories"]
+products_collection = db["products"]
 import random
 
 def get_categories():
@@ -219,6 +220,7 @@ def create_additional_products():
                         "review_count": random.randint(0, 200),
                         "sold_count": random.randint(0, 1000),
                         "view_count": random.randint(100, 10000),
+                        "approval_status": "approved",
                         "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 90)),
                         "updated_at": datetime.utcnow()
                     }
@@ -4,7 +4,10 @@ Chạy: python add_products.py
 """
 
 from datetime import datetime, timedelta
-from app.database import products_collection, categories_collection, get_next_sequence
+from app.database import sync_db, get_next_sequence_sync as get_next_sequence
+
+products_collection = sync_db["products"]
+categories_collection = sync_db["categories"]
 import random
 
 def add_more_products():
@@ -156,6 +159,7 @@ def add_more_products():
             "review_count": random.randint(5, 150),
             "sold_count": random.randint(10, 500),
             "view_count": random.randint(100, 5000),
+            "approval_status": "approved",
             "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 30)),
             "updated_at": datetime.utcnow()
         }
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Body, UploadFile, File
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
-import os
 
 # Múi giờ Việt Nam (UTC+7)
 VIETNAM_TZ = timezone(timedelta(hours=7))
@@ -20,6 +19,13 @@ from .database import (
     get_next_sequence, log_activity, create_notification_safe
 )
 from .auth import get_current_admin
+from .products import invalidate_category_counts
+from .cache import invalidate_product, get_cache_stats, invalidate_user
+from .jobs import get_job_queue_stats, submit_job
+from .password_pool import get_password_pool_stats
+from .uploads import save_upload
+from .images import attach_renditions, generate_renditions
+from .rollups import get_rollup_summary
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
@@ -39,42 +45,25 @@ async def upload_image(
             detail="File must be an image"
         )
     
-    # Validate file size (max 5MB)
-    if file.size > 5 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB"
-        )
-    
     try:
-        # Create upload directory
-        upload_dir = "uploads/products"
-        os.makedirs(upload_dir, exist_ok=True)
+        # Stream ra đĩa (giới hạn 5MB, dedup theo hash)
+        saved = await save_upload(file, "products")
         
-        # Generate unique filename
-        import uuid
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Return URL
-        image_url = f"http://localhost:8000/uploads/products/{unique_filename}"
+        # Thumbnail / medium / large + WebP sinh nền
+        await submit_job(generate_renditions, saved["url"])
         
         try:
-            log_activity(current_user["_id"], "IMAGE_UPLOADED", {
-                "filename": unique_filename,
+            await log_activity(current_user["_id"], "IMAGE_UPLOADED", {
+                "filename": saved["filename"],
                 "original_name": file.filename
             })
         except Exception as e:
             print(f"Warning: Could not log activity: {e}")
         
-        return {"url": image_url, "filename": unique_filename}
+        return {"url": saved["url"], "filename": saved["filename"]}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -109,12 +98,13 @@ async def get_all_users(
     
     skip = (page - 1) * limit
     
-    users = list(
+    users = await (
         users_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -141,7 +131,7 @@ async def update_user_role(
 ):
     """Cập nhật quyền người dùng - F33"""
     
-    user = users_collection.find_one({"_id": user_id})
+    user = await users_collection.find_one({"_id": user_id})
     
     if not user:
         raise HTTPException(
@@ -149,12 +139,13 @@ async def update_user_role(
             detail="User not found"
         )
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": user_id},
         {"$set": {"role": new_role}}
     )
+    invalidate_user(user_id)
     
-    log_activity(current_user["_id"], "USER_ROLE_UPDATED", {
+    await log_activity(current_user["_id"], "USER_ROLE_UPDATED", {
         "user_id": user_id,
         "new_role": new_role
     })
@@ -168,7 +159,7 @@ async def block_user(
 ):
     """Khóa tài khoản người dùng - F33"""
     
-    user = users_collection.find_one({"_id": user_id})
+    user = await users_collection.find_one({"_id": user_id})
     
     if not user:
         raise HTTPException(
@@ -182,12 +173,13 @@ async def block_user(
             detail="Cannot block admin user"
         )
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": user_id},
         {"$set": {"is_blocked": True}}
     )
+    invalidate_user(user_id)
     
-    log_activity(current_user["_id"], "USER_BLOCKED", {"user_id": user_id})
+    await log_activity(current_user["_id"], "USER_BLOCKED", {"user_id": user_id})
     
     return {"message": "User blocked successfully"}
 
@@ -198,12 +190,13 @@ async def unblock_user(
 ):
     """Mở khóa tài khoản người dùng - F33"""
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": user_id},
         {"$set": {"is_blocked": False}}
     )
+    invalidate_user(user_id)
     
-    log_activity(current_user["_id"], "USER_UNBLOCKED", {"user_id": user_id})
+    await log_activity(current_user["_id"], "USER_UNBLOCKED", {"user_id": user_id})
     
     return {"message": "User unblocked successfully"}
 
@@ -214,7 +207,7 @@ async def delete_user(
 ):
     """Xóa người dùng - F33"""
     
-    user = users_collection.find_one({"_id": user_id})
+    user = await users_collection.find_one({"_id": user_id})
     
     if not user:
         raise HTTPException(
@@ -229,7 +222,7 @@ async def delete_user(
         )
     
     # Check if user has active orders
-    active_orders = orders_collection.count_documents({
+    active_orders = await orders_collection.count_documents({
         "user_id": user_id,
         "status": {"$in": ["pending", "confirmed", "processing", "shipping"]}
     })
@@ -240,9 +233,10 @@ async def delete_user(
             detail="Cannot delete user with active orders"
         )
     
-    users_collection.delete_one({"_id": user_id})
+    await users_collection.delete_one({"_id": user_id})
+    invalidate_user(user_id)
     
-    log_activity(current_user["_id"], "USER_DELETED", {"user_id": user_id})
+    await log_activity(current_user["_id"], "USER_DELETED", {"user_id": user_id})
     
     return {"message": "User deleted successfully"}
 
@@ -256,20 +250,20 @@ async def create_coupon(
     """Tạo mã giảm giá mới - F35"""
     
     # Check if code already exists
-    if coupons_collection.find_one({"code": coupon.code.upper()}):
+    if await coupons_collection.find_one({"code": coupon.code.upper()}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Coupon code already exists"
         )
     
     coupon_dict = coupon.dict()
-    coupon_dict["_id"] = f"coupon_{get_next_sequence('coupons')}"
+    coupon_dict["_id"] = f"coupon_{await get_next_sequence('coupons')}"
     coupon_dict["code"] = coupon_dict["code"].upper()
     coupon_dict["created_at"] = datetime.utcnow()
     
-    coupons_collection.insert_one(coupon_dict)
+    await coupons_collection.insert_one(coupon_dict)
     
-    log_activity(current_user["_id"], "COUPON_CREATED", {
+    await log_activity(current_user["_id"], "COUPON_CREATED", {
         "coupon_id": coupon_dict["_id"],
         "code": coupon_dict["code"]
     })
@@ -292,12 +286,13 @@ async def get_all_coupons(
     
     skip = (page - 1) * limit
     
-    coupons = list(
+    coupons = await (
         coupons_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -314,7 +309,7 @@ async def update_coupon(
 ):
     """Cập nhật mã giảm giá - F35"""
     
-    coupon = coupons_collection.find_one({"_id": coupon_id})
+    coupon = await coupons_collection.find_one({"_id": coupon_id})
     
     if not coupon:
         raise HTTPException(
@@ -324,14 +319,14 @@ async def update_coupon(
     
     update_data = {k: v for k, v in coupon_update.dict().items() if v is not None}
     
-    coupons_collection.update_one(
+    await coupons_collection.update_one(
         {"_id": coupon_id},
         {"$set": update_data}
     )
     
-    log_activity(current_user["_id"], "COUPON_UPDATED", {"coupon_id": coupon_id})
+    await log_activity(current_user["_id"], "COUPON_UPDATED", {"coupon_id": coupon_id})
     
-    updated_coupon = coupons_collection.find_one({"_id": coupon_id})
+    updated_coupon = await coupons_collection.find_one({"_id": coupon_id})
     return CouponResponse(**updated_coupon)
 
 @router.delete("/coupons/{coupon_id}")
@@ -341,7 +336,7 @@ async def delete_coupon(
 ):
     """Xóa mã giảm giá - F35"""
     
-    result = coupons_collection.delete_one({"_id": coupon_id})
+    result = await coupons_collection.delete_one({"_id": coupon_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -349,7 +344,7 @@ async def delete_coupon(
             detail="Coupon not found"
         )
     
-    log_activity(current_user["_id"], "COUPON_DELETED", {"coupon_id": coupon_id})
+    await log_activity(current_user["_id"], "COUPON_DELETED", {"coupon_id": coupon_id})
     
     return {"message": "Coupon deleted successfully"}
 
@@ -379,12 +374,13 @@ async def get_all_products_admin(
     
     skip = (page - 1) * limit
     
-    products = list(
+    products = await (
         products_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -434,7 +430,7 @@ async def create_product(
             )
     
     # Check if category exists
-    if not categories_collection.find_one({"_id": product_data["category_id"]}):
+    if not await categories_collection.find_one({"_id": product_data["category_id"]}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Category not found"
@@ -462,11 +458,11 @@ async def create_product(
         import re
         base_slug = re.sub(r'[^a-z0-9\s]', '', base_slug)
         base_slug = re.sub(r'\s+', '-', base_slug.strip())
-        product_data["slug"] = f"{base_slug}-{get_next_sequence('products')}"
+        product_data["slug"] = f"{base_slug}-{await get_next_sequence('products')}"
     
     # Create product dict based on seed_data.py structure
     product_dict = {
-        "_id": f"prod_{get_next_sequence('products')}",
+        "_id": f"prod_{await get_next_sequence('products')}",
         "name": product_data["name"],
         "slug": product_data.get("slug"),
         "description": product_data.get("description", ""),
@@ -476,12 +472,13 @@ async def create_product(
         "price": int(product_data["price"]),
         "compare_price": int(product_data.get("compare_price", 0)) if product_data.get("compare_price") else None,
         "stock": int(product_data["stock"]),
-        "sku": product_data.get("sku", f"{product_data['brand'][:3].upper()}-{get_next_sequence('products')}"),
-        "images": product_data.get("images", [{"url": "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80", "is_primary": True, "alt_text": product_data["name"]}]),
+        "sku": product_data.get("sku", f"{product_data['brand'][:3].upper()}-{await get_next_sequence('products')}"),
+        "images": attach_renditions(product_data.get("images", [{"url": "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80", "is_primary": True, "alt_text": product_data["name"]}])),
         "variants": product_data.get("variants", []),
         "tags": product_data.get("tags", [product_data["brand"].lower(), "admin-created"]),
         "is_featured": product_data.get("is_featured", False),
         "is_on_sale": product_data.get("is_on_sale", False),
+        "approval_status": ProductApprovalStatus.APPROVED,  # Admin tạo thì duyệt luôn
         "rating": 0.0,
         "review_count": 0,
         "sold_count": 0,
@@ -490,10 +487,11 @@ async def create_product(
         "updated_at": datetime.utcnow()
     }
     
-    products_collection.insert_one(product_dict)
+    await products_collection.insert_one(product_dict)
+    invalidate_category_counts()
     
     try:
-        log_activity(current_user["_id"], "PRODUCT_CREATED", {
+        await log_activity(current_user["_id"], "PRODUCT_CREATED", {
             "product_id": product_dict["_id"],
             "product_name": product_dict["name"]
         })
@@ -510,7 +508,7 @@ async def update_product(
 ):
     """Cập nhật sản phẩm (Admin)"""
     
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     
     if not product:
         raise HTTPException(
@@ -541,7 +539,7 @@ async def update_product(
     if "sku" in product_data:
         update_data["sku"] = product_data["sku"]
     if "images" in product_data:
-        update_data["images"] = product_data["images"]
+        update_data["images"] = attach_renditions(product_data["images"])
     if "variants" in product_data:
         update_data["variants"] = product_data["variants"]
     if "tags" in product_data:
@@ -553,13 +551,17 @@ async def update_product(
     
     update_data["updated_at"] = datetime.utcnow()
     
-    products_collection.update_one(
+    await products_collection.update_one(
         {"_id": product_id},
         {"$set": update_data}
     )
     
+    invalidate_product(product_id)
+    if "category_id" in update_data:
+        invalidate_category_counts()
+    
     try:
-        log_activity(current_user["_id"], "PRODUCT_UPDATED", {"product_id": product_id})
+        await log_activity(current_user["_id"], "PRODUCT_UPDATED", {"product_id": product_id})
     except Exception as e:
         print(f"Warning: Could not log activity: {e}")
     
@@ -572,7 +574,7 @@ async def delete_product(
 ):
     """Xóa sản phẩm (Admin)"""
     
-    result = products_collection.delete_one({"_id": product_id})
+    result = await products_collection.delete_one({"_id": product_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -580,8 +582,11 @@ async def delete_product(
             detail="Product not found"
         )
     
+    invalidate_product(product_id)
+    invalidate_category_counts()
+    
     try:
-        log_activity(current_user["_id"], "PRODUCT_DELETED", {"product_id": product_id})
+        await log_activity(current_user["_id"], "PRODUCT_DELETED", {"product_id": product_id})
     except Exception as e:
         print(f"Warning: Could not log activity: {e}")
     
@@ -589,6 +594,21 @@ async def delete_product(
 
 # ==================== STATISTICS & ANALYTICS (F36) ====================
 
+@router.get("/stats/cache")
+async def get_cache_statistics(current_user: dict = Depends(get_current_admin)):
+    """Hit/miss của cache sản phẩm (monitoring)"""
+    return get_cache_stats()
+
+@router.get("/stats/jobs")
+async def get_job_statistics(current_user: dict = Depends(get_current_admin)):
+    """Backlog của job queue nền (monitoring)"""
+    return get_job_queue_stats()
+
+@router.get("/stats/password-pool")
+async def get_password_pool_statistics(current_user: dict = Depends(get_current_admin)):
+    """Queue depth của password pool (bcrypt) (monitoring)"""
+    return get_password_pool_stats()
+
 @router.get("/stats/sales")
 async def get_sales_stats(
     current_user: dict = Depends(get_current_admin),
@@ -610,50 +630,19 @@ async def get_sales_stats(
     else:
         start_date = now - timedelta(days=30)
     
-    # Remove timezone for MongoDB query
-    start_date = start_date.replace(tzinfo=None)
-    
-    # Aggregate orders
-    pipeline = [
-        {
-            "$match": {
-                "status": "delivered",
-                "created_at": {"$gte": start_date}
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total_revenue": {"$sum": "$total"},
-                "total_orders": {"$sum": 1},
-                "total_products_sold": {
-                    "$sum": {
-                        "$sum": "$items.quantity"
-                    }
-                }
-            }
-        }
-    ]
-    
-    result = list(orders_collection.aggregate(pipeline))
-    
-    if result:
-        stats = result[0]
-        return SalesStats(
-            total_revenue=stats.get("total_revenue", 0),
-            total_orders=stats.get("total_orders", 0),
-            total_products_sold=stats.get("total_products_sold", 0),
-            average_order_value=stats.get("total_revenue", 0) / stats.get("total_orders", 1),
-            period=period
-        )
-    else:
-        return SalesStats(
-            total_revenue=0,
-            total_orders=0,
-            total_products_sold=0,
-            average_order_value=0,
-            period=period
-        )
+    # Đọc từ order_rollups thay vì aggregate trên orders
+    summary = await get_rollup_summary(start_date, now)
+    delivered = summary["by_status"].get("delivered", {})
+    total_revenue = delivered.get("revenue", 0)
+    total_orders = delivered.get("count", 0)
+    
+    return SalesStats(
+        total_revenue=total_revenue,
+        total_orders=total_orders,
+        total_products_sold=delivered.get("items", 0),
+        average_order_value=total_revenue / total_orders if total_orders else 0,
+        period=period
+    )
 
 @router.get("/stats/products/best-sellers")
 async def get_best_selling_products(
@@ -662,11 +651,12 @@ async def get_best_selling_products(
 ):
     """Sản phẩm bán chạy - F36"""
     
-    products = list(
+    products = await (
         products_collection
         .find()
         .sort("sold_count", -1)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -685,11 +675,11 @@ async def get_best_selling_products(
 async def get_user_stats(current_user: dict = Depends(get_current_admin)):
     """Thống kê người dùng - F36"""
     
-    total_users = users_collection.count_documents({})
+    total_users = await users_collection.count_documents({})
     
     # New users today (Vietnam timezone)
     today_start = get_vietnam_now().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-    new_users_today = users_collection.count_documents({
+    new_users_today = await users_collection.count_documents({
         "created_at": {"$gte": today_start}
     })
     
@@ -699,11 +689,11 @@ async def get_user_stats(current_user: dict = Depends(get_current_admin)):
         {"$count": "active_users"}
     ]
     
-    active_result = list(orders_collection.aggregate(active_users_pipeline))
+    active_result = await orders_collection.aggregate(active_users_pipeline).to_list(length=None)
     active_users = active_result[0]["active_users"] if active_result else 0
     
     # Verified users
-    verified_users = users_collection.count_documents({"is_verified": True})
+    verified_users = await users_collection.count_documents({"is_verified": True})
     
     return UserStats(
         total_users=total_users,
@@ -717,9 +707,9 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
     """Tổng quan dashboard - F36"""
     
     # Total stats
-    total_users = users_collection.count_documents({})
-    total_products = products_collection.count_documents({})
-    total_orders = orders_collection.count_documents({})
+    total_users = await users_collection.count_documents({})
+    total_products = await products_collection.count_documents({})
+    total_orders = await orders_collection.count_documents({})
     
     # Revenue
     revenue_pipeline = [
@@ -727,7 +717,7 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     
-    revenue_result = list(orders_collection.aggregate(revenue_pipeline))
+    revenue_result = await orders_collection.aggregate(revenue_pipeline).to_list(length=None)
     total_revenue = revenue_result[0]["total"] if revenue_result else 0
     
     # Monthly revenue (Vietnam timezone)
@@ -743,18 +733,18 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_admin)):
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     
-    monthly_revenue_result = list(orders_collection.aggregate(monthly_revenue_pipeline))
+    monthly_revenue_result = await orders_collection.aggregate(monthly_revenue_pipeline).to_list(length=None)
     monthly_revenue = monthly_revenue_result[0]["total"] if monthly_revenue_result else 0
     
     # Pending orders
-    pending_orders = orders_collection.count_documents({"status": "pending"})
+    pending_orders = await orders_collection.count_documents({"status": "pending"})
     
     # In stock products
-    in_stock_products = products_collection.count_documents({"stock": {"$gt": 0}})
+    in_stock_products = await products_collection.count_documents({"stock": {"$gt": 0}})
     
     # New users this week (Vietnam timezone)
     week_start = (now_vn - timedelta(days=7)).replace(tzinfo=None)
-    new_users_week = users_collection.count_documents({"created_at": {"$gte": week_start}})
+    new_users_week = await users_collection.count_documents({"created_at": {"$gte": week_start}})
     
     return {
         "total_users": total_users,
@@ -789,12 +779,13 @@ async def get_activity_logs(
     
     skip = (page - 1) * limit
     
-    logs = list(
+    logs = await (
         activity_logs_collection
         .find(query)
         .sort("timestamp", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     return logs
@@ -817,18 +808,19 @@ async def get_sellers(
     
     skip = (page - 1) * limit
     
-    sellers = list(
+    sellers = await (
         users_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
     for seller in sellers:
         # Count products
-        product_count = products_collection.count_documents({"seller_id": seller["_id"]})
+        product_count = await products_collection.count_documents({"seller_id": seller["_id"]})
         
         result.append({
             "id": seller["_id"],
@@ -853,7 +845,7 @@ async def approve_seller(
 ):
     """Admin duyệt tài khoản seller"""
     
-    seller = users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
+    seller = await users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
     
     if not seller:
         raise HTTPException(
@@ -862,7 +854,7 @@ async def approve_seller(
         )
     
     # Update seller status
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": seller_id},
         {
             "$set": {
@@ -871,16 +863,17 @@ async def approve_seller(
             }
         }
     )
+    invalidate_user(seller_id)
     
     # Create notification for seller
-    create_notification_safe(
+    await create_notification_safe(
         user_id=seller_id,
         type="system",
         title="Tài khoản đã được duyệt",
         message=f"Tài khoản người bán '{seller.get('store_name')}' đã được admin duyệt. Bạn có thể bắt đầu bán hàng!"
     )
     
-    log_activity(current_user["_id"], "SELLER_APPROVED", {
+    await log_activity(current_user["_id"], "SELLER_APPROVED", {
         "seller_id": seller_id,
         "store_name": seller.get("store_name")
     })
@@ -895,7 +888,7 @@ async def reject_seller(
 ):
     """Admin từ chối tài khoản seller"""
     
-    seller = users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
+    seller = await users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
     
     if not seller:
         raise HTTPException(
@@ -904,7 +897,7 @@ async def reject_seller(
         )
     
     # Update seller status
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": seller_id},
         {
             "$set": {
@@ -913,16 +906,17 @@ async def reject_seller(
             }
         }
     )
+    invalidate_user(seller_id)
     
     # Create notification for seller
-    create_notification_safe(
+    await create_notification_safe(
         user_id=seller_id,
         type="system",
         title="Tài khoản bị từ chối",
         message=f"Tài khoản người bán '{seller.get('store_name')}' đã bị từ chối." + (f" Lý do: {reason}" if reason else "")
     )
     
-    log_activity(current_user["_id"], "SELLER_REJECTED", {
+    await log_activity(current_user["_id"], "SELLER_REJECTED", {
         "seller_id": seller_id,
         "reason": reason
     })
@@ -937,7 +931,7 @@ async def suspend_seller(
 ):
     """Admin tạm dừng tài khoản seller"""
     
-    seller = users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
+    seller = await users_collection.find_one({"_id": seller_id, "role": UserRole.SELLER})
     
     if not seller:
         raise HTTPException(
@@ -946,7 +940,7 @@ async def suspend_seller(
         )
     
     # Update seller status
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": seller_id},
         {
             "$set": {
@@ -955,16 +949,17 @@ async def suspend_seller(
             }
         }
     )
+    invalidate_user(seller_id)
     
     # Create notification for seller
-    create_notification_safe(
+    await create_notification_safe(
         user_id=seller_id,
         type="system",
         title="Tài khoản bị tạm dừng",
         message=f"Tài khoản người bán '{seller.get('store_name')}' đã bị tạm dừng." + (f" Lý do: {reason}" if reason else "")
     )
     
-    log_activity(current_user["_id"], "SELLER_SUSPENDED", {
+    await log_activity(current_user["_id"], "SELLER_SUSPENDED", {
         "seller_id": seller_id,
         "reason": reason
     })
@@ -985,20 +980,28 @@ async def get_pending_products(
     
     skip = (page - 1) * limit
     
-    products = list(
+    products = await (
         products_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
+    # Enrich with seller info (1 query $in cho cả trang)
+    seller_ids = list({product["seller_id"] for product in products if product.get("seller_id")})
+    sellers = {}
+    if seller_ids:
+        async for seller in users_collection.find(
+            {"_id": {"$in": seller_ids}},
+            {"full_name": 1, "email": 1}
+        ):
+            sellers[seller["_id"]] = seller
+    
     result = []
     for product in products:
-        # Enrich with seller info
-        seller = None
-        if product.get("seller_id"):
-            seller = users_collection.find_one({"_id": product["seller_id"]})
+        seller = sellers.get(product.get("seller_id"))
         
         product_dict = dict(product)
         product_dict["id"] = product_dict["_id"]
@@ -1017,7 +1020,7 @@ async def approve_product(
 ):
     """Admin duyệt sản phẩm"""
     
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     
     if not product:
         raise HTTPException(
@@ -1026,7 +1029,7 @@ async def approve_product(
         )
     
     # Update product status
-    products_collection.update_one(
+    await products_collection.update_one(
         {"_id": product_id},
         {
             "$set": {
@@ -1035,10 +1038,12 @@ async def approve_product(
             }
         }
     )
+    invalidate_product(product_id)
+    invalidate_category_counts()
     
     # Create notification for seller
     if product.get("seller_id"):
-        create_notification_safe(
+        await create_notification_safe(
             user_id=product["seller_id"],
             type="system",
             title="Sản phẩm đã được duyệt",
@@ -1046,7 +1051,7 @@ async def approve_product(
             link=f"/products/{product_id}"
         )
     
-    log_activity(current_user["_id"], "PRODUCT_APPROVED", {
+    await log_activity(current_user["_id"], "PRODUCT_APPROVED", {
         "product_id": product_id,
         "product_name": product.get("name")
     })
@@ -1061,7 +1066,7 @@ async def reject_product(
 ):
     """Admin từ chối sản phẩm"""
     
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     
     if not product:
         raise HTTPException(
@@ -1070,7 +1075,7 @@ async def reject_product(
         )
     
     # Update product status
-    products_collection.update_one(
+    await products_collection.update_one(
         {"_id": product_id},
         {
             "$set": {
@@ -1079,17 +1084,19 @@ async def reject_product(
             }
         }
     )
+    invalidate_product(product_id)
+    invalidate_category_counts()
     
     # Create notification for seller
     if product.get("seller_id"):
-        create_notification_safe(
+        await create_notification_safe(
             user_id=product["seller_id"],
             type="system",
             title="Sản phẩm bị từ chối",
             message=f"Sản phẩm '{product.get('name')}' đã bị từ chối." + (f" Lý do: {reason}" if reason else "")
         )
     
-    log_activity(current_user["_id"], "PRODUCT_REJECTED", {
+    await log_activity(current_user["_id"], "PRODUCT_REJECTED", {
         "product_id": product_id,
         "reason": reason
     })
@@ -4,10 +4,9 @@ from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 
 from .auth import get_current_admin
-from .database import (
-    orders_collection, products_collection, users_collection,
-    categories_collection
-)
+from .rollups import get_rollup_summary, get_daily_rollups
+from .images import image_url
+from .database import orders_collection, products_collection, users_collection
 
 router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
 
@@ -44,78 +43,63 @@ async def get_dashboard_stats(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days)
     
-    # Get all orders in date range
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
-    # Calculate total revenue
-    total_revenue = sum(float(order.get("total", 0)) for order in orders)
+    # Đọc từ order_rollups (không quét orders)
+    summary = await get_rollup_summary(start_date, end_date)
+    total_revenue = summary["revenue"]
+    total_orders = summary["order_count"]
     
-    # Calculate revenue by status
-    revenue_by_status = defaultdict(float)
-    for order in orders:
-        status = order.get("status", "pending")
-        revenue_by_status[status] += float(order.get("total", 0))
-    
-    # Count orders by status
-    orders_by_status = defaultdict(int)
-    for order in orders:
-        status = order.get("status", "pending")
-        orders_by_status[status] += 1
+    # Revenue / order count by status
+    revenue_by_status = {status: row["revenue"] for status, row in summary["by_status"].items()}
+    orders_by_status = {status: row["count"] for status, row in summary["by_status"].items()}
     
     # Revenue by day (for chart)
-    revenue_by_day = defaultdict(float)
-    orders_by_day = defaultdict(int)
-    for order in orders:
-        date_key = order["created_at"].strftime("%Y-%m-%d")
-        revenue_by_day[date_key] += float(order.get("total", 0))
-        orders_by_day[date_key] += 1
-    
-    # Sort by date
     revenue_chart = [
-        {"date": date, "revenue": revenue, "orders": orders_by_day[date]}
-        for date, revenue in sorted(revenue_by_day.items())
+        {
+            "date": rollup["bucket"].strftime("%Y-%m-%d"),
+            "revenue": rollup.get("revenue", 0),
+            "orders": rollup.get("order_count", 0)
+        }
+        for rollup in await get_daily_rollups(start_date, end_date)
+        if rollup.get("order_count", 0) > 0
     ]
     
     # Get new users in period
-    new_users = users_collection.count_documents({
+    new_users = await users_collection.count_documents({
         "created_at": {"$gte": start_date, "$lte": end_date}
     })
     
     # Total users
-    total_users = users_collection.count_documents({})
+    total_users = await users_collection.count_documents({})
     
     # Total products
-    total_products = products_collection.count_documents({})
+    total_products = await products_collection.count_documents({})
     
     # Products low stock (< 10)
-    low_stock_products = products_collection.count_documents({
+    low_stock_products = await products_collection.count_documents({
         "stock": {"$lt": 10, "$gt": 0}
     })
     
     # Out of stock products
-    out_of_stock = products_collection.count_documents({
+    out_of_stock = await products_collection.count_documents({
         "stock": 0
     })
     
     # Average order value
-    avg_order_value = total_revenue / len(orders) if orders else 0
+    avg_order_value = total_revenue / total_orders if total_orders else 0
     
     # Compare with previous period
     prev_start = start_date - timedelta(days=days)
-    prev_orders = list(orders_collection.find({
-        "created_at": {"$gte": prev_start, "$lt": start_date}
-    }))
-    prev_revenue = sum(float(order.get("total", 0)) for order in prev_orders)
+    prev_summary = await get_rollup_summary(prev_start, start_date)
+    prev_revenue = prev_summary["revenue"]
+    prev_orders = prev_summary["order_count"]
     
     revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
-    orders_growth = ((len(orders) - len(prev_orders)) / len(prev_orders) * 100) if prev_orders else 0
+    orders_growth = ((total_orders - prev_orders) / prev_orders * 100) if prev_orders else 0
     
     return {
         "overview": {
             "total_revenue": total_revenue,
-            "total_orders": len(orders),
+            "total_orders": total_orders,
             "total_users": total_users,
             "new_users": new_users,
             "total_products": total_products,
@@ -125,8 +109,8 @@ async def get_dashboard_stats(
             "revenue_growth": revenue_growth,
             "orders_growth": orders_growth
         },
-        "revenue_by_status": dict(revenue_by_status),
-        "orders_by_status": dict(orders_by_status),
+        "revenue_by_status": revenue_by_status,
+        "orders_by_status": orders_by_status,
         "revenue_chart": revenue_chart,
         "period": {
             "start_date": start_date.isoformat(),
@@ -146,11 +130,12 @@ async def get_top_products(
     """
     
     # Get products sorted by sold_count
-    products = list(
+    products = await (
         products_collection
         .find({})
         .sort("sold_count", -1)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -162,7 +147,7 @@ async def get_top_products(
             "revenue": product.get("sold_count", 0) * product["price"],
             "stock": product.get("stock", 0),
             "price": product["price"],
-            "image": product.get("images", [{}])[0].get("url") if product.get("images") else None
+            "image": image_url(product["images"][0], width=200) if product.get("images") else None
         })
     
     return result
@@ -176,37 +161,35 @@ async def get_top_categories(
     Danh mục bán chạy nhất
     """
     
-    # Get all products with sold_count
-    products = list(products_collection.find({}))
-    
-    # Group by category
-    category_stats = defaultdict(lambda: {"sold_count": 0, "revenue": 0, "product_count": 0})
-    
-    for product in products:
-        cat_id = product.get("category_id")
-        if cat_id:
-            category_stats[cat_id]["sold_count"] += product.get("sold_count", 0)
-            category_stats[cat_id]["revenue"] += product.get("sold_count", 0) * product["price"]
-            category_stats[cat_id]["product_count"] += 1
-    
-    # Get category names
-    result = []
-    for cat_id, stats in category_stats.items():
-        category = categories_collection.find_one({"_id": cat_id})
-        if category:
-            result.append({
-                "id": cat_id,
-                "name": category["name"],
-                "icon": category.get("icon"),
-                "sold_count": stats["sold_count"],
-                "revenue": stats["revenue"],
-                "product_count": stats["product_count"]
-            })
-    
-    # Sort by revenue
-    result.sort(key=lambda x: x["revenue"], reverse=True)
+    pipeline = [
+        {"$match": {"category_id": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": "$category_id",
+            "sold_count": {"$sum": {"$ifNull": ["$sold_count", 0]}},
+            "revenue": {"$sum": {"$multiply": [{"$ifNull": ["$sold_count", 0]}, "$price"]}},
+            "product_count": {"$sum": 1}
+        }},
+        {"$lookup": {
+            "from": "categories",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "category"
+        }},
+        {"$unwind": "$category"},
+        {"$sort": {"revenue": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "id": "$_id",
+            "name": "$category.name",
+            "icon": {"$ifNull": ["$category.icon", None]},
+            "sold_count": 1,
+            "revenue": 1,
+            "product_count": 1
+        }}
+    ]
     
-    return result[:limit]
+    return await products_collection.aggregate(pipeline).to_list(length=None)
 
 @router.get("/revenue-by-category")
 async def get_revenue_by_category(
@@ -220,37 +203,36 @@ async def get_revenue_by_category(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days)
     
-    # Get orders in period
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date.replace(tzinfo=None), "$lte": end_date.replace(tzinfo=None)}
-    }))
-    
-    # Calculate revenue by category
-    category_revenue = defaultdict(float)
-    
-    for order in orders:
-        for item in order.get("items", []):
-            product = products_collection.find_one({"_id": item["product_id"]})
-            if product:
-                cat_id = product.get("category_id")
-                if cat_id:
-                    category_revenue[cat_id] += float(item.get("subtotal", 0))
-    
-    # Get category names
-    result = []
-    for cat_id, revenue in category_revenue.items():
-        category = categories_collection.find_one({"_id": cat_id})
-        if category:
-            result.append({
-                "category": category["name"],
-                "revenue": revenue,
-                "icon": category.get("icon")
-            })
-    
-    # Sort by revenue
-    result.sort(key=lambda x: x["revenue"], reverse=True)
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start_date.replace(tzinfo=None), "$lte": end_date.replace(tzinfo=None)}}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.product_id", "revenue": {"$sum": "$items.subtotal"}}},
+        {"$lookup": {
+            "from": "products",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "product"
+        }},
+        {"$unwind": "$product"},
+        {"$match": {"product.category_id": {"$nin": [None, ""]}}},
+        {"$group": {"_id": "$product.category_id", "revenue": {"$sum": "$revenue"}}},
+        {"$lookup": {
+            "from": "categories",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "category"
+        }},
+        {"$unwind": "$category"},
+        {"$sort": {"revenue": -1}},
+        {"$project": {
+            "_id": 0,
+            "category": "$category.name",
+            "revenue": 1,
+            "icon": {"$ifNull": ["$category.icon", None]}
+        }}
+    ]
     
-    return result
+    return await orders_collection.aggregate(pipeline).to_list(length=None)
 
 @router.get("/customer-stats")
 async def get_customer_stats(
@@ -264,48 +246,59 @@ async def get_customer_stats(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days)
     
-    # Get orders in period
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
-    # Calculate customer stats
-    customer_orders = defaultdict(lambda: {"count": 0, "total": 0})
-    
-    for order in orders:
-        user_id = order.get("user_id")
-        customer_orders[user_id]["count"] += 1
-        customer_orders[user_id]["total"] += float(order.get("total", 0))
-    
-    # Get top customers
-    top_customers = []
-    for user_id, stats in customer_orders.items():
-        user = users_collection.find_one({"_id": user_id})
-        if user:
-            top_customers.append({
-                "id": user_id,
-                "name": user.get("full_name", "Unknown"),
-                "email": user.get("email"),
-                "order_count": stats["count"],
-                "total_spent": stats["total"],
-                "avg_order_value": stats["total"] / stats["count"]
-            })
-    
-    # Sort by total spent
-    top_customers.sort(key=lambda x: x["total_spent"], reverse=True)
-    
-    # Customer segments
-    total_customers = len(customer_orders)
-    new_customers = sum(1 for stats in customer_orders.values() if stats["count"] == 1)
-    returning_customers = total_customers - new_customers
-    vip_customers = sum(1 for stats in customer_orders.values() if stats["total"] > 50000000)
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$group": {
+            "_id": "$user_id",
+            "count": {"$sum": 1},
+            "total": {"$sum": "$total"}
+        }},
+        {"$facet": {
+            "segments": [
+                {"$group": {
+                    "_id": None,
+                    "total_customers": {"$sum": 1},
+                    "new_customers": {"$sum": {"$cond": [{"$eq": ["$count", 1]}, 1, 0]}},
+                    "vip_customers": {"$sum": {"$cond": [{"$gt": ["$total", 50000000]}, 1, 0]}}
+                }}
+            ],
+            "top_customers": [
+                {"$sort": {"total": -1}},
+                {"$limit": 10},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "user"
+                }},
+                # User đã bị xóa vẫn giữ dòng (tên "Unknown") để luôn đủ top 10
+                {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+                {"$project": {
+                    "_id": 0,
+                    "id": "$_id",
+                    "name": {"$ifNull": ["$user.full_name", "Unknown"]},
+                    "email": "$user.email",
+                    "order_count": "$count",
+                    "total_spent": "$total",
+                    "avg_order_value": {"$divide": ["$total", "$count"]}
+                }}
+            ]
+        }}
+    ]
+    
+    result = await orders_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
+    segments = facets["segments"][0] if facets.get("segments") else {}
+    
+    total_customers = segments.get("total_customers", 0)
+    new_customers = segments.get("new_customers", 0)
     
     return {
         "total_customers": total_customers,
         "new_customers": new_customers,
-        "returning_customers": returning_customers,
-        "vip_customers": vip_customers,
-        "top_customers": top_customers[:10]
+        "returning_customers": total_customers - new_customers,
+        "vip_customers": segments.get("vip_customers", 0),
+        "top_customers": facets.get("top_customers", [])
     }
 
 @router.get("/sales-forecast")
@@ -320,20 +313,17 @@ async def get_sales_forecast(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days * 2)  # Get 2x data for better forecast
     
-    # Get orders
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
     # Revenue by day
-    daily_revenue = defaultdict(float)
-    for order in orders:
-        date_key = order["created_at"].strftime("%Y-%m-%d")
-        daily_revenue[date_key] += float(order.get("total", 0))
-    
-    # Calculate moving average
-    sorted_dates = sorted(daily_revenue.keys())
-    revenues = [daily_revenue[date] for date in sorted_dates]
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "revenue": {"$sum": "$total"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    daily_revenue = await orders_collection.aggregate(pipeline).to_list(length=None)
+    revenues = [float(day["revenue"]) for day in daily_revenue]
     
     # Simple moving average for next 7 days
     if len(revenues) >= 7:
@@ -371,43 +361,47 @@ async def get_revenue_analysis(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days)
     
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
-    # Revenue by hour of day
-    revenue_by_hour = defaultdict(float)
-    orders_by_hour = defaultdict(int)
-    
-    # Revenue by day of week
-    revenue_by_dow = defaultdict(float)
-    orders_by_dow = defaultdict(int)
+    # Giờ / thứ tính theo múi giờ Việt Nam
+    vn_offset = "+07:00"
+    
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$facet": {
+            "by_hour": [
+                {"$group": {
+                    "_id": {"$hour": {"date": "$created_at", "timezone": vn_offset}},
+                    "revenue": {"$sum": "$total"},
+                    "orders": {"$sum": 1}
+                }}
+            ],
+            "by_dow": [
+                {"$group": {
+                    "_id": {"$dayOfWeek": {"date": "$created_at", "timezone": vn_offset}},
+                    "revenue": {"$sum": "$total"},
+                    "orders": {"$sum": 1}
+                }}
+            ],
+            "by_payment": [
+                {"$group": {"_id": {"$ifNull": ["$payment_method", "unknown"]}, "revenue": {"$sum": "$total"}}}
+            ],
+            "by_status": [
+                {"$group": {"_id": {"$ifNull": ["$status", "pending"]}, "revenue": {"$sum": "$total"}}}
+            ]
+        }}
+    ]
     
-    # Revenue by payment method
-    revenue_by_payment = defaultdict(float)
+    result = await orders_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
     
-    # Revenue by status
-    revenue_by_status = defaultdict(float)
+    # $dayOfWeek: 1 = Sunday ... 7 = Saturday
+    day_names = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
     
-    for order in orders:
-        # Chuyển đổi sang múi giờ Việt Nam
-        order_time = to_vietnam_time(order["created_at"]) if order["created_at"].tzinfo else order["created_at"].replace(tzinfo=timezone.utc)
-        order_time_vn = order_time.astimezone(VIETNAM_TZ)
-        hour = order_time_vn.hour
-        dow = order_time_vn.strftime("%A")
-        total = float(order.get("total", 0))
-        
-        revenue_by_hour[hour] += total
-        orders_by_hour[hour] += 1
-        
-        revenue_by_dow[dow] += total
-        orders_by_dow[dow] += 1
-        
-        payment_method = order.get("payment_method", "unknown")
-        revenue_by_payment[payment_method] += total
-        
-        status = order.get("status", "pending")
-        revenue_by_status[status] += total
+    revenue_by_hour = {row["_id"]: float(row["revenue"]) for row in facets.get("by_hour", [])}
+    orders_by_hour = {row["_id"]: row["orders"] for row in facets.get("by_hour", [])}
+    revenue_by_dow = {day_names[row["_id"] - 1]: float(row["revenue"]) for row in facets.get("by_dow", [])}
+    orders_by_dow = {day_names[row["_id"] - 1]: row["orders"] for row in facets.get("by_dow", [])}
+    revenue_by_payment = {row["_id"]: float(row["revenue"]) for row in facets.get("by_payment", [])}
+    revenue_by_status = {row["_id"]: float(row["revenue"]) for row in facets.get("by_status", [])}
     
     # Calculate peak hours
     peak_hour = max(revenue_by_hour.items(), key=lambda x: x[1])[0] if revenue_by_hour else 0
@@ -432,8 +426,8 @@ async def get_revenue_analysis(
             }
             for day, revenue in sorted(revenue_by_dow.items())
         ],
-        "by_payment_method": dict(revenue_by_payment),
-        "by_status": dict(revenue_by_status),
+        "by_payment_method": revenue_by_payment,
+        "by_status": revenue_by_status,
         "insights": {
             "peak_hour": peak_hour,
             "peak_day": peak_day,
@@ -451,50 +445,43 @@ async def get_customer_rfm_analysis(
     
     now = get_vietnam_now()
     
-    # Get all orders
-    orders = list(orders_collection.find({}))
-    
-    # Calculate RFM for each customer
-    customer_rfm = defaultdict(lambda: {
-        "recency": 999,  # Days since last order
-        "frequency": 0,  # Number of orders
-        "monetary": 0,  # Total spent
-        "last_order": None,
-        "first_order": None
-    })
+    # Recency / frequency / monetary của từng khách tính trong 1 aggregation
+    pipeline = [
+        {"$group": {
+            "_id": "$user_id",
+            "last_order": {"$max": "$created_at"},
+            "first_order": {"$min": "$created_at"},
+            "frequency": {"$sum": 1},
+            "monetary": {"$sum": "$total"}
+        }}
+    ]
+    customer_rfm = await orders_collection.aggregate(pipeline).to_list(length=None)
+    
+    # Lấy thông tin user bằng 1 query $in
+    user_ids = [rfm["_id"] for rfm in customer_rfm]
+    users = {
+        user["_id"]: user
+        async for user in users_collection.find(
+            {"_id": {"$in": user_ids}},
+            {"full_name": 1, "email": 1}
+        )
+    }
     
-    for order in orders:
-        user_id = order.get("user_id")
-        order_date = order["created_at"]
+    def days_since(dt):
         # Chuyển đổi sang múi giờ Việt Nam để tính toán
-        if order_date.tzinfo is None:
-            order_date = order_date.replace(tzinfo=timezone.utc)
-        order_date_vn = order_date.astimezone(VIETNAM_TZ)
-        total = float(order.get("total", 0))
-        
-        # Recency (tính theo múi giờ Việt Nam)
-        days_since = (now - order_date_vn).days
-        if days_since < customer_rfm[user_id]["recency"]:
-            customer_rfm[user_id]["recency"] = days_since
-            customer_rfm[user_id]["last_order"] = order_date_vn
-        
-        # Frequency
-        customer_rfm[user_id]["frequency"] += 1
-        
-        # Monetary
-        customer_rfm[user_id]["monetary"] += total
-        
-        # First order
-        if not customer_rfm[user_id]["first_order"] or order_date_vn < customer_rfm[user_id]["first_order"]:
-            customer_rfm[user_id]["first_order"] = order_date_vn
+        return (now - to_vietnam_time(dt)).days if dt else 999
     
     # Score RFM (1-5 scale)
     rfm_list = []
-    for user_id, rfm in customer_rfm.items():
-        user = users_collection.find_one({"_id": user_id})
+    for rfm in customer_rfm:
+        user_id = rfm["_id"]
+        user = users.get(user_id)
         if not user:
             continue
         
+        rfm["recency"] = days_since(rfm["last_order"])
+        rfm["monetary"] = float(rfm["monetary"] or 0)
+        
         # Simple scoring
         r_score = 5 if rfm["recency"] <= 30 else (4 if rfm["recency"] <= 60 else (3 if rfm["recency"] <= 90 else (2 if rfm["recency"] <= 180 else 1)))
         f_score = 5 if rfm["frequency"] >= 10 else (4 if rfm["frequency"] >= 5 else (3 if rfm["frequency"] >= 3 else (2 if rfm["frequency"] >= 2 else 1)))
@@ -529,7 +516,7 @@ async def get_customer_rfm_analysis(
             "rfm_score": rfm_score,
             "segment": segment,
             "avg_order_value": rfm["monetary"] / rfm["frequency"],
-            "customer_lifetime": (now - rfm["first_order"]).days if rfm["first_order"] else 0
+            "customer_lifetime": days_since(rfm["first_order"]) if rfm["first_order"] else 0
         })
     
     # Sort by monetary value
@@ -559,36 +546,36 @@ async def get_product_performance(
     end_date = get_vietnam_now()
     start_date = end_date - timedelta(days=days)
     
-    # Get orders in period
-    orders = list(orders_collection.find({
-        "created_at": {"$gte": start_date, "$lte": end_date}
-    }))
-    
-    # Calculate product metrics
-    product_metrics = defaultdict(lambda: {
-        "sold_count": 0,
-        "revenue": 0,
-        "orders": 0,
-        "returns": 0,
-        "views": 0
-    })
-    
-    for order in orders:
-        for item in order.get("items", []):
-            product_id = item["product_id"]
-            product_metrics[product_id]["sold_count"] += item["quantity"]
-            product_metrics[product_id]["revenue"] += float(item.get("subtotal", 0))
-            product_metrics[product_id]["orders"] += 1
-            
-            if order.get("status") == "returned":
-                product_metrics[product_id]["returns"] += item["quantity"]
+    pipeline = [
+        {"$match": {"created_at": {"$gte": start_date, "$lte": end_date}}},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": "$items.product_id",
+            "sold_count": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": "$items.subtotal"},
+            "orders": {"$sum": 1},
+            "returns": {"$sum": {"$cond": [{"$eq": ["$status", "returned"]}, "$items.quantity", 0]}}
+        }},
+        {"$lookup": {
+            "from": "products",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "product"
+        }},
+        {"$unwind": "$product"},
+        {"$project": {
+            "sold_count": 1, "revenue": 1, "orders": 1, "returns": 1,
+            "product._id": 1, "product.name": 1, "product.category_id": 1, "product.price": 1,
+            "product.cost_price": 1, "product.stock": 1, "product.rating": 1, "product.review_count": 1
+        }}
+    ]
     
     # Get product details and calculate additional metrics
     result = []
-    for product_id, metrics in product_metrics.items():
-        product = products_collection.find_one({"_id": product_id})
-        if not product:
-            continue
+    async for metrics in orders_collection.aggregate(pipeline):
+        product_id = metrics["_id"]
+        product = metrics["product"]
+        metrics["revenue"] = float(metrics["revenue"])
         
         # Calculate profit (if cost_price available)
         cost_price = product.get("cost_price", 0)
@@ -647,40 +634,61 @@ async def get_seller_performance(
     start_date = end_date - timedelta(days=days)
     
     # Get all sellers
-    sellers = list(users_collection.find({"role": "seller", "seller_status": "approved"}))
+    sellers = await users_collection.find(
+        {"role": "seller", "seller_status": "approved"},
+        {"store_name": 1, "email": 1}
+    ).to_list(length=None)
+    seller_ids = [seller["_id"] for seller in sellers]
+    
+    # Số sản phẩm của từng seller
+    product_stats = {
+        row["_id"]: row
+        async for row in products_collection.aggregate([
+            {"$match": {"seller_id": {"$in": seller_ids}}},
+            {"$group": {
+                "_id": "$seller_id",
+                "total_products": {"$sum": 1},
+                "active_products": {"$sum": {"$cond": [{"$gt": ["$stock", 0]}, 1, 0]}}
+            }}
+        ])
+    }
+    
+    # Doanh số theo seller từ items.seller_id (mỗi item tính là 1 order như trước)
+    sales_stats = {
+        row["_id"]: row
+        async for row in orders_collection.aggregate([
+            {"$match": {
+                "items.seller_id": {"$in": seller_ids},
+                "created_at": {"$gte": start_date, "$lte": end_date}
+            }},
+            {"$unwind": "$items"},
+            {"$match": {"items.seller_id": {"$in": seller_ids}}},
+            {"$group": {
+                "_id": "$items.seller_id",
+                "revenue": {"$sum": "$items.subtotal"},
+                "orders": {"$sum": 1},
+                "products_sold": {"$sum": "$items.quantity"}
+            }}
+        ])
+    }
     
     result = []
     for seller in sellers:
         seller_id = seller["_id"]
-        
-        # Get seller's products
-        products = list(products_collection.find({"seller_id": seller_id}))
-        
-        # Get orders containing seller's products
-        seller_revenue = 0
-        seller_orders = 0
-        seller_products_sold = 0
-        
-        orders = list(orders_collection.find({
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        }))
-        
-        for order in orders:
-            for item in order.get("items", []):
-                if any(p["_id"] == item["product_id"] for p in products):
-                    seller_revenue += float(item.get("subtotal", 0))
-                    seller_orders += 1
-                    seller_products_sold += item["quantity"]
+        products = product_stats.get(seller_id, {})
+        sales = sales_stats.get(seller_id, {})
+        seller_revenue = float(sales.get("revenue", 0))
+        seller_orders = sales.get("orders", 0)
         
         result.append({
             "seller_id": seller_id,
             "store_name": seller.get("store_name", "Unknown"),
             "email": seller.get("email"),
-            "total_products": len(products),
-            "active_products": len([p for p in products if p.get("stock", 0) > 0]),
+            "total_products": products.get("total_products", 0),
+            "active_products": products.get("active_products", 0),
             "revenue": seller_revenue,
             "orders": seller_orders,
-            "products_sold": seller_products_sold,
+            "products_sold": sales.get("products_sold", 0),
             "avg_order_value": seller_revenue / seller_orders if seller_orders > 0 else 0
         })
     
@@ -710,27 +718,46 @@ async def get_comparison_analysis(
     
     # Period 1 (most recent)
     period1_start = end_date - timedelta(days=period1_days)
-    period1_orders = list(orders_collection.find({
-        "created_at": {"$gte": period1_start, "$lte": end_date}
-    }))
     
     # Period 2 (previous)
     period2_end = period1_start
     period2_start = period2_end - timedelta(days=period2_days)
-    period2_orders = list(orders_collection.find({
-        "created_at": {"$gte": period2_start, "$lt": period2_end}
-    }))
     
-    def calculate_metrics(orders):
+    def metrics_stage(match: dict) -> list:
+        return [
+            {"$match": {"created_at": match}},
+            {"$group": {
+                "_id": None,
+                "total_orders": {"$sum": 1},
+                "total_revenue": {"$sum": "$total"},
+                "total_items": {"$sum": {"$sum": "$items.quantity"}}
+            }}
+        ]
+    
+    pipeline = [
+        {"$match": {"created_at": {"$gte": period2_start, "$lte": end_date}}},
+        {"$facet": {
+            "period1": metrics_stage({"$gte": period1_start, "$lte": end_date}),
+            "period2": metrics_stage({"$gte": period2_start, "$lt": period2_end})
+        }}
+    ]
+    
+    result = await orders_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
+    
+    def calculate_metrics(rows):
+        row = rows[0] if rows else {}
+        total_orders = row.get("total_orders", 0)
+        total_revenue = float(row.get("total_revenue", 0))
         return {
-            "total_orders": len(orders),
-            "total_revenue": sum(float(o.get("total", 0)) for o in orders),
-            "avg_order_value": sum(float(o.get("total", 0)) for o in orders) / len(orders) if orders else 0,
-            "total_items": sum(sum(item["quantity"] for item in o.get("items", [])) for o in orders)
+            "total_orders": total_orders,
+            "total_revenue": total_revenue,
+            "avg_order_value": total_revenue / total_orders if total_orders else 0,
+            "total_items": row.get("total_items", 0)
         }
     
-    period1_metrics = calculate_metrics(period1_orders)
-    period2_metrics = calculate_metrics(period2_orders)
+    period1_metrics = calculate_metrics(facets.get("period1"))
+    period2_metrics = calculate_metrics(facets.get("period2"))
     
     # Calculate growth
     def calc_growth(current, previous):
@@ -9,6 +9,7 @@ from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 import requests 
 import secrets
+import copy
 import os
 
 from .models import (
@@ -20,6 +21,8 @@ from .database import (
     users_collection, addresses_collection, log_activity,
     notifications_collection, get_next_sequence, create_notification_safe
 )
+from .cache import user_cache, invalidate_user
+from .password_pool import run_in_password_pool
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -38,6 +41,13 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# Bản async dùng trong handler: bcrypt chạy trên password pool, không chặn event loop
+async def hash_password_async(password: str) -> str:
+    return await run_in_password_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_password_pool(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,25 +58,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Dependency to get current authenticated user"""
-    token = credentials.credentials
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def get_user_from_token(token: str) -> Optional[dict]:
+    """Decode JWT và lấy user (có cache); None nếu token không hợp lệ hoặc user không tồn tại"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            return None
     except JWTError:
-        raise credentials_exception
+        return None
     
-    user = users_collection.find_one({"_id": user_id})
+    # User đang hoạt động được cache ngắn hạn (USER_CACHE_TTL), xóa khi user bị sửa
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = await users_collection.find_one({"_id": user_id})
+        if user is None:
+            return None
+        user_cache.set(user_id, user)
+    
+    # Trả về bản deep copy để handler sửa dict / list lồng nhau (addresses, ...) không làm bẩn cache
+    return copy.deepcopy(user)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Dependency to get current authenticated user"""
+    user = await get_user_from_token(credentials.credentials)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     return user
 
@@ -123,7 +144,7 @@ async def register(user_data: UserCreate):
     """Đăng ký tài khoản mới"""
     
     # Check if email already exists
-    if users_collection.find_one({"email": user_data.email}):
+    if await users_collection.find_one({"email": user_data.email}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -131,20 +152,20 @@ async def register(user_data: UserCreate):
     
     # Create user
     user_dict = user_data.dict()
-    user_dict["password"] = hash_password(user_dict["password"])
-    user_dict["_id"] = f"user_{get_next_sequence('users')}"
+    user_dict["password"] = await hash_password_async(user_dict["password"])
+    user_dict["_id"] = f"user_{await get_next_sequence('users')}"
     user_dict["is_verified"] = False
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
     user_dict["addresses"] = []
     
-    users_collection.insert_one(user_dict)
+    await users_collection.insert_one(user_dict)
     
     # Log activity
-    log_activity(user_dict["_id"], "USER_REGISTERED", {"email": user_data.email})
+    await log_activity(user_dict["_id"], "USER_REGISTERED", {"email": user_data.email})
     
     # Create welcome notification
-    create_notification_safe(
+    await create_notification_safe(
         user_id=user_dict["_id"],
         type="system",
         title="Chào mừng đến với TechMart!",
@@ -178,14 +199,14 @@ async def register_seller(seller_data: SellerRegistration):
     
     try:
         # Check if email already exists
-        if users_collection.find_one({"email": seller_data.email}):
+        if await users_collection.find_one({"email": seller_data.email}):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
         # Check if store name already exists
-        if users_collection.find_one({"store_name": seller_data.store_name, "role": UserRole.SELLER.value}):
+        if await users_collection.find_one({"store_name": seller_data.store_name, "role": UserRole.SELLER.value}):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Store name already exists"
@@ -193,9 +214,9 @@ async def register_seller(seller_data: SellerRegistration):
         
         # Create seller user
         user_dict = {
-            "_id": f"user_{get_next_sequence('users')}",
+            "_id": f"user_{await get_next_sequence('users')}",
             "email": seller_data.email,
-            "password": hash_password(seller_data.password),
+            "password": await hash_password_async(seller_data.password),
             "full_name": seller_data.full_name,
             "phone": seller_data.phone,
             "role": UserRole.SELLER.value,  # Convert enum to string
@@ -211,11 +232,11 @@ async def register_seller(seller_data: SellerRegistration):
             "addresses": []
         }
         
-        users_collection.insert_one(user_dict)
+        await users_collection.insert_one(user_dict)
         
         # Log activity
         try:
-            log_activity(user_dict["_id"], "SELLER_REGISTERED", {
+            await log_activity(user_dict["_id"], "SELLER_REGISTERED", {
                 "email": seller_data.email,
                 "store_name": seller_data.store_name
             })
@@ -224,7 +245,7 @@ async def register_seller(seller_data: SellerRegistration):
         
         # Create notification for seller
         try:
-            create_notification_safe(
+            await create_notification_safe(
                 user_id=user_dict["_id"],
                 type="system",
                 title="Đăng ký thành công",
@@ -300,16 +321,16 @@ async def register_seller(seller_data: SellerRegistration):
 async def login(user_data: UserLogin):
     """Đăng nhập hệ thống"""
     
-    user = users_collection.find_one({"email": user_data.email})
+    user = await users_collection.find_one({"email": user_data.email})
     
-    if not user or not verify_password(user_data.password, user["password"]):
+    if not user or not await verify_password_async(user_data.password, user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
     # Log activity
-    log_activity(user["_id"], "USER_LOGIN", {"email": user_data.email})
+    await log_activity(user["_id"], "USER_LOGIN", {"email": user_data.email})
     
     # Create access token
     access_token = create_access_token(data={"sub": user["_id"]})
@@ -364,7 +385,7 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 @router.post("/forgot-password")
 async def forgot_password(data: PasswordReset):
     """Gửi email reset password"""
-    user = users_collection.find_one({"email": data.email})
+    user = await users_collection.find_one({"email": data.email})
     
     if not user:
         # Don't reveal if email exists
@@ -372,7 +393,7 @@ async def forgot_password(data: PasswordReset):
     
     # Generate reset token
     reset_token = secrets.token_urlsafe(32)
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": user["_id"]},
         {
             "$set": {
@@ -381,11 +402,12 @@ async def forgot_password(data: PasswordReset):
             }
         }
     )
+    invalidate_user(user["_id"])
     
     # TODO: Send email with reset link
     # send_email(data.email, f"Reset link: /reset-password?token={reset_token}")
     
-    log_activity(user["_id"], "PASSWORD_RESET_REQUESTED")
+    await log_activity(user["_id"], "PASSWORD_RESET_REQUESTED")
     
     return {"message": "If email exists, reset link has been sent"}
 
@@ -393,7 +415,7 @@ async def forgot_password(data: PasswordReset):
 @router.post("/reset-password")
 async def reset_password(data: PasswordResetConfirm):
     """Reset password với token"""
-    user = users_collection.find_one({
+    user = await users_collection.find_one({
         "reset_token": data.token,
         "reset_token_expires": {"$gt": datetime.utcnow()}
     })
@@ -405,18 +427,19 @@ async def reset_password(data: PasswordResetConfirm):
         )
     
     # Update password
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": user["_id"]},
         {
             "$set": {
-                "password": hash_password(data.new_password),
+                "password": await hash_password_async(data.new_password),
                 "updated_at": datetime.utcnow()
             },
             "$unset": {"reset_token": "", "reset_token_expires": ""}
         }
     )
+    invalidate_user(user["_id"])
     
-    log_activity(user["_id"], "PASSWORD_RESET_COMPLETED")
+    await log_activity(user["_id"], "PASSWORD_RESET_COMPLETED")
     
     return {"message": "Password has been reset successfully"}
 
@@ -429,7 +452,7 @@ async def change_password(
     """Đổi mật khẩu (cần mật khẩu cũ)"""
     
     # Verify old password
-    if not verify_password(password_data.old_password, current_user["password"]):
+    if not await verify_password_async(password_data.old_password, current_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Mật khẩu cũ không đúng"
@@ -443,17 +466,18 @@ async def change_password(
         )
     
     # Update password
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {
             "$set": {
-                "password": hash_password(password_data.new_password),
+                "password": await hash_password_async(password_data.new_password),
                 "updated_at": datetime.utcnow()
             }
         }
     )
+    invalidate_user(current_user["_id"])
     
-    log_activity(current_user["_id"], "PASSWORD_CHANGED")
+    await log_activity(current_user["_id"], "PASSWORD_CHANGED")
     
     return {"message": "Mật khẩu đã được đổi thành công"}
 
@@ -468,15 +492,16 @@ async def update_profile(
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {"$set": update_data}
     )
+    invalidate_user(current_user["_id"])
     
-    log_activity(current_user["_id"], "PROFILE_UPDATED", update_data)
+    await log_activity(current_user["_id"], "PROFILE_UPDATED", update_data)
     
     # Get updated user
-    updated_user = users_collection.find_one({"_id": current_user["_id"]})
+    updated_user = await users_collection.find_one({"_id": current_user["_id"]})
     
     return UserResponse(
         id=updated_user["_id"],
@@ -499,23 +524,24 @@ async def add_address(
     """Thêm địa chỉ giao hàng mới"""
     
     address_dict = address.dict()
-    address_dict["id"] = f"addr_{get_next_sequence('addresses')}"
+    address_dict["id"] = f"addr_{await get_next_sequence('addresses')}"
     
     # If this is default address, unset others
     if address_dict.get("is_default"):
-        users_collection.update_one(
+        await users_collection.update_one(
             {"_id": current_user["_id"]},
             {"$set": {"addresses.$[].is_default": False}}
         )
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {"$push": {"addresses": address_dict}}
     )
+    invalidate_user(current_user["_id"])
     
-    log_activity(current_user["_id"], "ADDRESS_ADDED")
+    await log_activity(current_user["_id"], "ADDRESS_ADDED")
     
-    updated_user = users_collection.find_one({"_id": current_user["_id"]})
+    updated_user = await users_collection.find_one({"_id": current_user["_id"]})
     return UserResponse(
         id=updated_user["_id"],
         email=updated_user["email"],
@@ -535,14 +561,15 @@ async def delete_address(
 ):
     """Xóa địa chỉ giao hàng"""
     
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {"$pull": {"addresses": {"id": address_id}}}
     )
+    invalidate_user(current_user["_id"])
     
-    log_activity(current_user["_id"], "ADDRESS_DELETED", {"address_id": address_id})
+    await log_activity(current_user["_id"], "ADDRESS_DELETED", {"address_id": address_id})
     
-    updated_user = users_collection.find_one({"_id": current_user["_id"]})
+    updated_user = await users_collection.find_one({"_id": current_user["_id"]})
     return UserResponse(
         id=updated_user["_id"],
         email=updated_user["email"],
@@ -563,20 +590,21 @@ async def set_default_address(
     """Đặt địa chỉ mặc định"""
     
     # Unset all defaults
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"]},
         {"$set": {"addresses.$[].is_default": False}}
     )
     
     # Set new default
-    users_collection.update_one(
+    await users_collection.update_one(
         {"_id": current_user["_id"], "addresses.id": address_id},
         {"$set": {"addresses.$.is_default": True}}
     )
+    invalidate_user(current_user["_id"])
     
-    log_activity(current_user["_id"], "DEFAULT_ADDRESS_SET", {"address_id": address_id})
+    await log_activity(current_user["_id"], "DEFAULT_ADDRESS_SET", {"address_id": address_id})
     
-    updated_user = users_collection.find_one({"_id": current_user["_id"]})
+    updated_user = await users_collection.find_one({"_id": current_user["_id"]})
     return UserResponse(
         id=updated_user["_id"],
         email=updated_user["email"],
@@ -655,16 +683,16 @@ async def google_callback(code: str):
         return RedirectResponse(f"{FRONTEND_URL}/login?error=no_email")
 
     # 3. Kiểm tra User trong DB
-    user = users_collection.find_one({"email": email})
+    user = await users_collection.find_one({"email": email})
 
     if not user:
         # === USER CHƯA TỒN TẠI -> TẠO MỚI (AUTO REGISTER) ===
         try:
             # Tạo password ngẫu nhiên (User Google không cần biết password này)
             random_password = secrets.token_urlsafe(16)
-            hashed_pwd = hash_password(random_password)
+            hashed_pwd = await hash_password_async(random_password)
             
-            new_id = f"user_{get_next_sequence('users')}"
+            new_id = f"user_{await get_next_sequence('users')}"
             
             new_user = {
                 "_id": new_id,
@@ -680,11 +708,11 @@ async def google_callback(code: str):
                 "addresses": []
             }
             
-            users_collection.insert_one(new_user)
+            await users_collection.insert_one(new_user)
             user = new_user # Gán user mới để tạo token
             
-            log_activity(new_id, "USER_REGISTER_GOOGLE", {"email": email})
-            create_notification_safe(
+            await log_activity(new_id, "USER_REGISTER_GOOGLE", {"email": email})
+            await create_notification_safe(
                 user_id=new_id, type="system", title="Xin chào!", 
                 message="Chào mừng bạn đến với TechMart. Tài khoản đã được tạo qua Google."
             )
@@ -705,8 +733,9 @@ async def google_callback(code: str):
         if not user.get("avatar") and picture:
             update_fields["avatar"] = picture
             
-        users_collection.update_one({"_id": user["_id"]}, {"$set": update_fields})
-        log_activity(user["_id"], "USER_LOGIN_GOOGLE")
+        await users_collection.update_one({"_id": user["_id"]}, {"$set": update_fields})
+        invalidate_user(user["_id"])
+        await log_activity(user["_id"], "USER_LOGIN_GOOGLE")
 
     # 4. Tạo Access Token
     access_token = create_access_token(data={"sub": user["_id"]})
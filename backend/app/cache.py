@@ -0,0 +1,107 @@
+"""
+In-process TTL + LRU cache
+
+Dùng cho các dữ liệu đọc nhiều/ghi ít (product detail, related products, user đang đăng nhập).
+Mỗi entry hết hạn sau `ttl` giây; khi đầy thì bỏ entry ít dùng nhất.
+Chạy trong 1 event loop nên không cần lock.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import os
+import time
+
+class TTLCache:
+    """LRU cache có TTL, kèm bộ đếm hit/miss để monitor"""
+
+    def __init__(self, name: str, maxsize: int = 1000, ttl: float = 60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]):
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+# ==================== PRODUCT CACHES ====================
+
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "60"))
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "1000"))
+
+# product_id -> ProductResponse
+product_cache = TTLCache("product_detail", maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+# (product_id, limit) -> List[ProductResponse]
+related_products_cache = TTLCache("related_products", maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+
+def invalidate_product(product_id: str):
+    """
+    Xóa cache của 1 sản phẩm (gọi sau update/delete/approve/reject/đổi tồn kho).
+    Related list có thể chứa sản phẩm này ở bất kỳ key nào nên xóa toàn bộ.
+    """
+    product_cache.delete(product_id)
+    related_products_cache.clear()
+
+# ==================== USER CACHE ====================
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# user_id -> user document (dùng trong get_current_user)
+user_cache = TTLCache("current_user", maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def invalidate_user(user_id: str):
+    """Xóa cache của 1 user (gọi sau mọi update/delete trên users: profile, role, block, seller status...)"""
+    user_cache.delete(user_id)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Hit/miss của các cache"""
+    return {
+        "product_detail": product_cache.stats(),
+        "related_products": related_products_cache.stats(),
+        "current_user": user_cache.stats()
+    }
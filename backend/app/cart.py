@@ -34,17 +34,17 @@ async def get_cart(
     if session_id:
         query = {"$or": [{"user_id": current_user["_id"]}, {"session_id": session_id}]}
     
-    cart = carts_collection.find_one(query)
+    cart = await carts_collection.find_one(query)
     
     if not cart:
         # Create empty cart
         cart = {
-            "_id": f"cart_{get_next_sequence('carts')}",
+            "_id": f"cart_{await get_next_sequence('carts')}",
             "user_id": current_user["_id"],
             "items": [],
             "updated_at": datetime.utcnow()
         }
-        carts_collection.insert_one(cart)
+        await carts_collection.insert_one(cart)
     
     subtotal, total_items = calculate_cart_totals(cart.get("items", []))
     
@@ -72,7 +72,7 @@ async def add_to_cart(
     """
     
     # Get product
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     
     if not product:
         raise HTTPException(
@@ -88,16 +88,16 @@ async def add_to_cart(
         )
     
     # Get or create cart
-    cart = carts_collection.find_one({"user_id": current_user["_id"]})
+    cart = await carts_collection.find_one({"user_id": current_user["_id"]})
     
     if not cart:
         cart = {
-            "_id": f"cart_{get_next_sequence('carts')}",
+            "_id": f"cart_{await get_next_sequence('carts')}",
             "user_id": current_user["_id"],
             "items": [],
             "updated_at": datetime.utcnow()
         }
-        carts_collection.insert_one(cart)
+        await carts_collection.insert_one(cart)
     
     # Check if product already in cart
     items = cart.get("items", [])
@@ -110,7 +110,7 @@ async def add_to_cart(
     
     if existing_item:
         # Update quantity
-        carts_collection.update_one(
+        await carts_collection.update_one(
             {
                 "_id": cart["_id"],
                 "items.product_id": product_id,
@@ -130,7 +130,7 @@ async def add_to_cart(
             "price": product["price"]
         }
         
-        carts_collection.update_one(
+        await carts_collection.update_one(
             {"_id": cart["_id"]},
             {
                 "$push": {"items": new_item},
@@ -138,7 +138,7 @@ async def add_to_cart(
             }
         )
     
-    log_activity(current_user["_id"], "ADDED_TO_CART", {
+    await log_activity(current_user["_id"], "ADDED_TO_CART", {
         "product_id": product_id,
         "quantity": quantity
     })
@@ -155,7 +155,7 @@ async def update_cart(
     F16: Chỉnh sửa giỏ hàng
     """
     
-    cart = carts_collection.find_one({"user_id": current_user["_id"]})
+    cart = await carts_collection.find_one({"user_id": current_user["_id"]})
     
     if not cart:
         raise HTTPException(
@@ -165,7 +165,7 @@ async def update_cart(
     
     # Validate all products and stock
     for item in cart_update.items:
-        product = products_collection.find_one({"_id": item.product_id})
+        product = await products_collection.find_one({"_id": item.product_id})
         
         if not product:
             raise HTTPException(
@@ -182,7 +182,7 @@ async def update_cart(
     # Update cart
     items_dict = [item.dict() for item in cart_update.items]
     
-    carts_collection.update_one(
+    await carts_collection.update_one(
         {"_id": cart["_id"]},
         {
             "$set": {
@@ -192,7 +192,7 @@ async def update_cart(
         }
     )
     
-    log_activity(current_user["_id"], "CART_UPDATED")
+    await log_activity(current_user["_id"], "CART_UPDATED")
     
     return {"message": "Cart updated successfully"}
 
@@ -203,7 +203,7 @@ async def remove_from_cart(
 ):
     """Xóa sản phẩm khỏi giỏ hàng"""
     
-    result = carts_collection.update_one(
+    result = await carts_collection.update_one(
         {"user_id": current_user["_id"]},
         {
             "$pull": {"items": {"product_id": product_id}},
@@ -217,7 +217,7 @@ async def remove_from_cart(
             detail="Item not found in cart"
         )
     
-    log_activity(current_user["_id"], "REMOVED_FROM_CART", {"product_id": product_id})
+    await log_activity(current_user["_id"], "REMOVED_FROM_CART", {"product_id": product_id})
     
     return {"message": "Item removed from cart"}
 
@@ -225,7 +225,7 @@ async def remove_from_cart(
 async def clear_cart(current_user: dict = Depends(get_current_user)):
     """Xóa tất cả sản phẩm trong giỏ hàng"""
     
-    carts_collection.update_one(
+    await carts_collection.update_one(
         {"user_id": current_user["_id"]},
         {
             "$set": {
@@ -235,7 +235,7 @@ async def clear_cart(current_user: dict = Depends(get_current_user)):
         }
     )
     
-    log_activity(current_user["_id"], "CART_CLEARED")
+    await log_activity(current_user["_id"], "CART_CLEARED")
     
     return {"message": "Cart cleared successfully"}
 
@@ -252,7 +252,7 @@ async def validate_coupon(
     F17: Áp dụng mã giảm giá
     """
     
-    coupon = coupons_collection.find_one({"code": code.upper()})
+    coupon = await coupons_collection.find_one({"code": code.upper()})
     
     if not coupon:
         raise HTTPException(
@@ -311,11 +311,11 @@ async def get_available_coupons(current_user: dict = Depends(get_current_user)):
     
     now = datetime.utcnow()
     
-    coupons = list(coupons_collection.find({
+    coupons = await coupons_collection.find({
         "is_active": True,
         "valid_from": {"$lte": now},
         "valid_to": {"$gte": now}
-    }))
+    }).to_list(length=None)
     
     result = []
     for coupon in coupons:
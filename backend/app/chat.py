@@ -1,15 +1,21 @@
 """
 Chat API - Realtime messaging system
+
+Tin nhắn mới được push qua WebSocket (/api/chat/ws, xem chat_hub.py);
+các endpoint GET messages dùng để tải lịch sử khi mở chat.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, WebSocket, WebSocketDisconnect
+from fastapi import status as http_status
 from typing import List, Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
-import os
 
 from .database import messages_collection, conversations_collection, get_next_sequence
-from .auth import get_current_user, get_current_admin
+from .auth import get_current_user, get_current_admin, get_user_from_token
+from .models import UserRole
+from .chat_hub import chat_hub, publish_message, conversation_room, ADMIN_ROOM
+from .uploads import save_upload
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
@@ -33,14 +39,14 @@ async def get_my_conversation(current_user: dict = Depends(get_current_user)):
     """Get or create conversation for current user"""
     
     # Find existing conversation
-    conversation = conversations_collection.find_one({
+    conversation = await conversations_collection.find_one({
         "user_id": current_user["_id"]
     })
     
     if not conversation:
         # Create new conversation
         conversation = {
-            "_id": f"conv_{get_next_sequence('conversations')}",
+            "_id": f"conv_{await get_next_sequence('conversations')}",
             "user_id": current_user["_id"],
             "user_name": current_user.get("full_name") or current_user.get("name") or current_user["email"],
             "user_email": current_user["email"],
@@ -52,7 +58,7 @@ async def get_my_conversation(current_user: dict = Depends(get_current_user)):
             "last_message_at": datetime.utcnow(),
             "created_at": datetime.utcnow()
         }
-        conversations_collection.insert_one(conversation)
+        await conversations_collection.insert_one(conversation)
     
     conversation["id"] = conversation["_id"]
     return conversation
@@ -67,7 +73,7 @@ async def get_messages(
     """Get messages in a conversation"""
     
     # Verify user owns this conversation
-    conversation = conversations_collection.find_one({"_id": conversation_id})
+    conversation = await conversations_collection.find_one({"_id": conversation_id})
     if not conversation or conversation["user_id"] != current_user["_id"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -77,28 +83,30 @@ async def get_messages(
         query["created_at"] = {"$lt": datetime.fromisoformat(before)}
     
     # Get messages
-    messages = list(
+    messages = await (
         messages_collection
         .find(query)
         .sort("created_at", -1)
         .limit(limit)
+        .to_list(length=None)
     )
     
-    # Mark as read
-    messages_collection.update_many(
-        {
-            "conversation_id": conversation_id,
-            "sender_id": {"$ne": current_user["_id"]},
-            "is_read": False
-        },
-        {"$set": {"is_read": True}}
-    )
-    
-    # Reset unread count
-    conversations_collection.update_one(
-        {"_id": conversation_id},
-        {"$set": {"unread_count_user": 0}}
-    )
+    # Mark as read (bỏ qua khi không có tin chưa đọc)
+    if conversation.get("unread_count_user"):
+        await messages_collection.update_many(
+            {
+                "conversation_id": conversation_id,
+                "sender_id": {"$ne": current_user["_id"]},
+                "is_read": False
+            },
+            {"$set": {"is_read": True}}
+        )
+        
+        # Reset unread count
+        await conversations_collection.update_one(
+            {"_id": conversation_id},
+            {"$set": {"unread_count_user": 0}}
+        )
     
     # Format response
     for msg in messages:
@@ -117,7 +125,7 @@ async def send_message(
     """Send a message"""
     
     # Verify conversation
-    conversation = conversations_collection.find_one({"_id": conversation_id})
+    conversation = await conversations_collection.find_one({"_id": conversation_id})
     if not conversation or conversation["user_id"] != current_user["_id"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -126,20 +134,9 @@ async def send_message(
     if image:
         try:
             # Save image (simplified - in production use cloud storage)
-            upload_dir = "uploads/chat"
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Sanitize filename
-            safe_filename = "".join(c for c in image.filename if c.isalnum() or c in "._-")
-            filename = f"{int(datetime.utcnow().timestamp())}_{safe_filename}"
-            file_path = os.path.join(upload_dir, filename)
-            
-            with open(file_path, "wb") as f:
-                content = await image.read()
-                f.write(content)
-            
-            # Return URL that can be accessed via static files
-            image_url = f"http://localhost:8000/uploads/chat/{filename}"
+            image_url = (await save_upload(image, "chat"))["url"]
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"[ERROR] Image upload failed: {e}")
             # Continue without image
@@ -148,7 +145,7 @@ async def send_message(
     try:
         vn_now = datetime.utcnow() + timedelta(hours=7)
         message = {
-            "_id": f"msg_{get_next_sequence('messages')}",
+            "_id": f"msg_{await get_next_sequence('messages')}",
             "conversation_id": conversation_id,
             "sender_id": current_user["_id"],
             "sender_name": current_user.get("full_name") or current_user.get("name") or current_user["email"],
@@ -160,7 +157,7 @@ async def send_message(
             "created_at": vn_now
         }
         
-        result = messages_collection.insert_one(message)
+        result = await messages_collection.insert_one(message)
         if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to save message")
             
@@ -170,7 +167,7 @@ async def send_message(
     
     # Update conversation
     try:
-        conversations_collection.update_one(
+        await conversations_collection.update_one(
             {"_id": conversation_id},
             {
                 "$set": {
@@ -185,8 +182,49 @@ async def send_message(
         # Don't fail the request for this
     
     message["id"] = message["_id"]
+    
+    # Push realtime tới user + admin đang kết nối WebSocket
+    await publish_message(message)
+    
     return message
 
+# ==================== WEBSOCKET ====================
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Kênh realtime: server push {"type": "message", "message": {...}} khi có tin nhắn mới.
+    Browser không gửi được header Authorization nên token truyền qua query (?token=...).
+    User nhận tin của conversation của mình, admin nhận tin của mọi conversation.
+    Client gửi "ping" để giữ kết nối, server trả "pong".
+    """
+    
+    user = await get_user_from_token(token)
+    if user is None:
+        await websocket.close(code=http_status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    if user.get("role") == UserRole.ADMIN:
+        room = ADMIN_ROOM
+    else:
+        # Conversation được tạo qua GET /conversations/my trước khi mở socket
+        conversation = await conversations_collection.find_one({"user_id": user["_id"]}, {"_id": 1})
+        if not conversation:
+            await websocket.close(code=http_status.WS_1008_POLICY_VIOLATION)
+            return
+        room = conversation_room(conversation["_id"])
+    
+    await websocket.accept()
+    chat_hub.join(room, websocket)
+    try:
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_text("pong")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_hub.leave(room, websocket)
+
 # ==================== ADMIN ENDPOINTS ====================
 
 @router.get("/admin/conversations")
@@ -200,10 +238,11 @@ async def get_all_conversations(
     if status:
         query["status"] = status
     
-    conversations = list(
+    conversations = await (
         conversations_collection
         .find(query)
         .sort("last_message_at", -1)
+        .to_list(length=None)
     )
     
     for conv in conversations:
@@ -219,28 +258,31 @@ async def admin_get_messages(
 ):
     """Get messages (Admin)"""
     
-    messages = list(
+    messages = await (
         messages_collection
         .find({"conversation_id": conversation_id})
         .sort("created_at", -1)
         .limit(limit)
+        .to_list(length=None)
     )
     
-    # Mark as read
-    messages_collection.update_many(
-        {
-            "conversation_id": conversation_id,
-            "sender_role": "user",
-            "is_read": False
-        },
-        {"$set": {"is_read": True}}
-    )
-    
-    # Reset unread count
-    conversations_collection.update_one(
-        {"_id": conversation_id},
-        {"$set": {"unread_count_admin": 0}}
-    )
+    # Mark as read (bỏ qua khi không có tin chưa đọc)
+    conversation = await conversations_collection.find_one({"_id": conversation_id}, {"unread_count_admin": 1})
+    if conversation and conversation.get("unread_count_admin"):
+        await messages_collection.update_many(
+            {
+                "conversation_id": conversation_id,
+                "sender_role": "user",
+                "is_read": False
+            },
+            {"$set": {"is_read": True}}
+        )
+        
+        # Reset unread count
+        await conversations_collection.update_one(
+            {"_id": conversation_id},
+            {"$set": {"unread_count_admin": 0}}
+        )
     
     for msg in messages:
         msg["id"] = msg["_id"]
@@ -261,20 +303,9 @@ async def admin_send_message(
     image_url = None
     if image:
         try:
-            upload_dir = "uploads/chat"
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Sanitize filename
-            safe_filename = "".join(c for c in image.filename if c.isalnum() or c in "._-")
-            filename = f"{int(datetime.utcnow().timestamp())}_{safe_filename}"
-            file_path = os.path.join(upload_dir, filename)
-            
-            with open(file_path, "wb") as f:
-                content = await image.read()
-                f.write(content)
-            
-            # Return URL that can be accessed via static files
-            image_url = f"http://localhost:8000/uploads/chat/{filename}"
+            image_url = (await save_upload(image, "chat"))["url"]
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"[ERROR] Admin image upload failed: {e}")
             # Continue without image
@@ -283,7 +314,7 @@ async def admin_send_message(
     try:
         vn_now = datetime.utcnow() + timedelta(hours=7)
         message = {
-            "_id": f"msg_{get_next_sequence('messages')}",
+            "_id": f"msg_{await get_next_sequence('messages')}",
             "conversation_id": conversation_id,
             "sender_id": current_user["_id"],
             "sender_name": "Admin",
@@ -295,7 +326,7 @@ async def admin_send_message(
             "created_at": vn_now
         }
         
-        result = messages_collection.insert_one(message)
+        result = await messages_collection.insert_one(message)
         if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to save admin message")
             
@@ -305,7 +336,7 @@ async def admin_send_message(
     
     # Update conversation
     try:
-        conversations_collection.update_one(
+        await conversations_collection.update_one(
             {"_id": conversation_id},
             {
                 "$set": {
@@ -321,8 +352,17 @@ async def admin_send_message(
         # Don't fail the request for this
     
     message["id"] = message["_id"]
+    
+    # Push realtime tới user + admin đang kết nối WebSocket
+    await publish_message(message)
+    
     return message
 
+@router.get("/admin/ws-stats")
+async def get_websocket_stats(current_user: dict = Depends(get_current_admin)):
+    """Số room / connection WebSocket đang mở (monitoring)"""
+    return chat_hub.stats()
+
 @router.put("/admin/conversations/{conversation_id}/status")
 async def update_conversation_status(
     conversation_id: str,
@@ -331,7 +371,7 @@ async def update_conversation_status(
 ):
     """Update conversation status"""
     
-    conversations_collection.update_one(
+    await conversations_collection.update_one(
         {"_id": conversation_id},
         {"$set": {"status": status}}
     )
@@ -0,0 +1,66 @@
+"""
+Chat hub: quản lý WebSocket connection theo room để push tin nhắn realtime
+
+Room:
+  - conversation:{conversation_id}  user (mọi tab) của conversation đó
+  - admins                          tất cả admin đang mở trang chat
+Tin nhắn được push ngay sau khi lưu vào DB nên client không cần polling.
+Hub nằm trong process: khi chạy nhiều worker, client chỉ nhận tin từ worker
+mà nó đang kết nối (cần pub/sub ngoài, ví dụ Redis, nếu scale ngang).
+"""
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+from typing import Dict, Set
+import asyncio
+
+ADMIN_ROOM = "admins"
+
+def conversation_room(conversation_id: str) -> str:
+    return f"conversation:{conversation_id}"
+
+class ChatHub:
+    """Danh sách WebSocket theo room, broadcast JSON tới cả room"""
+
+    def __init__(self):
+        self._rooms: Dict[str, Set[WebSocket]] = {}
+
+    def join(self, room: str, websocket: WebSocket):
+        self._rooms.setdefault(room, set()).add(websocket)
+
+    def leave(self, room: str, websocket: WebSocket):
+        connections = self._rooms.get(room)
+        if connections is None:
+            return
+        connections.discard(websocket)
+        if not connections:
+            del self._rooms[room]
+
+    async def broadcast(self, room: str, payload: dict):
+        """Gửi payload tới mọi connection trong room, bỏ các connection đã chết"""
+        connections = list(self._rooms.get(room, ()))
+        if not connections:
+            return
+
+        data = jsonable_encoder(payload)
+        results = await asyncio.gather(
+            *(websocket.send_json(data) for websocket in connections),
+            return_exceptions=True
+        )
+        for websocket, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.leave(room, websocket)
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self._rooms),
+            "connections": sum(len(connections) for connections in self._rooms.values()),
+            "admins": len(self._rooms.get(ADMIN_ROOM, ()))
+        }
+
+chat_hub = ChatHub()
+
+async def publish_message(message: dict):
+    """Push tin nhắn mới tới user của conversation và tất cả admin"""
+    payload = {"type": "message", "message": message}
+    await chat_hub.broadcast(conversation_room(message["conversation_id"]), payload)
+    await chat_hub.broadcast(ADMIN_ROOM, payload)
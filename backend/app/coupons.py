@@ -25,7 +25,7 @@ async def create_coupon(
     """
     
     # Check if code already exists
-    if coupons_collection.find_one({"code": coupon.code.upper()}):
+    if await coupons_collection.find_one({"code": coupon.code.upper()}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Mã giảm giá đã tồn tại"
@@ -64,13 +64,13 @@ async def create_coupon(
             )
     
     coupon_dict = coupon.dict()
-    coupon_dict["_id"] = f"coupon_{get_next_sequence('coupons')}"
+    coupon_dict["_id"] = f"coupon_{await get_next_sequence('coupons')}"
     coupon_dict["code"] = coupon_dict["code"].upper()
     coupon_dict["created_at"] = datetime.utcnow()
     
-    coupons_collection.insert_one(coupon_dict)
+    await coupons_collection.insert_one(coupon_dict)
     
-    log_activity(current_user["_id"], "COUPON_CREATED", {
+    await log_activity(current_user["_id"], "COUPON_CREATED", {
         "coupon_id": coupon_dict["_id"],
         "code": coupon_dict["code"]
     })
@@ -95,12 +95,13 @@ async def get_coupons(
     
     skip = (page - 1) * limit
     
-    coupons = list(
+    coupons = await (
         coupons_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -121,16 +122,17 @@ async def get_active_coupons(
     now = datetime.utcnow()
     
     # Get all coupons for debugging
-    all_coupons = list(coupons_collection.find({}))
+    all_coupons = await coupons_collection.find({}).to_list(length=None)
     print(f"\n📊 Total coupons in DB: {len(all_coupons)}")
     
     # Filter active coupons
-    coupons = list(
+    coupons = await (
         coupons_collection.find({
             "is_active": True,
             "valid_from": {"$lte": now},
             "valid_to": {"$gte": now}
         })
+        .to_list(length=None)
     )
     
     print(f"✅ Active coupons (after date filter): {len(coupons)}")
@@ -158,7 +160,7 @@ async def get_coupon(
     Lấy chi tiết mã giảm giá (Admin only)
     """
     
-    coupon = coupons_collection.find_one({"_id": coupon_id})
+    coupon = await coupons_collection.find_one({"_id": coupon_id})
     
     if not coupon:
         raise HTTPException(
@@ -179,7 +181,7 @@ async def update_coupon(
     Cập nhật mã giảm giá (Admin only)
     """
     
-    coupon = coupons_collection.find_one({"_id": coupon_id})
+    coupon = await coupons_collection.find_one({"_id": coupon_id})
     
     if not coupon:
         raise HTTPException(
@@ -190,17 +192,17 @@ async def update_coupon(
     update_data = {k: v for k, v in coupon_update.dict().items() if v is not None}
     
     if update_data:
-        coupons_collection.update_one(
+        await coupons_collection.update_one(
             {"_id": coupon_id},
             {"$set": update_data}
         )
         
-        log_activity(current_user["_id"], "COUPON_UPDATED", {
+        await log_activity(current_user["_id"], "COUPON_UPDATED", {
             "coupon_id": coupon_id,
             "code": coupon["code"]
         })
     
-    updated_coupon = coupons_collection.find_one({"_id": coupon_id})
+    updated_coupon = await coupons_collection.find_one({"_id": coupon_id})
     updated_coupon["id"] = updated_coupon["_id"]
     return CouponResponse(**updated_coupon)
 
@@ -213,7 +215,7 @@ async def delete_coupon(
     Xóa mã giảm giá (Admin only)
     """
     
-    coupon = coupons_collection.find_one({"_id": coupon_id})
+    coupon = await coupons_collection.find_one({"_id": coupon_id})
     
     if not coupon:
         raise HTTPException(
@@ -221,9 +223,9 @@ async def delete_coupon(
             detail="Không tìm thấy mã giảm giá"
         )
     
-    coupons_collection.delete_one({"_id": coupon_id})
+    await coupons_collection.delete_one({"_id": coupon_id})
     
-    log_activity(current_user["_id"], "COUPON_DELETED", {
+    await log_activity(current_user["_id"], "COUPON_DELETED", {
         "coupon_id": coupon_id,
         "code": coupon["code"]
     })
@@ -245,7 +247,7 @@ async def validate_coupon(
     """
     cart_items = request_body.cart_items
     
-    coupon = coupons_collection.find_one({"code": code.upper()})
+    coupon = await coupons_collection.find_one({"code": code.upper()})
     
     if not coupon:
         raise HTTPException(
@@ -282,7 +284,7 @@ async def validate_coupon(
     
     # Check usage per user
     if coupon.get("usage_per_user"):
-        user_usage = orders_collection.count_documents({
+        user_usage = await orders_collection.count_documents({
             "user_id": current_user["_id"],
             "coupon_code": code.upper()
         })
@@ -296,7 +298,7 @@ async def validate_coupon(
     target_type = coupon.get("target_type", "all")
     if target_type == "new_user":
         # Check if user is new (no previous orders)
-        order_count = orders_collection.count_documents({"user_id": current_user["_id"]})
+        order_count = await orders_collection.count_documents({"user_id": current_user["_id"]})
         if order_count > 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -304,7 +306,7 @@ async def validate_coupon(
             )
     elif target_type == "vip":
         # Check if user is VIP (total spent > 50M)
-        user_orders = list(orders_collection.find({"user_id": current_user["_id"]}))
+        user_orders = await orders_collection.find({"user_id": current_user["_id"]}).to_list(length=None)
         total_spent = sum(float(order.get("total", 0)) for order in user_orders)
         if total_spent < 50000000:
             raise HTTPException(
@@ -317,7 +319,7 @@ async def validate_coupon(
         if target_ids:
             valid_items = []
             for item in cart_items:
-                product = products_collection.find_one({"_id": item["product_id"]})
+                product = await products_collection.find_one({"_id": item["product_id"]})
                 if product:
                     if target_type == "category" and product.get("category_id") in target_ids:
                         valid_items.append(item)
@@ -417,13 +419,14 @@ async def get_auto_apply_coupons(
     now = datetime.utcnow()
     
     # Tìm các mã có thể áp dụng
-    applicable_coupons = list(
+    applicable_coupons = await (
         coupons_collection.find({
             "is_active": True,
             "is_auto_apply": True,
             "valid_from": {"$lte": now},
             "valid_to": {"$gte": now}
         }).sort("priority", -1)
+        .to_list(length=None)
     )
     
     best_coupon = None
@@ -464,18 +467,18 @@ async def get_coupon_stats(
     Thống kê mã giảm giá nâng cao
     """
     
-    total_coupons = coupons_collection.count_documents({})
-    active_coupons = coupons_collection.count_documents({"is_active": True})
+    total_coupons = await coupons_collection.count_documents({})
+    active_coupons = await coupons_collection.count_documents({"is_active": True})
     
     now = datetime.utcnow()
-    valid_coupons = coupons_collection.count_documents({
+    valid_coupons = await coupons_collection.count_documents({
         "is_active": True,
         "valid_from": {"$lte": now},
         "valid_to": {"$gte": now}
     })
     
     # Get all coupons with usage
-    all_coupons = list(coupons_collection.find({}))
+    all_coupons = await coupons_collection.find({}).to_list(length=None)
     
     # Calculate total discount given
     total_discount_given = 0
@@ -483,7 +486,7 @@ async def get_coupon_stats(
     
     for coupon in all_coupons:
         # Find orders using this coupon
-        orders_with_coupon = list(orders_collection.find({"coupon_code": coupon["code"]}))
+        orders_with_coupon = await orders_collection.find({"coupon_code": coupon["code"]}).to_list(length=None)
         
         for order in orders_with_coupon:
             discount = order.get("discount", 0)
@@ -492,17 +495,18 @@ async def get_coupon_stats(
             coupon_usage_by_type[coupon["discount_type"]]["discount"] += discount
     
     # Get most used coupons
-    most_used = list(
+    most_used = await (
         coupons_collection
         .find({})
         .sort("used_count", -1)
         .limit(10)
+        .to_list(length=None)
     )
     
     most_used_list = []
     for coupon in most_used:
         # Calculate revenue impact
-        orders_with_coupon = list(orders_collection.find({"coupon_code": coupon["code"]}))
+        orders_with_coupon = await orders_collection.find({"coupon_code": coupon["code"]}).to_list(length=None)
         total_orders = len(orders_with_coupon)
         total_revenue = sum(order.get("total", 0) for order in orders_with_coupon)
         total_discount = sum(order.get("discount", 0) for order in orders_with_coupon)
@@ -522,7 +526,7 @@ async def get_coupon_stats(
     
     # Get expiring soon coupons (within 7 days)
     from datetime import timedelta
-    expiring_soon = list(
+    expiring_soon = await (
         coupons_collection.find({
             "is_active": True,
             "valid_to": {
@@ -530,6 +534,7 @@ async def get_coupon_stats(
                 "$lte": now + timedelta(days=7)
             }
         })
+        .to_list(length=None)
     )
     
     # Get best performing coupons (by revenue)
@@ -568,7 +573,7 @@ async def debug_all_coupons(
     now = datetime.utcnow()
     
     # Get all coupons
-    all_coupons = list(coupons_collection.find({}))
+    all_coupons = await coupons_collection.find({}).to_list(length=None)
     
     result = []
     for coupon in all_coupons:
@@ -627,7 +632,7 @@ async def get_coupon_performance(
     Thống kê hiệu suất chi tiết của một mã giảm giá
     """
     
-    coupon = coupons_collection.find_one({"_id": coupon_id})
+    coupon = await coupons_collection.find_one({"_id": coupon_id})
     
     if not coupon:
         raise HTTPException(
@@ -636,7 +641,7 @@ async def get_coupon_performance(
         )
     
     # Get all orders using this coupon
-    orders = list(orders_collection.find({"coupon_code": coupon["code"]}))
+    orders = await orders_collection.find({"coupon_code": coupon["code"]}).to_list(length=None)
     
     # Calculate metrics
     total_orders = len(orders)
@@ -655,10 +660,10 @@ async def get_coupon_performance(
     # Customer segments
     customer_segments = defaultdict(int)
     for order in orders:
-        user = users_collection.find_one({"_id": order["user_id"]})
+        user = await users_collection.find_one({"_id": order["user_id"]})
         if user:
             # Check if new customer
-            user_orders = orders_collection.count_documents({"user_id": user["_id"]})
+            user_orders = await orders_collection.count_documents({"user_id": user["_id"]})
             if user_orders == 1:
                 customer_segments["new"] += 1
             else:
@@ -668,7 +673,7 @@ async def get_coupon_performance(
     category_impact = defaultdict(lambda: {"orders": 0, "revenue": 0})
     for order in orders:
         for item in order.get("items", []):
-            product = products_collection.find_one({"_id": item["product_id"]})
+            product = await products_collection.find_one({"_id": item["product_id"]})
             if product:
                 cat_id = product.get("category_id")
                 if cat_id:
@@ -1,13 +1,24 @@
 from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from .notification_stream import publish_notification
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = MongoClient(MONGO_URI)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "200"))
+
+# Async client dùng cho toàn bộ routers (không block event loop)
+client = AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
 db = client["ecommert"]  # Sử dụng database có sẵn
 
+# Sync client chỉ dùng khi khởi động (tạo indexes) và cho các script seed/migration
+sync_client = MongoClient(MONGO_URI)
+sync_db = sync_client["ecommert"]
+
 # ==================== COLLECTIONS ====================
 users_collection = db["users"]
 products_collection = db["products"]
@@ -22,10 +33,28 @@ addresses_collection = db["addresses"]
 activity_logs_collection = db["activity_logs"]
 conversations_collection = db["conversations"]  # For live chat
 messages_collection = db["messages"]  # For live chat
+order_rollups_collection = db["order_rollups"]  # Pre-aggregated dashboard metrics
 
 # ==================== INDEXES ====================
+
+# sort_by được phép khi phân trang cursor sản phẩm: mỗi field có index (field, _id)
+PRODUCT_CURSOR_SORT_FIELDS = ("created_at", "price", "rating", "sold_count")
+
 def create_indexes():
     """Tạo indexes để tối ưu query performance"""
+    users_collection = sync_db["users"]
+    products_collection = sync_db["products"]
+    categories_collection = sync_db["categories"]
+    orders_collection = sync_db["orders"]
+    reviews_collection = sync_db["reviews"]
+    carts_collection = sync_db["carts"]
+    wishlists_collection = sync_db["wishlists"]
+    coupons_collection = sync_db["coupons"]
+    notifications_collection = sync_db["notifications"]
+    activity_logs_collection = sync_db["activity_logs"]
+    conversations_collection = sync_db["conversations"]
+    messages_collection = sync_db["messages"]
+    order_rollups_collection = sync_db["order_rollups"]
     
     # Users indexes
     users_collection.create_index([("email", ASCENDING)], unique=True)
@@ -38,6 +67,11 @@ def create_indexes():
     products_collection.create_index([("price", ASCENDING)])
     products_collection.create_index([("rating", DESCENDING)])
     products_collection.create_index([("created_at", DESCENDING)])
+    for field in PRODUCT_CURSOR_SORT_FIELDS:
+        products_collection.create_index([(field, DESCENDING), ("_id", DESCENDING)])  # Cursor pagination
+    products_collection.create_index([
+        ("approval_status", ASCENDING), ("category_id", ASCENDING), ("created_at", DESCENDING)
+    ])  # Public catalog queries
     products_collection.create_index([("is_featured", DESCENDING)])
     products_collection.create_index([("is_on_sale", DESCENDING)])
     
@@ -51,6 +85,9 @@ def create_indexes():
     orders_collection.create_index([("status", ASCENDING)])
     orders_collection.create_index([("created_at", DESCENDING)])
     orders_collection.create_index([("payment_status", ASCENDING)])
+    orders_collection.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])  # Cursor pagination
+    orders_collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+    orders_collection.create_index([("items.seller_id", ASCENDING), ("created_at", DESCENDING)])  # Seller stats
     
     # Reviews indexes
     reviews_collection.create_index([("product_id", ASCENDING)])
@@ -76,6 +113,7 @@ def create_indexes():
     notifications_collection.create_index([("user_id", ASCENDING)])
     notifications_collection.create_index([("is_read", ASCENDING)])
     notifications_collection.create_index([("created_at", DESCENDING)])
+    notifications_collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
     
     # Activity Logs indexes
     activity_logs_collection.create_index([("user_id", ASCENDING)])
@@ -88,6 +126,9 @@ def create_indexes():
     messages_collection.create_index([("conversation_id", ASCENDING)])
     messages_collection.create_index([("created_at", ASCENDING)])
     
+    # Order rollup indexes
+    order_rollups_collection.create_index([("granularity", ASCENDING), ("bucket", ASCENDING)])
+    
     print("[OK] All indexes created successfully!")
 
 # ==================== INITIAL SETUP ====================
@@ -96,26 +137,93 @@ def create_default_collections():
     collections_should_have = [
         "users", "products", "categories", "orders", "reviews",
         "carts", "wishlists", "coupons", "notifications", "addresses",
-        "activity_logs", "conversations", "messages"
+        "activity_logs", "conversations", "messages", "order_rollups"
     ]
     
-    existing_collections = db.list_collection_names()
+    existing_collections = sync_db.list_collection_names()
     
     for name in collections_should_have:
         if name not in existing_collections:
-            db.create_collection(name)
+            sync_db.create_collection(name)
             print(f"[OK] Created collection: {name}")
     
     # Create indexes
     create_indexes()
+    
+    # Sản phẩm cũ chưa có approval_status sẽ không hiển thị public
+    legacy_count = sync_db["products"].count_documents({"approval_status": None})
+    if legacy_count:
+        print(f"[WARNING] {legacy_count} products have no approval_status. Run: python migrate_approval_status.py")
+    
+    # Dashboard đọc từ order_rollups, cần build lại từ orders lần đầu
+    if not sync_db["order_rollups"].find_one({}) and sync_db["orders"].find_one({}):
+        print("[WARNING] order_rollups is empty. Run: python rebuild_order_rollups.py")
+    
+    # Thống kê seller dựa vào items.seller_id, order cũ cần backfill
+    if sync_db["orders"].find_one({"items": {"$elemMatch": {"seller_id": {"$exists": False}}}}):
+        print("[WARNING] Some orders have items without seller_id. Run: python backfill_order_seller_ids.py")
+    
+    # Rating sản phẩm cập nhật incremental từ rating_stats, review cũ cần backfill
+    if sync_db["reviews"].find_one({}) and not sync_db["products"].find_one({"rating_stats": {"$exists": True}}):
+        print("[WARNING] Products have no rating_stats yet. Run: python backfill_rating_stats.py")
 
 # Run setup
 create_default_collections()
 
 # ==================== HELPER FUNCTIONS ====================
-def get_next_sequence(collection_name: str) -> int:
-    """Generate auto-increment ID for collections"""
-    counter = db["counters"].find_one_and_update(
+_transactions_supported = None
+
+async def supports_transactions() -> bool:
+    """Kiểm tra MongoDB có hỗ trợ multi-document transaction (replica set / mongos), cache kết quả"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            print(f"[WARNING] Could not detect transaction support: {e}")
+            _transactions_supported = False
+        if not _transactions_supported:
+            print("[WARNING] MongoDB is standalone - checkout falls back to compensating writes")
+    return _transactions_supported
+
+async def reserve_sequence_range(collection_name: str, count: int) -> int:
+    """Reserve `count` ID liên tiếp trong 1 lần $inc, trả về ID đầu tiên"""
+    counter = await db["counters"].find_one_and_update(
+        {"_id": collection_name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=True
+    )
+    return counter["seq"] - count + 1
+
+# Hi/lo allocator: mỗi process reserve 1 block ID từ counters rồi cấp dần từ bộ nhớ.
+# ID vẫn unique giữa các process (mỗi block là 1 lần $inc), chỉ có thể có khoảng trống khi restart.
+SEQUENCE_BLOCK_SIZE = max(1, int(os.getenv("SEQUENCE_BLOCK_SIZE", "1000")))
+
+_sequence_blocks = {}  # collection_name -> [next_id, last_id]
+_sequence_locks = {}
+
+async def get_next_sequence(collection_name: str) -> int:
+    """Generate auto-increment ID for collections (1 round trip mỗi SEQUENCE_BLOCK_SIZE ID)"""
+    block = _sequence_blocks.get(collection_name)
+    if block is None or block[0] > block[1]:
+        lock = _sequence_locks.setdefault(collection_name, asyncio.Lock())
+        async with lock:
+            # Coroutine khác có thể đã nạp block mới trong lúc chờ lock
+            block = _sequence_blocks.get(collection_name)
+            if block is None or block[0] > block[1]:
+                first_id = await reserve_sequence_range(collection_name, SEQUENCE_BLOCK_SIZE)
+                block = [first_id, first_id + SEQUENCE_BLOCK_SIZE - 1]
+                _sequence_blocks[collection_name] = block
+    
+    next_id = block[0]
+    block[0] += 1
+    return next_id
+
+def get_next_sequence_sync(collection_name: str) -> int:
+    """Bản sync của get_next_sequence cho các script seed/migration"""
+    counter = sync_db["counters"].find_one_and_update(
         {"_id": collection_name},
         {"$inc": {"seq": 1}},
         upsert=True,
@@ -123,24 +231,98 @@ def get_next_sequence(collection_name: str) -> int:
     )
     return counter["seq"]
 
-def log_activity(user_id: str, action: str, details: dict = None):
+# ==================== ACTIVITY LOG WRITER ====================
+# log_activity chỉ đưa entry vào buffer; writer nền flush bằng insert_many khi đủ
+# ACTIVITY_LOG_BATCH_SIZE entry hoặc sau ACTIVITY_LOG_FLUSH_INTERVAL giây.
+# Khi buffer chạm ACTIVITY_LOG_MAX_BUFFER thì request tự flush (backpressure).
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "100"))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "2"))
+ACTIVITY_LOG_MAX_BUFFER = int(os.getenv("ACTIVITY_LOG_MAX_BUFFER", "10000"))
+
+_activity_buffer = []
+_activity_flush_event = None
+_activity_flush_task = None
+_activity_flush_lock = asyncio.Lock()
+
+async def flush_activity_logs() -> int:
+    """Ghi toàn bộ activity log đang buffer bằng 1 insert_many"""
+    global _activity_buffer
+    
+    async with _activity_flush_lock:
+        if not _activity_buffer:
+            return 0
+        
+        batch, _activity_buffer = _activity_buffer, []
+        try:
+            await activity_logs_collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            print(f"[WARNING] Failed to flush {len(batch)} activity logs: {e}")
+            # Trả lại buffer để flush lần sau, bỏ bớt entry cũ nhất nếu vượt giới hạn
+            _activity_buffer = batch + _activity_buffer
+            overflow = len(_activity_buffer) - ACTIVITY_LOG_MAX_BUFFER
+            if overflow > 0:
+                del _activity_buffer[:overflow]
+                print(f"[WARNING] Dropped {overflow} activity logs (buffer full)")
+            return 0
+        return len(batch)
+
+async def _activity_log_flush_loop():
+    while True:
+        try:
+            await asyncio.wait_for(_activity_flush_event.wait(), timeout=ACTIVITY_LOG_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _activity_flush_event.clear()
+        await flush_activity_logs()
+
+def start_activity_log_writer():
+    """Khởi động writer nền (gọi ở startup)"""
+    global _activity_flush_event, _activity_flush_task
+    if _activity_flush_task is None:
+        _activity_flush_event = asyncio.Event()
+        _activity_flush_task = asyncio.create_task(_activity_log_flush_loop())
+
+async def stop_activity_log_writer():
+    """Dừng writer và flush phần còn lại (gọi ở shutdown)"""
+    global _activity_flush_task
+    if _activity_flush_task is not None:
+        _activity_flush_task.cancel()
+        try:
+            await _activity_flush_task
+        except asyncio.CancelledError:
+            pass
+        _activity_flush_task = None
+    await flush_activity_logs()
+
+async def log_activity(user_id: str, action: str, details: dict = None):
     """Log user activities"""
-    activity_logs_collection.insert_one({
+    entry = {
         "user_id": user_id,
         "action": action,
         "details": details or {},
         "timestamp": datetime.utcnow(),
         "ip_address": None,  # Can be added from request
         "user_agent": None   # Can be added from request
-    })
+    }
+    
+    # Writer chưa chạy (script, test): ghi thẳng
+    if _activity_flush_task is None:
+        await activity_logs_collection.insert_one(entry)
+        return
+    
+    _activity_buffer.append(entry)
+    if len(_activity_buffer) >= ACTIVITY_LOG_MAX_BUFFER:
+        await flush_activity_logs()
+    elif len(_activity_buffer) >= ACTIVITY_LOG_BATCH_SIZE:
+        _activity_flush_event.set()
 
-def create_notification_safe(user_id: str, type: str, title: str, message: str, link: str = None, max_retries: int = 5) -> bool:
+async def create_notification_safe(user_id: str, type: str, title: str, message: str, link: str = None, max_retries: int = 5) -> bool:
     """Tạo notification an toàn với retry logic để tránh duplicate key errors"""
     for attempt in range(max_retries):
         try:
-            notif_id = f"notif_{get_next_sequence('notifications')}"
+            notif_id = f"notif_{await get_next_sequence('notifications')}"
             # Check if ID already exists
-            if notifications_collection.find_one({"_id": notif_id}):
+            if await notifications_collection.find_one({"_id": notif_id}):
                 if attempt < max_retries - 1:
                     continue
                 else:
@@ -160,8 +342,9 @@ def create_notification_safe(user_id: str, type: str, title: str, message: str,
             if link:
                 notification_data["link"] = link
             
-            result = notifications_collection.insert_one(notification_data)
+            result = await notifications_collection.insert_one(notification_data)
             if result.inserted_id:
+                publish_notification(notification_data)
                 return True
             else:
                 if attempt < max_retries - 1:
@@ -177,4 +360,45 @@ def create_notification_safe(user_id: str, type: str, title: str, message: str,
             else:
                 print(f"[WARNING] Error creating notification: {e}")
                 return False
-    return False
\ No newline at end of file
+    return False
+
+async def create_notifications_bulk(user_ids: list, type: str, title: str, message: str, link: str = None) -> int:
+    """Tạo cùng 1 notification cho nhiều user bằng 1 insert_many, trả về số bản ghi đã tạo"""
+    if not user_ids:
+        return 0
+    
+    first_id = await reserve_sequence_range("notifications", len(user_ids))
+    vn_now = datetime.utcnow() + timedelta(hours=7)
+    
+    notifications = []
+    for offset, user_id in enumerate(user_ids):
+        notification_data = {
+            "_id": f"notif_{first_id + offset}",
+            "user_id": user_id,
+            "type": type,
+            "title": title,
+            "message": message,
+            "is_read": False,
+            "created_at": vn_now
+        }
+        if link:
+            notification_data["link"] = link
+        notifications.append(notification_data)
+    
+    try:
+        await notifications_collection.insert_many(notifications, ordered=False)
+        failed = set()
+    except BulkWriteError as e:
+        # ordered=False: các bản ghi không trùng key vẫn được insert
+        print(f"[WARNING] Some notifications were not created: {len(e.details.get('writeErrors', []))} errors")
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+    
+    for index, notification_data in enumerate(notifications):
+        if index not in failed:
+            publish_notification(notification_data)
+    return len(notifications) - len(failed)
+
+async def notify_admins(type: str, title: str, message: str, link: str = None) -> int:
+    """Gửi notification cho tất cả admin (1 query lấy admin + 1 insert_many)"""
+    admins = await users_collection.find({"role": "admin"}, {"_id": 1}).to_list(length=None)
+    return await create_notifications_bulk([admin["_id"] for admin in admins], type, title, message, link)
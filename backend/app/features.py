@@ -1,7 +1,11 @@
 
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
 
 from .models import (
     ReviewCreate, ReviewUpdate, ReviewResponse,
@@ -13,7 +17,12 @@ from .database import (
     products_collection, orders_collection, users_collection,
     get_next_sequence, log_activity, create_notification_safe
 )
-from .auth import get_current_user, get_current_admin
+from .auth import get_current_user, get_current_admin, get_user_from_token
+from .ratings import record_review_added, record_review_removed, record_review_rating_changed
+from .pagination import apply_cursor, cursor_sort, set_next_cursor
+from .notification_stream import (
+    notification_broker, publish_unread_delta, publish_unread_count, NOTIFICATION_STREAM_HEARTBEAT
+)
 
 router = APIRouter(prefix="/api", tags=["Reviews, Wishlist & Notifications"])
 
@@ -208,18 +217,19 @@ async def get_product_reviews(
     skip = (page - 1) * limit
     sort_direction = -1 if sort_order == "desc" else 1
     
-    reviews = list(
+    reviews = await (
         reviews_collection
         .find({"product_id": product_id})
         .sort(sort_by, sort_direction)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
     for review in reviews:
         # Get user info
-        user = users_collection.find_one({"_id": review["user_id"]})
+        user = await users_collection.find_one({"_id": review["user_id"]})
         
         result.append(ReviewResponse(
             id=review["_id"],
@@ -247,7 +257,7 @@ async def create_review(
     """Tạo đánh giá sản phẩm - F27"""
     
     # Check if product exists
-    product = products_collection.find_one({"_id": review.product_id})
+    product = await products_collection.find_one({"_id": review.product_id})
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -255,7 +265,7 @@ async def create_review(
         )
     
     # Check if user already reviewed this product
-    existing_review = reviews_collection.find_one({
+    existing_review = await reviews_collection.find_one({
         "product_id": review.product_id,
         "user_id": current_user["_id"]
     })
@@ -267,7 +277,7 @@ async def create_review(
         )
     
     # Check if user purchased this product (verified purchase)
-    purchased = orders_collection.find_one({
+    purchased = await orders_collection.find_one({
         "user_id": current_user["_id"],
         "items.product_id": review.product_id,
         "status": "delivered"
@@ -277,44 +287,24 @@ async def create_review(
         review_dict = review.model_dump()  # Pydantic v2
     except AttributeError:
         review_dict = review.dict()  # Pydantic v1
-    review_dict["_id"] = f"review_{get_next_sequence('reviews')}"
+    review_dict["_id"] = f"review_{await get_next_sequence('reviews')}"
     review_dict["user_id"] = current_user["_id"]
     review_dict["is_verified_purchase"] = bool(purchased)
     review_dict["helpful_count"] = 0
     review_dict["created_at"] = datetime.utcnow()
     
-    reviews_collection.insert_one(review_dict)
-    
-    # Update product rating
-    pipeline = [
-        {"$match": {"product_id": review.product_id}},
-        {"$group": {
-            "_id": None,
-            "avg_rating": {"$avg": "$rating"},
-            "count": {"$sum": 1}
-        }}
-    ]
-    
-    stats = list(reviews_collection.aggregate(pipeline))
-    
-    if stats:
-        products_collection.update_one(
-            {"_id": review.product_id},
-            {
-                "$set": {
-                    "rating": round(stats[0]["avg_rating"], 1),
-                    "review_count": stats[0]["count"]
-                }
-            }
-        )
+    await reviews_collection.insert_one(review_dict)
+    
+    # Update product rating ($inc rating_stats)
+    await record_review_added(review.product_id, review.rating)
     
-    log_activity(current_user["_id"], "REVIEW_CREATED", {
+    await log_activity(current_user["_id"], "REVIEW_CREATED", {
         "product_id": review.product_id,
         "rating": review.rating
     })
     
     # Get user info for response
-    user = users_collection.find_one({"_id": current_user["_id"]})
+    user = await users_collection.find_one({"_id": current_user["_id"]})
     
     return ReviewResponse(
         id=review_dict["_id"],
@@ -340,7 +330,7 @@ async def update_review(
 ):
     """Cập nhật đánh giá - F27"""
     
-    review = reviews_collection.find_one({
+    review = await reviews_collection.find_one({
         "_id": review_id,
         "user_id": current_user["_id"]
     })
@@ -357,33 +347,20 @@ async def update_review(
         update_dict = review_update.dict(exclude_unset=True)  # Pydantic v1
     update_data = {k: v for k, v in update_dict.items() if v is not None}
     
-    reviews_collection.update_one(
+    # Trả về document trước khi update để biết số sao cũ
+    previous = await reviews_collection.find_one_and_update(
         {"_id": review_id},
         {"$set": update_data}
     )
     
-    # Recalculate product rating if rating changed
-    if "rating" in update_data:
-        pipeline = [
-            {"$match": {"product_id": review["product_id"]}},
-            {"$group": {
-                "_id": None,
-                "avg_rating": {"$avg": "$rating"}
-            }}
-        ]
-        
-        stats = list(reviews_collection.aggregate(pipeline))
-        
-        if stats:
-            products_collection.update_one(
-                {"_id": review["product_id"]},
-                {"$set": {"rating": round(stats[0]["avg_rating"], 1)}}
-            )
+    # Update product rating if rating changed
+    if "rating" in update_data and previous:
+        await record_review_rating_changed(review["product_id"], previous["rating"], update_data["rating"])
     
-    log_activity(current_user["_id"], "REVIEW_UPDATED", {"review_id": review_id})
+    await log_activity(current_user["_id"], "REVIEW_UPDATED", {"review_id": review_id})
     
-    updated_review = reviews_collection.find_one({"_id": review_id})
-    user = users_collection.find_one({"_id": current_user["_id"]})
+    updated_review = await reviews_collection.find_one({"_id": review_id})
+    user = await users_collection.find_one({"_id": current_user["_id"]})
     
     return ReviewResponse(
         id=updated_review["_id"],
@@ -408,7 +385,7 @@ async def delete_review(
 ):
     """Xóa đánh giá - F27"""
     
-    review = reviews_collection.find_one({
+    review = await reviews_collection.find_one({
         "_id": review_id,
         "user_id": current_user["_id"]
     })
@@ -421,37 +398,13 @@ async def delete_review(
     
     product_id = review["product_id"]
     
-    reviews_collection.delete_one({"_id": review_id})
-    
-    # Update product rating and count
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$group": {
-            "_id": None,
-            "avg_rating": {"$avg": "$rating"},
-            "count": {"$sum": 1}
-        }}
-    ]
-    
-    stats = list(reviews_collection.aggregate(pipeline))
-    
-    if stats:
-        products_collection.update_one(
-            {"_id": product_id},
-            {
-                "$set": {
-                    "rating": round(stats[0]["avg_rating"], 1),
-                    "review_count": stats[0]["count"]
-                }
-            }
-        )
-    else:
-        products_collection.update_one(
-            {"_id": product_id},
-            {"$set": {"rating": 0.0, "review_count": 0}}
-        )
+    result = await reviews_collection.delete_one({"_id": review_id})
+    
+    # Update product rating and count (chỉ khi thực sự xóa, tránh trừ 2 lần)
+    if result.deleted_count:
+        await record_review_removed(product_id, review["rating"])
     
-    log_activity(current_user["_id"], "REVIEW_DELETED", {"review_id": review_id})
+    await log_activity(current_user["_id"], "REVIEW_DELETED", {"review_id": review_id})
     
     return {"message": "Review deleted successfully"}
 
@@ -462,7 +415,7 @@ async def mark_review_helpful(
 ):
     """Đánh dấu đánh giá hữu ích"""
     
-    result = reviews_collection.update_one(
+    result = await reviews_collection.update_one(
         {"_id": review_id},
         {"$inc": {"helpful_count": 1}}
     )
@@ -481,17 +434,17 @@ async def mark_review_helpful(
 async def get_wishlist(current_user: dict = Depends(get_current_user)):
     """Lấy danh sách yêu thích - F26"""
     
-    wishlist = wishlists_collection.find_one({"user_id": current_user["_id"]})
+    wishlist = await wishlists_collection.find_one({"user_id": current_user["_id"]})
     
     if not wishlist:
         # Create empty wishlist
         wishlist = {
-            "_id": f"wishlist_{get_next_sequence('wishlists')}",
+            "_id": f"wishlist_{await get_next_sequence('wishlists')}",
             "user_id": current_user["_id"],
             "items": [],
             "updated_at": datetime.utcnow()
         }
-        wishlists_collection.insert_one(wishlist)
+        await wishlists_collection.insert_one(wishlist)
     
     return WishlistResponse(
         id=wishlist["_id"],
@@ -508,7 +461,7 @@ async def add_to_wishlist(
     """Thêm sản phẩm vào wishlist - F26"""
     
     # Check if product exists
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -516,16 +469,16 @@ async def add_to_wishlist(
         )
     
     # Get or create wishlist
-    wishlist = wishlists_collection.find_one({"user_id": current_user["_id"]})
+    wishlist = await wishlists_collection.find_one({"user_id": current_user["_id"]})
     
     if not wishlist:
         wishlist = {
-            "_id": f"wishlist_{get_next_sequence('wishlists')}",
+            "_id": f"wishlist_{await get_next_sequence('wishlists')}",
             "user_id": current_user["_id"],
             "items": [],
             "updated_at": datetime.utcnow()
         }
-        wishlists_collection.insert_one(wishlist)
+        await wishlists_collection.insert_one(wishlist)
     
     # Check if product already in wishlist
     if any(item["product_id"] == product_id for item in wishlist.get("items", [])):
@@ -540,7 +493,7 @@ async def add_to_wishlist(
         added_at=datetime.utcnow()
     )
     
-    wishlists_collection.update_one(
+    await wishlists_collection.update_one(
         {"_id": wishlist["_id"]},
         {
             "$push": {"items": new_item.dict()},
@@ -548,7 +501,7 @@ async def add_to_wishlist(
         }
     )
     
-    log_activity(current_user["_id"], "ADDED_TO_WISHLIST", {"product_id": product_id})
+    await log_activity(current_user["_id"], "ADDED_TO_WISHLIST", {"product_id": product_id})
     
     return {"message": "Product added to wishlist"}
 
@@ -559,7 +512,7 @@ async def remove_from_wishlist(
 ):
     """Xóa sản phẩm khỏi wishlist - F26"""
     
-    result = wishlists_collection.update_one(
+    result = await wishlists_collection.update_one(
         {"user_id": current_user["_id"]},
         {
             "$pull": {"items": {"product_id": product_id}},
@@ -573,7 +526,7 @@ async def remove_from_wishlist(
             detail="Product not found in wishlist"
         )
     
-    log_activity(current_user["_id"], "REMOVED_FROM_WISHLIST", {"product_id": product_id})
+    await log_activity(current_user["_id"], "REMOVED_FROM_WISHLIST", {"product_id": product_id})
     
     return {"message": "Product removed from wishlist"}
 
@@ -581,10 +534,12 @@ async def remove_from_wishlist(
 
 @router.get("/notifications", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     current_user: dict = Depends(get_current_user),
     unread_only: bool = False,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None
 ):
     """
     Lấy danh sách thông báo
@@ -597,15 +552,18 @@ async def get_notifications(
     if unread_only:
         query["is_read"] = False
     
-    skip = (page - 1) * limit
+    skip = 0 if after else (page - 1) * limit
+    query = apply_cursor(query, "created_at", -1, after)
     
-    notifications = list(
+    notifications = await (
         notifications_collection
         .find(query)
-        .sort("created_at", -1)
+        .sort(cursor_sort("created_at", -1))
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
+    set_next_cursor(response, notifications, limit, "created_at")
     
     result = []
     for notif in notifications:
@@ -627,13 +585,62 @@ async def get_notifications(
 async def get_unread_count(current_user: dict = Depends(get_current_user)):
     """Đếm số thông báo chưa đọc"""
     
-    count = notifications_collection.count_documents({
+    count = await notifications_collection.count_documents({
         "user_id": current_user["_id"],
         "is_read": False
     })
     
     return {"unread_count": count}
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+@router.get("/notifications/stream")
+async def stream_notifications(request: Request, token: str = Query(...)):
+    """
+    SSE stream thông báo (thay cho polling unread-count)
+    EventSource không gửi được header Authorization nên token truyền qua query (?token=...).
+    Events:
+      - unread_count: {"unread_count": n} khi mới kết nối / đọc tất cả, {"unread_delta": -1} khi đọc / xóa
+      - notification: {"notification": {...}, "unread_delta": 1} khi có thông báo mới
+      - resync: client đọc chậm bị bỏ event, cần tải lại unread-count
+    """
+    
+    current_user = await get_user_from_token(token)
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials"
+        )
+    user_id = current_user["_id"]
+    
+    # Subscribe trước khi đếm để không lỡ notification tạo giữa 2 bước
+    queue = notification_broker.subscribe(user_id)
+    
+    async def event_stream():
+        try:
+            unread_count = await notifications_collection.count_documents({
+                "user_id": user_id,
+                "is_read": False
+            })
+            yield _sse_event("unread_count", {"unread_count": unread_count})
+            
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=NOTIFICATION_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_event(event, data)
+        finally:
+            notification_broker.unsubscribe(user_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.patch("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
@@ -641,7 +648,7 @@ async def mark_notification_read(
 ):
     """Đánh dấu thông báo đã đọc"""
     
-    result = notifications_collection.update_one(
+    result = await notifications_collection.update_one(
         {
             "_id": notification_id,
             "user_id": current_user["_id"]
@@ -655,17 +662,21 @@ async def mark_notification_read(
             detail="Notification not found"
         )
     
+    publish_unread_delta(current_user["_id"], -1)
+    
     return {"message": "Notification marked as read"}
 
 @router.patch("/notifications/read-all")
 async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
     """Đánh dấu tất cả thông báo đã đọc"""
     
-    notifications_collection.update_many(
+    await notifications_collection.update_many(
         {"user_id": current_user["_id"]},
         {"$set": {"is_read": True}}
     )
     
+    publish_unread_count(current_user["_id"], 0)
+    
     return {"message": "All notifications marked as read"}
 
 @router.delete("/notifications/{notification_id}")
@@ -675,17 +686,20 @@ async def delete_notification(
 ):
     """Xóa thông báo"""
     
-    result = notifications_collection.delete_one({
-        "_id": notification_id,
-        "user_id": current_user["_id"]
-    })
+    deleted = await notifications_collection.find_one_and_delete(
+        {"_id": notification_id, "user_id": current_user["_id"]},
+        projection={"is_read": 1}
+    )
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Notification not found"
         )
     
+    if not deleted.get("is_read", False):
+        publish_unread_delta(current_user["_id"], -1)
+    
     return {"message": "Notification deleted"}
 
 # ==================== ADMIN - Reply to Review ====================
@@ -698,7 +712,7 @@ async def reply_to_review(
 ):
     """Admin trả lời đánh giá"""
     
-    result = reviews_collection.update_one(
+    result = await reviews_collection.update_one(
         {"_id": review_id},
         {"$set": {"admin_reply": reply}}
     )
@@ -710,9 +724,9 @@ async def reply_to_review(
         )
     
     # Notify user
-    review = reviews_collection.find_one({"_id": review_id})
+    review = await reviews_collection.find_one({"_id": review_id})
     
-    create_notification_safe(
+    await create_notification_safe(
         user_id=review["user_id"],
         type="review",
         title="Admin đã phản hồi đánh giá của bạn",
@@ -720,7 +734,7 @@ async def reply_to_review(
         link=f"/products/{review['product_id']}"
     )
     
-    log_activity(current_user["_id"], "REVIEW_REPLIED", {"review_id": review_id})
+    await log_activity(current_user["_id"], "REVIEW_REPLIED", {"review_id": review_id})
     
     return {"message": "Reply added successfully"}
 
@@ -0,0 +1,167 @@
+"""
+Image derivatives: sinh sẵn thumbnail / medium / large (+ WebP) cho ảnh sản phẩm
+
+Ảnh upload vào uploads/products được resize nền (thread pool riêng, chạy qua job
+queue) thành các rendition cạnh dài tối đa RENDITION_SIZES, mỗi rendition có 1 bản
+cùng định dạng gốc (JPEG/PNG) và 1 bản WebP:
+    uploads/products/{hash}_thumbnail.jpg, uploads/products/{hash}_thumbnail.webp, ...
+Tên file suy ra từ ảnh gốc (đã dedup theo hash) nên ảnh trùng không resize lại.
+
+Rendition được ghi vào images[].renditions của product:
+    {"thumbnail": {"width": 200, "url": ..., "webp": ...}, "medium": {...}, "large": {...}}
+- ảnh resize xong trước khi tạo product: attach_renditions() lúc create/update gắn vào
+- product đã tồn tại khi resize xong: generate_renditions() cập nhật các product dùng ảnh đó
+Client dùng image_url(image, width) để lấy rendition nhỏ nhất đủ độ phân giải.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+import asyncio
+import os
+
+from .database import products_collection
+from .cache import invalidate_product
+from .uploads import UPLOAD_BASE_URL, UPLOAD_ROOT
+
+try:
+    from PIL import Image, ImageOps
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+    print("[WARNING] Pillow not installed, product image renditions will not be generated")
+
+PRODUCT_IMAGE_DIR = "products"
+# Cạnh dài tối đa (px) của từng rendition, từ nhỏ đến lớn
+RENDITION_SIZES = {"thumbnail": 200, "medium": 600, "large": 1200}
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor = None
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+    return _executor
+
+def _url_prefixes():
+    path = f"/{UPLOAD_ROOT}/{PRODUCT_IMAGE_DIR}/"
+    return (f"{UPLOAD_BASE_URL}{path}", path)
+
+def _local_file(url: str) -> Optional[str]:
+    """Tên file gốc trong uploads/products nếu url là ảnh upload lên server này"""
+    for prefix in _url_prefixes():
+        if url and url.startswith(prefix):
+            filename = url[len(prefix):]
+            if "/" not in filename and not filename.startswith("."):
+                return filename
+    return None
+
+def _rendition_names(filename: str, name: str) -> tuple:
+    stem, extension = os.path.splitext(filename)
+    if extension.lower() not in (".jpg", ".jpeg", ".png"):
+        extension = ".jpg"
+    return f"{stem}_{name}{extension}", f"{stem}_{name}.webp"
+
+def _save(image, path: str, **options):
+    temp_path = f"{path}.part"
+    image.save(temp_path, **options)
+    os.replace(temp_path, path)
+
+def _generate_files(filename: str):
+    """Resize + encode (chạy trên image pool)"""
+    upload_dir = os.path.join(UPLOAD_ROOT, PRODUCT_IMAGE_DIR)
+    with Image.open(os.path.join(upload_dir, filename)) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ("RGBA", "LA") or "transparency" in original.info
+
+        for name, size in RENDITION_SIZES.items():
+            main_name, webp_name = _rendition_names(filename, name)
+            main_path = os.path.join(upload_dir, main_name)
+            webp_path = os.path.join(upload_dir, webp_name)
+            if os.path.exists(main_path) and os.path.exists(webp_path):
+                continue
+
+            rendition = original.copy()
+            rendition.thumbnail((size, size), Image.LANCZOS)
+            if main_name.endswith(".png"):
+                _save(rendition, main_path, format="PNG", optimize=True)
+            else:
+                _save(rendition.convert("RGB"), main_path, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            _save(rendition.convert("RGBA" if has_alpha else "RGB"), webp_path, format="WEBP", quality=WEBP_QUALITY)
+
+def renditions_for(url: str) -> Optional[Dict[str, dict]]:
+    """Renditions của ảnh nếu đã được sinh xong, None nếu chưa có / không phải ảnh upload"""
+    filename = _local_file(url)
+    if not filename:
+        return None
+
+    upload_dir = os.path.join(UPLOAD_ROOT, PRODUCT_IMAGE_DIR)
+    base_url = _url_prefixes()[0]
+    renditions = {}
+    for name, size in RENDITION_SIZES.items():
+        main_name, webp_name = _rendition_names(filename, name)
+        if not (os.path.exists(os.path.join(upload_dir, main_name)) and os.path.exists(os.path.join(upload_dir, webp_name))):
+            return None
+        renditions[name] = {"width": size, "url": f"{base_url}{main_name}", "webp": f"{base_url}{webp_name}"}
+    return renditions
+
+def attach_renditions(images: Optional[list]) -> Optional[list]:
+    """Gắn renditions (nếu đã có) vào images của product trước khi lưu"""
+    for image in images or []:
+        if isinstance(image, dict) and not image.get("renditions"):
+            renditions = renditions_for(image.get("url"))
+            if renditions:
+                image["renditions"] = renditions
+    return images
+
+async def generate_renditions(url: str):
+    """Job nền: sinh rendition cho ảnh vừa upload rồi cập nhật các product đang dùng ảnh"""
+    filename = _local_file(url)
+    if not HAS_PIL or not filename:
+        return
+
+    await asyncio.get_running_loop().run_in_executor(_get_executor(), _generate_files, filename)
+
+    renditions = renditions_for(url)
+    if not renditions:
+        return
+
+    product_ids = [
+        product["_id"]
+        async for product in products_collection.find({"images.url": url}, {"_id": 1})
+    ]
+    if not product_ids:
+        return
+
+    await products_collection.update_many(
+        {"_id": {"$in": product_ids}},
+        {"$set": {"images.$[image].renditions": renditions}},
+        array_filters=[{"image.url": url}]
+    )
+    for product_id in product_ids:
+        invalidate_product(product_id)
+
+def image_url(image: Optional[dict], width: Optional[int] = None, webp: bool = False) -> Optional[str]:
+    """
+    URL ảnh phù hợp với độ rộng hiển thị: rendition nhỏ nhất có cạnh >= width
+    (không có width thì lấy large), fallback về ảnh gốc khi chưa có rendition
+    """
+    if not image:
+        return None
+    renditions = image.get("renditions") or {}
+    if not renditions:
+        return image.get("url")
+
+    candidates = sorted(renditions.values(), key=lambda r: r["width"])
+    chosen = candidates[-1]
+    if width:
+        chosen = next((r for r in candidates if r["width"] >= width), chosen)
+    return chosen["webp"] if webp else chosen["url"]
+
+def stop_image_pool():
+    """Dừng image pool (gọi ở shutdown, sau khi job queue đã drain)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,78 @@
+"""
+In-process async job queue
+
+Đưa các việc phụ (fan-out notification, ...) ra khỏi request path: request chỉ
+put job vào queue, worker pool chạy nền. Queue có giới hạn (JOB_QUEUE_MAXSIZE);
+khi đầy hoặc queue chưa được start (script, test) thì job chạy inline để không mất việc.
+"""
+from typing import Awaitable, Callable
+import asyncio
+import os
+
+JOB_QUEUE_MAXSIZE = int(os.getenv("JOB_QUEUE_MAXSIZE", "1000"))
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+# Thời gian tối đa (giây) chờ xử lý hết backlog khi shutdown
+JOB_QUEUE_DRAIN_TIMEOUT = float(os.getenv("JOB_QUEUE_DRAIN_TIMEOUT", "10"))
+
+_queue = None
+_workers = []
+
+async def _run_job(func: Callable[..., Awaitable], args: tuple, kwargs: dict):
+    try:
+        await func(*args, **kwargs)
+    except Exception as e:
+        print(f"[ERROR] Background job {getattr(func, '__name__', func)} failed: {e}")
+
+async def _worker():
+    while True:
+        func, args, kwargs = await _queue.get()
+        try:
+            await _run_job(func, args, kwargs)
+        finally:
+            _queue.task_done()
+
+async def submit_job(func: Callable[..., Awaitable], *args, **kwargs):
+    """Đưa job vào queue; chạy inline nếu queue đầy hoặc chưa start"""
+    if _queue is None:
+        await _run_job(func, args, kwargs)
+        return
+
+    try:
+        _queue.put_nowait((func, args, kwargs))
+    except asyncio.QueueFull:
+        print(f"[WARNING] Job queue full ({JOB_QUEUE_MAXSIZE}), running {getattr(func, '__name__', func)} inline")
+        await _run_job(func, args, kwargs)
+
+def get_job_queue_stats() -> dict:
+    """Số job đang chờ trong queue"""
+    return {
+        "pending": _queue.qsize() if _queue is not None else 0,
+        "maxsize": JOB_QUEUE_MAXSIZE,
+        "workers": len(_workers)
+    }
+
+def start_job_queue():
+    """Khởi động worker pool (gọi ở startup)"""
+    global _queue
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue(maxsize=JOB_QUEUE_MAXSIZE)
+    for _ in range(JOB_QUEUE_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+async def stop_job_queue():
+    """Chờ xử lý hết backlog (có timeout) rồi dừng worker (gọi ở shutdown)"""
+    global _queue
+    if _queue is None:
+        return
+
+    try:
+        await asyncio.wait_for(_queue.join(), timeout=JOB_QUEUE_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"[WARNING] Job queue shutdown with {_queue.qsize()} pending jobs")
+
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -153,6 +153,12 @@ class ProductImage(BaseModel):
     url: str
     is_primary: bool = False
     alt_text: Optional[str] = None
+    # {"thumbnail" | "medium" | "large": {"width", "url", "webp"}}, sinh nền sau khi upload
+    renditions: Optional[Dict[str, Dict[str, Any]]] = None
+
+class ProductImageResponse(ProductImage):
+    # Rendition (WebP) vừa kích thước hiển thị, = url khi ảnh chưa có rendition
+    display_url: Optional[str] = None
 
 class ProductApprovalStatus(str, Enum):
     PENDING = "pending"  # Chờ duyệt
@@ -202,6 +208,7 @@ class ProductUpdate(BaseModel):
 
 class ProductResponse(ProductBase):
     id: str
+    images: List[ProductImageResponse] = []
     rating: float = 0.0
     review_count: int = 0
     sold_count: int = 0
@@ -0,0 +1,71 @@
+"""
+Notification stream: push notification mới + thay đổi unread count tới client qua SSE
+
+Mỗi connection SSE của user là 1 queue có giới hạn (NOTIFICATION_STREAM_QUEUE_SIZE).
+create_notification_safe / create_notifications_bulk publish ngay sau khi insert,
+các endpoint đọc / xóa notification publish unread_delta, nên client không cần poll
+unread-count. Queue đầy (client đọc chậm) thì bỏ backlog và gửi "resync" để client
+tự tải lại. Broker nằm trong process, giống chat hub.
+"""
+from typing import Dict, Set
+import asyncio
+import os
+
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv("NOTIFICATION_STREAM_QUEUE_SIZE", "100"))
+# Gửi comment keepalive mỗi N giây để proxy không cắt connection idle
+NOTIFICATION_STREAM_HEARTBEAT = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT", "15"))
+
+class NotificationBroker:
+    """user_id -> các queue của connection SSE đang mở"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: str, data: dict):
+        """Đưa event vào queue của mọi connection của user (không chờ)"""
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", {}))
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values())
+        }
+
+notification_broker = NotificationBroker()
+
+def publish_notification(notification: dict):
+    """Notification mới (chưa đọc) -> event notification, unread_delta +1"""
+    data = dict(notification)
+    data["id"] = data.pop("_id")
+    notification_broker.publish(notification["user_id"], "notification", {
+        "notification": data,
+        "unread_delta": 1
+    })
+
+def publish_unread_delta(user_id: str, delta: int):
+    """Unread count thay đổi (đọc / xóa notification)"""
+    if delta:
+        notification_broker.publish(user_id, "unread_count", {"unread_delta": delta})
+
+def publish_unread_count(user_id: str, unread_count: int):
+    """Unread count tuyệt đối (đọc tất cả)"""
+    notification_broker.publish(user_id, "unread_count", {"unread_count": unread_count})
@@ -0,0 +1,53 @@
+"""
+Order number generator: unique by construction, không cần find_one kiểm tra trùng
+
+Format: ORD + YYYYMMDDHHMMSS (UTC) + node id (3 chữ số) + counter trong giây (4 chữ số)
+  - node id phân biệt các process/máy (ORDER_NODE_ID, mặc định suy từ hostname + pid)
+  - counter tăng đơn điệu trong cùng 1 giây; hết 10000 số thì chuyển sang giây kế tiếp
+  - đồng hồ lùi thì vẫn dùng giây cuối cùng đã cấp nên không bao giờ lặp lại
+Hai process vẫn có thể trùng node id (crc trùng, hoặc instance cũ/mới chạy song song
+lúc deploy): unique index trên order_number / _id bắt trường hợp đó và checkout
+(orders.insert_order / place_order_transactional) sinh số mới rồi insert lại.
+"""
+from datetime import datetime, timedelta
+import os
+import socket
+import zlib
+
+COUNTER_LIMIT = 10000
+
+def _default_node_id() -> int:
+    seed = f"{socket.gethostname()}:{os.getpid()}".encode("utf-8")
+    return zlib.crc32(seed) % 1000
+
+# Nên đặt ORDER_NODE_ID khác nhau (0-999) cho từng process khi chạy nhiều instance
+ORDER_NODE_ID = int(os.getenv("ORDER_NODE_ID", str(_default_node_id()))) % 1000
+
+class OrderNumberGenerator:
+    """Sinh order number tăng dần theo thời gian, không trùng trong cùng node"""
+
+    def __init__(self, node_id: int):
+        self.node_id = node_id
+        self._last_second = None
+        self._counter = 0
+
+    def next(self) -> str:
+        now = datetime.utcnow().replace(microsecond=0)
+
+        if self._last_second is None or now > self._last_second:
+            self._last_second = now
+            self._counter = 0
+        else:
+            # Cùng giây (hoặc đồng hồ lùi): tiếp tục counter của giây cuối
+            self._counter += 1
+            if self._counter >= COUNTER_LIMIT:
+                self._last_second += timedelta(seconds=1)
+                self._counter = 0
+
+        return f"ORD{self._last_second.strftime('%Y%m%d%H%M%S')}{self.node_id:03d}{self._counter:04d}"
+
+order_number_generator = OrderNumberGenerator(ORDER_NODE_ID)
+
+def generate_order_number() -> str:
+    """Generate unique order number"""
+    return order_number_generator.next()
@@ -1,30 +1,288 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from datetime import datetime
-import random
-import string
+import os
+import time
 
 from .models import (
     OrderCreate, OrderUpdate, OrderResponse,
     OrderStatus, PaymentStatus
 )
 from .database import (
-    orders_collection, products_collection, carts_collection,
-    coupons_collection, notifications_collection, users_collection,
-    get_next_sequence, log_activity, create_notification_safe
+    client, orders_collection, products_collection, carts_collection,
+    coupons_collection, notifications_collection,
+    get_next_sequence, log_activity, create_notification_safe,
+    supports_transactions, notify_admins
 )
 from .auth import get_current_user, get_current_admin
+from .pagination import apply_cursor, cursor_sort, set_next_cursor
+from .cache import invalidate_product
+from .jobs import submit_job
+from .order_numbers import generate_order_number
+from .rollups import record_order_created, record_order_status_change
 
 router = APIRouter(prefix="/api/orders", tags=["Orders"])
 
-def generate_order_number():
-    """Generate unique order number"""
-    timestamp = datetime.utcnow().strftime("%Y%m%d")
-    random_str = ''.join(random.choices(string.digits, k=6))
-    return f"ORD{timestamp}{random_str}"
+# Thời gian tối đa (giây) retry 1 transaction checkout khi gặp write conflict
+ORDER_TRANSACTION_TIMEOUT = float(os.getenv("ORDER_TRANSACTION_TIMEOUT", "10"))
+# Số lần sinh lại order number khi insert trùng order_number/_id
+ORDER_NUMBER_MAX_ATTEMPTS = 3
+
+# ==================== STOCK RESERVATION ====================
+
+def aggregate_item_quantities(items) -> Dict[str, int]:
+    """Gộp số lượng theo product_id (cùng sản phẩm khác variant)"""
+    quantities: Dict[str, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+async def attach_seller_ids(items: list):
+    """Gắn seller_id vào từng order item (1 query $in) để thống kê seller dùng index items.seller_id"""
+    product_ids = list({item["product_id"] for item in items})
+    sellers = {
+        product["_id"]: product.get("seller_id")
+        async for product in products_collection.find(
+            {"_id": {"$in": product_ids}},
+            {"seller_id": 1}
+        )
+    }
+    for item in items:
+        # Sản phẩm của admin không có seller -> None (vẫn set để phân biệt với order cũ chưa backfill)
+        item["seller_id"] = sellers.get(item["product_id"])
+
+async def stock_shortage_error(quantities: Dict[str, int]) -> HTTPException:
+    """Tìm sản phẩm không đủ hàng sau khi reserve thất bại (1 query $in)"""
+    products = await products_collection.find(
+        {"_id": {"$in": list(quantities)}},
+        {"name": 1, "stock": 1}
+    ).to_list(length=None)
+    found = {product["_id"]: product for product in products}
+    
+    for product_id, quantity in quantities.items():
+        product = found.get(product_id)
+        if not product:
+            return HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product {product_id} not found"
+            )
+        product_stock = product.get("stock", 0)
+        if product_stock < quantity:
+            return HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough stock for {product.get('name', 'Product')}. Available: {product_stock}, Requested: {quantity}"
+            )
+    
+    # Stock thay đổi giữa lúc reserve và lúc kiểm tra lại
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Stock changed during checkout, please try again"
+    )
+
+def assign_order_number(order_dict: dict):
+    """Gán order_number mới (và _id dùng chung chuỗi số) cho order"""
+    order_number = generate_order_number()
+    order_dict["_id"] = f"order_{order_number[3:]}"
+    order_dict["order_number"] = order_number
+
+def order_insert_error(e: Exception) -> HTTPException:
+    print(f"[ERROR] Failed to insert order: {e}")
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Failed to create order: {str(e)}"
+    )
+
+async def insert_order(order_dict: dict):
+    """
+    Insert order, lỗi DB chuyển thành HTTP 500. Trùng order_number/_id (2 process
+    trùng node id, vd instance cũ và mới chạy song song lúc deploy) thì sinh số mới và insert lại
+    """
+    for attempt in range(1, ORDER_NUMBER_MAX_ATTEMPTS + 1):
+        try:
+            await orders_collection.insert_one(order_dict)
+            return
+        except DuplicateKeyError as e:
+            if attempt == ORDER_NUMBER_MAX_ATTEMPTS:
+                raise order_insert_error(e)
+            print(f"[WARNING] Duplicate order number {order_dict['order_number']}, regenerating")
+            assign_order_number(order_dict)
+        except Exception as e:
+            raise order_insert_error(e)
+
+async def run_transaction(session, callback):
+    """
+    Chạy callback(session) trong 1 transaction, retry theo error label của MongoDB:
+    - TransientTransactionError (vd WriteConflict khi 2 checkout cùng trừ stock 1 sản phẩm): chạy lại cả transaction
+    - UnknownTransactionCommitResult: chỉ commit lại
+    Exception khác (vd HTTPException hết hàng) abort transaction và raise ngay, không retry.
+    Không dùng session.with_transaction của Motor vì nó commit trong __aexit__ của
+    start_transaction() nên lỗi lúc commit không được retry.
+    """
+    deadline = time.monotonic() + ORDER_TRANSACTION_TIMEOUT
+    while True:
+        session.start_transaction()
+        try:
+            await callback(session)
+        except Exception as exc:
+            if session.in_transaction:
+                await session.abort_transaction()
+            if isinstance(exc, PyMongoError) and exc.has_error_label("TransientTransactionError") and time.monotonic() < deadline:
+                continue
+            raise
+        
+        while True:
+            try:
+                await session.commit_transaction()
+                return
+            except PyMongoError as exc:
+                if exc.has_error_label("UnknownTransactionCommitResult") and time.monotonic() < deadline:
+                    continue
+                if exc.has_error_label("TransientTransactionError") and time.monotonic() < deadline:
+                    break
+                raise
+
+async def place_order_transactional(order_dict: dict, quantities: Dict[str, int], coupon_id: Optional[str]):
+    """
+    Reserve stock (bulk_write có điều kiện stock >= qty) + insert order + tăng coupon
+    + xóa giỏ hàng trong 1 multi-document transaction (retry khi write conflict)
+    """
+    reserve_ops = [
+        UpdateOne(
+            {"_id": product_id, "stock": {"$gte": quantity}},
+            {"$inc": {"stock": -quantity, "sold_count": quantity}}
+        )
+        for product_id, quantity in quantities.items()
+    ]
+    
+    async def reserve_and_insert(session):
+        result = await products_collection.bulk_write(reserve_ops, ordered=False, session=session)
+        if result.matched_count < len(reserve_ops):
+            # Hết hàng: abort, không retry
+            raise await stock_shortage_error(quantities)
+        
+        await orders_collection.insert_one(order_dict, session=session)
+        await record_order_created(order_dict, session=session)
+        
+        if coupon_id:
+            await coupons_collection.update_one(
+                {"_id": coupon_id},
+                {"$inc": {"used_count": 1}},
+                session=session
+            )
+        
+        await carts_collection.update_one(
+            {"user_id": order_dict["user_id"]},
+            {"$set": {"items": []}},
+            session=session
+        )
+    
+    async with await client.start_session() as session:
+        for attempt in range(1, ORDER_NUMBER_MAX_ATTEMPTS + 1):
+            try:
+                await run_transaction(session, reserve_and_insert)
+                return
+            except DuplicateKeyError as e:
+                # Transaction đã abort (stock chưa bị trừ): sinh order number mới rồi chạy lại
+                if attempt == ORDER_NUMBER_MAX_ATTEMPTS:
+                    raise order_insert_error(e)
+                print(f"[WARNING] Duplicate order number {order_dict['order_number']}, regenerating")
+                assign_order_number(order_dict)
+            except PyMongoError as e:
+                raise order_insert_error(e)
+
+async def place_order_with_compensation(order_dict: dict, quantities: Dict[str, int], coupon_id: Optional[str]):
+    """
+    Fallback cho MongoDB standalone (không có transaction): reserve stock bằng bulk_write
+    có điều kiện, đánh dấu stock_reservations bằng order _id để hoàn lại đúng những
+    sản phẩm đã trừ nếu reserve thiếu hoặc insert order lỗi
+    """
+    reservation_id = order_dict["_id"]
+    
+    reserve_ops = [
+        UpdateOne(
+            {"_id": product_id, "stock": {"$gte": quantity}},
+            {
+                "$inc": {"stock": -quantity, "sold_count": quantity},
+                "$push": {"stock_reservations": reservation_id}
+            }
+        )
+        for product_id, quantity in quantities.items()
+    ]
+    
+    async def release_reservations():
+        """Hoàn lại stock cho những sản phẩm đã reserve bởi order này"""
+        await products_collection.bulk_write([
+            UpdateOne(
+                {"_id": product_id, "stock_reservations": reservation_id},
+                {
+                    "$inc": {"stock": quantity, "sold_count": -quantity},
+                    "$pull": {"stock_reservations": reservation_id}
+                }
+            )
+            for product_id, quantity in quantities.items()
+        ], ordered=False)
+    
+    result = await products_collection.bulk_write(reserve_ops, ordered=False)
+    if result.matched_count < len(reserve_ops):
+        await release_reservations()
+        raise await stock_shortage_error(quantities)
+    
+    try:
+        await insert_order(order_dict)
+    except Exception:
+        await release_reservations()
+        raise
+    await record_order_created(order_dict)
+    
+    await products_collection.update_many(
+        {"_id": {"$in": list(quantities)}},
+        {"$pull": {"stock_reservations": reservation_id}}
+    )
+    
+    if coupon_id:
+        await coupons_collection.update_one(
+            {"_id": coupon_id},
+            {"$inc": {"used_count": 1}}
+        )
+    
+    await carts_collection.update_one(
+        {"user_id": order_dict["user_id"]},
+        {"$set": {"items": []}}
+    )
 
 # ==================== ORDER ROUTES (F18-F22) ====================
 
+def order_status_conflict() -> HTTPException:
+    """Status đã bị request khác đổi giữa lúc đọc và lúc update"""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Order status was changed by another request, please reload and try again"
+    )
+
+async def update_order_if_status_unchanged(order: dict, update: dict, new_status=None):
+    """
+    Update order chỉ khi status vẫn là status đã đọc (409 nếu request khác đã đổi),
+    rồi chuyển rollup sang status mới. Cả 2 chạy trong 1 transaction nếu MongoDB hỗ trợ.
+    """
+    async def write(session=None):
+        result = await orders_collection.update_one(
+            {"_id": order["_id"], "status": order.get("status")},
+            update,
+            session=session
+        )
+        if result.modified_count != 1:
+            raise order_status_conflict()
+        if new_status:
+            await record_order_status_change(order, order.get("status"), new_status, session=session)
+    
+    if await supports_transactions():
+        async with await client.start_session() as session:
+            await run_transaction(session, write)
+    else:
+        await write()
+
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
@@ -60,46 +318,13 @@ async def create_order(
     except Exception as e:
         safe_print(f"[WARNING] Error logging order data: {e}")
     
-    # Validate products and stock
-    try:
-        for item in order_data.items:
-            product = products_collection.find_one({"_id": item.product_id})
-            
-            if not product:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Product {item.product_id} not found"
-                )
-            
-            # Get stock from product or default to 0
-            product_stock = product.get("stock", 0)
-            if product_stock < item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Not enough stock for {product.get('name', 'Product')}. Available: {product_stock}, Requested: {item.quantity}"
-                )
-    except HTTPException:
-        raise
-    except Exception as e:
-        try:
-            print(f"[ERROR] Error validating products: {e}")
-        except UnicodeEncodeError:
-            print("[ERROR] Error validating products (encoding error)")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error validating products: {str(e)}"
-        )
-    
-    # Validate coupon if provided
+    # Validate coupon if provided (usage count tăng cùng lúc insert order)
+    coupon_id = None
     if order_data.coupon_code:
-        coupon = coupons_collection.find_one({"code": order_data.coupon_code.upper()})
+        coupon = await coupons_collection.find_one({"code": order_data.coupon_code.upper()})
         
         if coupon:
-            # Increment usage count
-            coupons_collection.update_one(
-                {"_id": coupon["_id"]},
-                {"$inc": {"used_count": 1}}
-            )
+            coupon_id = coupon["_id"]
     
     # Create order
     try:
@@ -112,33 +337,16 @@ async def create_order(
         if item.get("variant") is None:
             item.pop("variant", None)
     
+    await attach_seller_ids(order_dict.get("items", []))
+    
     # Ensure we don't have 'id' field before inserting (only use _id)
     if "id" in order_dict:
         order_dict.pop("id", None)
     
-    # Generate unique _id using timestamp to avoid duplicates
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-    order_dict["_id"] = f"order_{timestamp}_{random.randint(1000, 9999)}"
+    # Order number (thời gian + node id + counter), _id dùng chung chuỗi số
+    assign_order_number(order_dict)
     order_dict["user_id"] = current_user["_id"]  # Set user_id from current_user
     
-    # Generate unique order_number with retry logic
-    max_retries = 10
-    order_number = None
-    for attempt in range(max_retries):
-        order_number = generate_order_number()
-        # Check if this order_number already exists
-        existing_order = orders_collection.find_one({"order_number": order_number})
-        if not existing_order:
-            break  # Found unique order_number
-        safe_print(f"[WARNING] Order number {order_number} already exists, retrying... (attempt {attempt + 1}/{max_retries})")
-    else:
-        # All retries exhausted
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create order: Unable to generate unique order number"
-        )
-    
-    order_dict["order_number"] = order_number
     order_dict["status"] = OrderStatus.PENDING.value if hasattr(OrderStatus.PENDING, 'value') else OrderStatus.PENDING
     order_dict["payment_status"] = PaymentStatus.PENDING.value if hasattr(PaymentStatus.PENDING, 'value') else PaymentStatus.PENDING
     
@@ -156,38 +364,25 @@ async def create_order(
         "note": "Order created"
     }]
     
-    # Insert order with unique _id
-    try:
-        orders_collection.insert_one(order_dict)
-        safe_print(f"[SUCCESS] Created order {order_dict['_id']} with order_number {order_number}")
-    except Exception as e:
-        error_str = str(e)
-        safe_print(f"[ERROR] Failed to insert order: {error_str}")
+    # Reserve stock + insert order + clear cart (số round trip cố định, không phụ thuộc số item)
+    quantities = aggregate_item_quantities(order_data.items)
+    if not quantities:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create order: {error_str}"
-        )
-    
-    # Update product stock and sold count
-    for item in order_data.items:
-        products_collection.update_one(
-            {"_id": item.product_id},
-            {
-                "$inc": {
-                    "stock": -item.quantity,
-                    "sold_count": item.quantity
-                }
-            }
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order must contain at least one item"
         )
+    if await supports_transactions():
+        await place_order_transactional(order_dict, quantities, coupon_id)
+    else:
+        await place_order_with_compensation(order_dict, quantities, coupon_id)
+    safe_print(f"[SUCCESS] Created order {order_dict['_id']} with order_number {order_dict['order_number']}")
     
-    # Clear user's cart
-    carts_collection.update_one(
-        {"user_id": current_user["_id"]},
-        {"$set": {"items": []}}
-    )
+    for product_id in quantities:
+        invalidate_product(product_id)
     
-    # Create notification for user (safe function handles retries)
-    create_notification_safe(
+    # Notification cho user + fan-out cho admin chạy nền (không chặn checkout)
+    await submit_job(
+        create_notification_safe,
         user_id=current_user["_id"],
         type="order",
         title="Đơn hàng đã được tạo",
@@ -195,19 +390,16 @@ async def create_order(
         link=f"/orders/{order_dict['_id']}"
     )
     
-    # Create notification for ALL admins when new order is placed
-    admin_users = users_collection.find({"role": "admin"})
-    
-    for admin in admin_users:
-        create_notification_safe(
-            user_id=admin["_id"],
-            type="order",
-            title="🆕 Đơn hàng mới",
-            message=f"Đơn hàng #{order_dict['order_number']} từ {current_user.get('full_name', 'Khách hàng')} - {order_data.total:,} VNĐ",
-            link=f"/admin/orders?highlight={order_dict['_id']}"
-        )
+    # Create notification for ALL admins when new order is placed (1 insert_many)
+    await submit_job(
+        notify_admins,
+        type="order",
+        title="🆕 Đơn hàng mới",
+        message=f"Đơn hàng #{order_dict['order_number']} từ {current_user.get('full_name', 'Khách hàng')} - {order_data.total:,} VNĐ",
+        link=f"/admin/orders?highlight={order_dict['_id']}"
+    )
     
-    log_activity(current_user["_id"], "ORDER_CREATED", {
+    await log_activity(current_user["_id"], "ORDER_CREATED", {
         "order_id": order_dict["_id"],
         "order_number": order_dict["order_number"],
         "total": order_data.total
@@ -219,7 +411,7 @@ async def create_order(
     # Ensure all required fields are present for OrderResponse
     try:
         # Get the created order from DB to ensure all fields are correct
-        created_order = orders_collection.find_one({"_id": order_dict["_id"]})
+        created_order = await orders_collection.find_one({"_id": order_dict["_id"]})
         if not created_order:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -284,10 +476,12 @@ async def create_order(
 
 @router.get("", response_model=List[OrderResponse])
 async def get_user_orders(
+    response: Response,
     current_user: dict = Depends(get_current_user),
     status_filter: Optional[OrderStatus] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None
 ):
     """
     Lấy danh sách đơn hàng của user
@@ -299,15 +493,18 @@ async def get_user_orders(
     if status_filter:
         query["status"] = status_filter
     
-    skip = (page - 1) * limit
+    skip = 0 if after else (page - 1) * limit
+    query = apply_cursor(query, "created_at", -1, after)
     
-    orders = list(
+    orders = await (
         orders_collection
         .find(query)
-        .sort("created_at", -1)
+        .sort(cursor_sort("created_at", -1))
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
+    set_next_cursor(response, orders, limit, "created_at")
     
     # Map _id to id for each order (for response only, not saved to DB)
     result = []
@@ -343,7 +540,7 @@ async def get_order(
     F22: Theo dõi trạng thái đơn hàng
     """
     
-    order = orders_collection.find_one({
+    order = await orders_collection.find_one({
         "_id": order_id,
         "user_id": current_user["_id"]
     })
@@ -382,7 +579,7 @@ async def cancel_order(
     F21: Hủy đơn hàng
     """
     
-    order = orders_collection.find_one({
+    order = await orders_collection.find_one({
         "_id": order_id,
         "user_id": current_user["_id"]
     })
@@ -408,20 +605,22 @@ async def cancel_order(
         "note": "Cancelled by customer"
     })
     
-    orders_collection.update_one(
-        {"_id": order_id},
+    # Chỉ update nếu status chưa bị đổi bởi request khác (admin cập nhật / hủy 2 lần cùng lúc)
+    await update_order_if_status_unchanged(
+        order,
         {
             "$set": {
                 "status": OrderStatus.CANCELLED,
                 "status_history": status_history,
                 "updated_at": datetime.utcnow()
             }
-        }
+        },
+        OrderStatus.CANCELLED
     )
     
     # Restore product stock
     for item in order["items"]:
-        products_collection.update_one(
+        await products_collection.update_one(
             {"_id": item["product_id"]},
             {
                 "$inc": {
@@ -430,9 +629,10 @@ async def cancel_order(
                 }
             }
         )
+        invalidate_product(item["product_id"])
     
     # Create notification
-    create_notification_safe(
+    await create_notification_safe(
         user_id=current_user["_id"],
         type="order",
         title="Đơn hàng đã bị hủy",
@@ -440,13 +640,13 @@ async def cancel_order(
         link=f"/orders/{order_id}"
     )
     
-    log_activity(current_user["_id"], "ORDER_CANCELLED", {
+    await log_activity(current_user["_id"], "ORDER_CANCELLED", {
         "order_id": order_id,
         "order_number": order["order_number"]
     })
     
     # Get updated order and map _id to id (for response only)
-    updated_order = orders_collection.find_one({"_id": order_id})
+    updated_order = await orders_collection.find_one({"_id": order_id})
     if not updated_order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -475,11 +675,13 @@ async def cancel_order(
 
 @router.get("/admin/all", response_model=List[OrderResponse])
 async def get_all_orders(
+    response: Response,
     current_user: dict = Depends(get_current_admin),
     status_filter: Optional[OrderStatus] = None,
     payment_status: Optional[PaymentStatus] = None,
     page: int = Query(1, ge=1),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = None
 ):
     """Lấy tất cả đơn hàng (Admin only)"""
     
@@ -492,15 +694,18 @@ async def get_all_orders(
         if payment_status:
             query["payment_status"] = payment_status
         
-        skip = (page - 1) * limit
+        skip = 0 if after else (page - 1) * limit
+        query = apply_cursor(query, "created_at", -1, after)
         
-        orders = list(
+        orders = await (
             orders_collection
             .find(query)
-            .sort("created_at", -1)
+            .sort(cursor_sort("created_at", -1))
             .skip(skip)
             .limit(limit)
+            .to_list(length=None)
         )
+        set_next_cursor(response, orders, limit, "created_at")
         
         # Map _id to id for each order (for response only, not saved to DB)
         result = []
@@ -534,6 +739,8 @@ async def get_all_orders(
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Admin get all orders failed: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch orders: {str(e)}")
@@ -546,7 +753,7 @@ async def update_order_status(
 ):
     """Cập nhật trạng thái đơn hàng (Admin only) - F34"""
     
-    order = orders_collection.find_one({"_id": order_id})
+    order = await orders_collection.find_one({"_id": order_id})
     
     if not order:
         raise HTTPException(
@@ -575,10 +782,9 @@ async def update_order_status(
     update_data["status_history"] = status_history
     update_data["updated_at"] = datetime.utcnow()
     
-    orders_collection.update_one(
-        {"_id": order_id},
-        {"$set": update_data}
-    )
+    # Điều kiện theo status đã đọc: 2 admin cập nhật cùng lúc thì chỉ 1 request thắng,
+    # rollup chỉ chuyển bucket cho request đã thực sự đổi status
+    await update_order_if_status_unchanged(order, {"$set": update_data}, order_update.status)
     
     # Create notification for user when order status changes
     if order_update.status:
@@ -607,7 +813,7 @@ async def update_order_status(
         
         config = status_configs.get(order_update.status)
         if config:
-            create_notification_safe(
+            await create_notification_safe(
                 user_id=order["user_id"],
                 type="order",
                 title=config["title"],
@@ -615,12 +821,12 @@ async def update_order_status(
                 link=f"/orders/{order_id}"
             )
     
-    log_activity(current_user["_id"], "ORDER_UPDATED", {
+    await log_activity(current_user["_id"], "ORDER_UPDATED", {
         "order_id": order_id,
         "updates": update_data
     })
     
-    updated_order = orders_collection.find_one({"_id": order_id})
+    updated_order = await orders_collection.find_one({"_id": order_id})
     if not updated_order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -650,12 +856,12 @@ async def get_order_stats(current_user: dict = Depends(get_current_admin)):
     """Thống kê đơn hàng (Admin only) - F36"""
     
     # Count orders by status
-    total_orders = orders_collection.count_documents({})
-    pending_orders = orders_collection.count_documents({"status": OrderStatus.PENDING})
-    confirmed_orders = orders_collection.count_documents({"status": OrderStatus.CONFIRMED})
-    shipping_orders = orders_collection.count_documents({"status": OrderStatus.SHIPPING})
-    delivered_orders = orders_collection.count_documents({"status": OrderStatus.DELIVERED})
-    cancelled_orders = orders_collection.count_documents({"status": OrderStatus.CANCELLED})
+    total_orders = await orders_collection.count_documents({})
+    pending_orders = await orders_collection.count_documents({"status": OrderStatus.PENDING})
+    confirmed_orders = await orders_collection.count_documents({"status": OrderStatus.CONFIRMED})
+    shipping_orders = await orders_collection.count_documents({"status": OrderStatus.SHIPPING})
+    delivered_orders = await orders_collection.count_documents({"status": OrderStatus.DELIVERED})
+    cancelled_orders = await orders_collection.count_documents({"status": OrderStatus.CANCELLED})
     
     # Calculate revenue
     pipeline = [
@@ -663,7 +869,7 @@ async def get_order_stats(current_user: dict = Depends(get_current_admin)):
         {"$group": {"_id": None, "total_revenue": {"$sum": "$total"}}}
     ]
     
-    revenue_result = list(orders_collection.aggregate(pipeline))
+    revenue_result = await orders_collection.aggregate(pipeline).to_list(length=None)
     total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
     
     return {
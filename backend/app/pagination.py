@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination helpers
+
+Thay vì .skip((page-1)*limit) (càng về sau càng chậm), client gửi token `after`
+mã hóa giá trị sort key + _id của phần tử cuối trang trước. Query trang tiếp theo
+dùng range scan trên index (sort_field, _id) nên trang N rẻ như trang 1.
+Token trang kế tiếp được trả về qua header X-Next-Cursor.
+"""
+from fastapi import HTTPException, Response, status
+from typing import Any, List, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    """Tạo token cursor từ document cuối cùng của trang"""
+    payload = {"v": _encode_value(doc.get(sort_field)), "id": doc["_id"]}
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[Any, Any]:
+    """Giải mã token cursor thành (giá trị sort key, _id)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return _decode_value(payload["v"]), payload["id"]
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def apply_cursor(query: dict, sort_field: str, sort_direction: int, after: Optional[str]) -> dict:
+    """Thêm điều kiện range (sort_field, _id) > / < cursor vào query"""
+    if not after:
+        return query
+
+    value, last_id = decode_cursor(after)
+    op = "$lt" if sort_direction == -1 else "$gt"
+    cursor_query = {
+        "$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "_id": {op: last_id}}
+        ]
+    }
+
+    if not query:
+        return cursor_query
+    return {"$and": [query, cursor_query]}
+
+def cursor_sort(sort_field: str, sort_direction: int) -> List[Tuple[str, int]]:
+    """Sort ổn định cho cursor mode (_id làm tie-breaker)"""
+    return [(sort_field, sort_direction), ("_id", sort_direction)]
+
+def set_next_cursor(response: Response, docs: List[dict], limit: int, sort_field: str):
+    """Gắn header X-Next-Cursor nếu còn trang tiếp theo"""
+    if docs and len(docs) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], sort_field)
@@ -0,0 +1,62 @@
+"""
+Thread pool riêng cho bcrypt (hash / verify password)
+
+bcrypt tốn ~100-300ms CPU mỗi lần; chạy trực tiếp trong async handler sẽ chặn
+event loop và mọi request khác. bcrypt nhả GIL nên chạy trên vài thread là đủ.
+Số việc đang chờ bị giới hạn (PASSWORD_POOL_MAX_PENDING): khi quá tải thì trả 503
+ngay thay vì xếp hàng vô hạn, để login storm không kéo chậm các API khác.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from typing import Any, Callable
+import asyncio
+import os
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", "2"))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+
+_executor = None
+_pending = 0
+_completed = 0
+_rejected = 0
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="password")
+    return _executor
+
+async def run_in_password_pool(func: Callable[..., Any], *args) -> Any:
+    """Chạy func trong password pool; 503 nếu backlog đã đầy"""
+    global _pending, _completed, _rejected
+    if _pending >= PASSWORD_POOL_MAX_PENDING:
+        _rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending -= 1
+        _completed += 1
+
+def get_password_pool_stats() -> dict:
+    """Số việc hash/verify đang chờ hoặc đang chạy (queue depth)"""
+    return {
+        "pending": _pending,
+        "max_pending": PASSWORD_POOL_MAX_PENDING,
+        "workers": PASSWORD_POOL_WORKERS,
+        "completed": _completed,
+        "rejected": _rejected
+    }
+
+def stop_password_pool():
+    """Dừng pool (gọi ở shutdown)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import os
+import re
+import time
 
 from .models import (
     ProductCreate, ProductUpdate, ProductResponse,
@@ -9,12 +13,118 @@ from .models import (
 )
 from .database import (
     products_collection, categories_collection, users_collection,
-    get_next_sequence, log_activity
+    get_next_sequence, log_activity, PRODUCT_CURSOR_SORT_FIELDS
 )
 from .auth import get_current_user, get_current_admin
+from .pagination import apply_cursor, cursor_sort, set_next_cursor
+from .view_counter import record_view
+from .cache import product_cache, related_products_cache
+from .images import image_url
 
 router = APIRouter(prefix="/api", tags=["Products & Categories"])
 
+# ==================== PRODUCT SERIALIZATION ====================
+
+# Độ rộng hiển thị (px, đã tính màn hình retina) để chọn rendition cho display_url
+LIST_IMAGE_WIDTH = 400  # card sản phẩm -> medium
+DETAIL_IMAGE_WIDTH = 1200  # trang chi tiết -> large
+
+def response_images(images: list, width: int) -> list:
+    """Thêm display_url (rendition WebP nhỏ nhất đủ width) cho từng ảnh, giữ nguyên url gốc"""
+    return [
+        {**image, "display_url": image_url(image, width=width, webp=True)} if isinstance(image, dict) else image
+        for image in images
+    ]
+
+def product_to_response(prod: dict, seller_name: Optional[str] = None, image_width: int = LIST_IMAGE_WIDTH) -> ProductResponse:
+    """Chuyển document sản phẩm sang ProductResponse"""
+    return ProductResponse(
+        id=prod["_id"],
+        name=prod["name"],
+        slug=prod["slug"],
+        description=prod["description"],
+        short_description=prod.get("short_description"),
+        category_id=prod["category_id"],
+        brand=prod.get("brand"),
+        price=prod["price"],
+        compare_price=prod.get("compare_price"),
+        cost_price=prod.get("cost_price"),
+        stock=prod["stock"],
+        sku=prod.get("sku"),
+        images=response_images(prod.get("images", []), image_width),
+        variants=prod.get("variants", []),
+        tags=prod.get("tags", []),
+        is_featured=prod.get("is_featured", False),
+        is_on_sale=prod.get("is_on_sale", False),
+        meta_title=prod.get("meta_title"),
+        meta_description=prod.get("meta_description"),
+        seller_id=prod.get("seller_id"),
+        store_name=prod.get("store_name"),
+        approval_status=prod.get("approval_status"),
+        rating=prod.get("rating", 0.0),
+        review_count=prod.get("review_count", 0),
+        sold_count=prod.get("sold_count", 0),
+        view_count=prod.get("view_count", 0),
+        created_at=prod["created_at"],
+        updated_at=prod["updated_at"],
+        seller_name=seller_name
+    )
+
+async def build_product_responses(products: List[dict], image_width: int = LIST_IMAGE_WIDTH) -> List[ProductResponse]:
+    """
+    Enrich danh sách sản phẩm với seller_name bằng 1 query $in duy nhất
+    (thay vì find_one cho từng sản phẩm)
+    """
+    seller_ids = list({prod["seller_id"] for prod in products if prod.get("seller_id")})
+    
+    seller_names = {}
+    if seller_ids:
+        sellers = await users_collection.find(
+            {"_id": {"$in": seller_ids}},
+            {"full_name": 1}
+        ).to_list(length=None)
+        seller_names = {seller["_id"]: seller.get("full_name") for seller in sellers}
+    
+    return [
+        product_to_response(prod, seller_names.get(prod.get("seller_id")), image_width)
+        for prod in products
+    ]
+
+# ==================== CATEGORY PRODUCT COUNTS ====================
+
+# Số giây giữ cache product_count của danh mục (invalidate ngay khi có thay đổi sản phẩm)
+CATEGORY_COUNT_TTL = int(os.getenv("CATEGORY_COUNT_TTL", "300"))
+
+_category_counts = {"data": None, "expires_at": 0.0}
+_category_counts_lock = asyncio.Lock()
+
+async def get_category_counts() -> dict:
+    """
+    Lấy số sản phẩm theo từng danh mục bằng 1 aggregation $group,
+    kết quả được cache tới khi hết TTL hoặc bị invalidate
+    """
+    if _category_counts["data"] is not None and time.monotonic() < _category_counts["expires_at"]:
+        return _category_counts["data"]
+    
+    async with _category_counts_lock:
+        # Request khác có thể đã nạp lại cache trong lúc chờ lock
+        if _category_counts["data"] is not None and time.monotonic() < _category_counts["expires_at"]:
+            return _category_counts["data"]
+        
+        pipeline = [{"$group": {"_id": "$category_id", "count": {"$sum": 1}}}]
+        counts = {}
+        async for row in products_collection.aggregate(pipeline):
+            counts[row["_id"]] = row["count"]
+        
+        _category_counts["data"] = counts
+        _category_counts["expires_at"] = time.monotonic() + CATEGORY_COUNT_TTL
+        return counts
+
+def invalidate_category_counts():
+    """Xóa cache product_count (gọi sau khi tạo/xóa/duyệt sản phẩm hoặc đổi danh mục)"""
+    _category_counts["data"] = None
+    _category_counts["expires_at"] = 0.0
+
 # ==================== CATEGORY ROUTES (F07) ====================
 
 @router.get("/categories", response_model=List[CategoryResponse])
@@ -27,13 +137,12 @@ async def get_categories(
     if parent_id is not None:
         query["parent_id"] = parent_id
     
-    categories = list(categories_collection.find(query).limit(limit))
+    categories = await categories_collection.find(query).limit(limit).to_list(length=None)
+    
+    product_counts = await get_category_counts()
     
     result = []
     for cat in categories:
-        # Count products in this category
-        product_count = products_collection.count_documents({"category_id": cat["_id"]})
-        
         result.append(CategoryResponse(
             id=cat["_id"],
             name=cat["name"],
@@ -42,7 +151,7 @@ async def get_categories(
             image=cat.get("image"),
             parent_id=cat.get("parent_id"),
             icon=cat.get("icon"),
-            product_count=product_count,
+            product_count=product_counts.get(cat["_id"], 0),
             created_at=cat["created_at"]
         ))
     
@@ -51,7 +160,7 @@ async def get_categories(
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
 async def get_category(category_id: str):
     """Lấy thông tin chi tiết danh mục"""
-    category = categories_collection.find_one({"_id": category_id})
+    category = await categories_collection.find_one({"_id": category_id})
     
     if not category:
         raise HTTPException(
@@ -59,7 +168,7 @@ async def get_category(category_id: str):
             detail="Category not found"
         )
     
-    product_count = products_collection.count_documents({"category_id": category_id})
+    product_counts = await get_category_counts()
     
     return CategoryResponse(
         id=category["_id"],
@@ -69,7 +178,7 @@ async def get_category(category_id: str):
         image=category.get("image"),
         parent_id=category.get("parent_id"),
         icon=category.get("icon"),
-        product_count=product_count,
+        product_count=product_counts.get(category_id, 0),
         created_at=category["created_at"]
     )
 
@@ -81,18 +190,18 @@ async def create_category(
     """Tạo danh mục mới (Admin only)"""
     
     # Check if slug exists
-    if categories_collection.find_one({"slug": category.slug}):
+    if await categories_collection.find_one({"slug": category.slug}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Category slug already exists"
         )
     
     category_dict = category.dict()
-    category_dict["_id"] = f"cat_{get_next_sequence('categories')}"
+    category_dict["_id"] = f"cat_{await get_next_sequence('categories')}"
     category_dict["created_at"] = datetime.utcnow()
     
-    categories_collection.insert_one(category_dict)
-    log_activity(current_user["_id"], "CATEGORY_CREATED", {"category_id": category_dict["_id"]})
+    await categories_collection.insert_one(category_dict)
+    await log_activity(current_user["_id"], "CATEGORY_CREATED", {"category_id": category_dict["_id"]})
     
     return CategoryResponse(
         id=category_dict["_id"],
@@ -114,7 +223,7 @@ async def update_category(
 ):
     """Cập nhật danh mục (Admin only)"""
     
-    if not categories_collection.find_one({"_id": category_id}):
+    if not await categories_collection.find_one({"_id": category_id}):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
@@ -122,12 +231,12 @@ async def update_category(
     
     update_data = {k: v for k, v in category_update.dict().items() if v is not None}
     
-    categories_collection.update_one(
+    await categories_collection.update_one(
         {"_id": category_id},
         {"$set": update_data}
     )
     
-    log_activity(current_user["_id"], "CATEGORY_UPDATED", {"category_id": category_id})
+    await log_activity(current_user["_id"], "CATEGORY_UPDATED", {"category_id": category_id})
     
     return await get_category(category_id)
 
@@ -139,13 +248,13 @@ async def delete_category(
     """Xóa danh mục (Admin only)"""
     
     # Check if category has products
-    if products_collection.count_documents({"category_id": category_id}) > 0:
+    if await products_collection.count_documents({"category_id": category_id}) > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete category with products"
         )
     
-    result = categories_collection.delete_one({"_id": category_id})
+    result = await categories_collection.delete_one({"_id": category_id})
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -153,14 +262,24 @@ async def delete_category(
             detail="Category not found"
         )
     
-    log_activity(current_user["_id"], "CATEGORY_DELETED", {"category_id": category_id})
+    await log_activity(current_user["_id"], "CATEGORY_DELETED", {"category_id": category_id})
     
     return {"message": "Category deleted successfully"}
 
 # ==================== PRODUCT ROUTES (F08-F12) ====================
 
-@router.get("/products", response_model=List[ProductResponse])
-async def get_products(
+# Filter sản phẩm hiển thị public (legacy data đã được backfill bởi migrate_approval_status.py)
+PUBLIC_PRODUCT_FILTER = {"approval_status": ProductApprovalStatus.APPROVED.value}
+
+def public_product_filter(**conditions) -> dict:
+    """Query sản phẩm public + các điều kiện thêm"""
+    return {**PUBLIC_PRODUCT_FILTER, **conditions}
+
+def use_text_search(search: Optional[str], search_mode: str, sort_by: str) -> bool:
+    """$text khi có từ khóa và search_mode=text hoặc sort theo độ liên quan (list, count, browse dùng chung)"""
+    return bool(search) and (search_mode == "text" or sort_by == "score")
+
+def build_product_query(
     category_id: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -168,46 +287,28 @@ async def get_products(
     brand: Optional[str] = None,
     is_featured: Optional[bool] = None,
     is_on_sale: Optional[bool] = None,
-    sort_by: str = "created_at",
-    sort_order: str = "desc",
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
-):
+    text_search: bool = False
+) -> dict:
     """
-    Lấy danh sách sản phẩm với filter và pagination
-    F08: Product List
-    F09: Pagination
-    F11: Search
-    F12: Featured/Sale products
-    F29: Filter & Sort
+    Build query public cho danh sách/đếm sản phẩm
+    text_search=True dùng $text trên text index (name, description) thay vì $regex quét toàn collection
     """
-    
-    # Build query - Show approved products OR products without approval_status (legacy data)
-    # Use simpler query for better performance
-    query = {}
-    
-    # Filter by approval_status only if we want to exclude non-approved
-    # For public access, show approved OR legacy products (without approval_status)
-    approval_filter = {
-        "$or": [
-            {"approval_status": ProductApprovalStatus.APPROVED.value},
-            {"approval_status": {"$exists": False}},  # Legacy products
-            {"approval_status": None}  # Also handle None values
-        ]
-    }
-    # Only add approval filter if we have other conditions, otherwise show all
-    query.update(approval_filter)
+    query = public_product_filter()
     
     if category_id:
         query["category_id"] = category_id
     
-    if search:
+    if search and text_search:
+        # Text index: không phân biệt hoa thường và dấu (diacritic-insensitive)
+        query["$text"] = {"$search": search}
+    elif search:
         # Use regex for case-insensitive search
         # Combine with existing query using $and
+        pattern = re.escape(search)
         search_query = {
             "$or": [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}},
+                {"name": {"$regex": pattern, "$options": "i"}},
+                {"description": {"$regex": pattern, "$options": "i"}},
                 {"tags": {"$in": [search.lower()]}}
             ]
         }
@@ -231,6 +332,40 @@ async def get_products(
     if is_on_sale is not None:
         query["is_on_sale"] = is_on_sale
     
+    return query
+
+@router.get("/products", response_model=List[ProductResponse])
+async def get_products(
+    response: Response,
+    category_id: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    brand: Optional[str] = None,
+    is_featured: Optional[bool] = None,
+    is_on_sale: Optional[bool] = None,
+    search_mode: str = Query("regex", pattern="^(regex|text)$"),
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = None
+):
+    """
+    Lấy danh sách sản phẩm với filter và pagination
+    F08: Product List
+    F09: Pagination (page hoặc cursor `after`, token trang sau ở header X-Next-Cursor)
+    F11: Search (search_mode=text dùng text index, sort_by=score để xếp theo độ liên quan)
+    F12: Featured/Sale products
+    F29: Filter & Sort
+    """
+    
+    text_search = use_text_search(search, search_mode, sort_by)
+    query = build_product_query(
+        category_id, search, min_price, max_price, brand,
+        is_featured, is_on_sale, text_search=text_search
+    )
+    
     # Sort
     sort_direction = -1 if sort_order == "desc" else 1
     sort_field = sort_by
@@ -241,60 +376,50 @@ async def get_products(
     elif sort_by == "price" and sort_order == "desc":
         sort_direction = -1  # High to low
     
-    # Pagination
-    skip = (page - 1) * limit
+    if sort_by == "score":
+        if not text_search:
+            # Không có từ khóa thì không có score, dùng sort mặc định
+            sort_field, sort_direction = "created_at", -1
+        else:
+            if after:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor pagination is not supported with sort_by=score"
+                )
+            # Relevance ranking theo textScore của text index
+            score = {"$meta": "textScore"}
+            products = await (
+                products_collection
+                .find(query, {"score": score})
+                .sort([("score", score), ("_id", -1)])
+                .skip((page - 1) * limit)
+                .limit(limit)
+                .to_list(length=None)
+            )
+            return await build_product_responses(products)
+    
+    # Pagination: cursor mode (after) dùng range scan, ngược lại skip theo page
+    if after and sort_field not in PRODUCT_CURSOR_SORT_FIELDS:
+        # Field không có index (field, _id) thì range scan thành sort trong RAM
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cursor pagination only supports sort_by in: {', '.join(PRODUCT_CURSOR_SORT_FIELDS)}"
+        )
+    skip = 0 if after else (page - 1) * limit
+    query = apply_cursor(query, sort_field, sort_direction, after)
     
-    products = list(
+    products = await (
         products_collection
         .find(query)
-        .sort(sort_field, sort_direction)
+        .sort(cursor_sort(sort_field, sort_direction))
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
-    result = []
-    for prod in products:
-        # Enrich with seller info
-        seller_name = None
-        if prod.get("seller_id"):
-            seller = users_collection.find_one({"_id": prod["seller_id"]})
-            if seller:
-                seller_name = seller.get("full_name")
-        
-        prod_dict = {
-            "id": prod["_id"],
-            "name": prod["name"],
-            "slug": prod["slug"],
-            "description": prod["description"],
-            "short_description": prod.get("short_description"),
-            "category_id": prod["category_id"],
-            "brand": prod.get("brand"),
-            "price": prod["price"],
-            "compare_price": prod.get("compare_price"),
-            "cost_price": prod.get("cost_price"),
-            "stock": prod["stock"],
-            "sku": prod.get("sku"),
-            "images": prod.get("images", []),
-            "variants": prod.get("variants", []),
-            "tags": prod.get("tags", []),
-            "is_featured": prod.get("is_featured", False),
-            "is_on_sale": prod.get("is_on_sale", False),
-            "meta_title": prod.get("meta_title"),
-            "meta_description": prod.get("meta_description"),
-            "seller_id": prod.get("seller_id"),
-            "store_name": prod.get("store_name"),
-            "approval_status": prod.get("approval_status"),
-            "rating": prod.get("rating", 0.0),
-            "review_count": prod.get("review_count", 0),
-            "sold_count": prod.get("sold_count", 0),
-            "view_count": prod.get("view_count", 0),
-            "created_at": prod["created_at"],
-            "updated_at": prod["updated_at"],
-            "seller_name": seller_name
-        }
-        result.append(ProductResponse(**prod_dict))
-    
-    return result
+    set_next_cursor(response, products, limit, sort_field)
+    return await build_product_responses(products)
+
 @router.get("/products/count")
 async def count_products(
     category_id: Optional[str] = None,
@@ -303,55 +428,127 @@ async def count_products(
     max_price: Optional[float] = None,
     brand: Optional[str] = None,
     is_featured: Optional[bool] = None,
-    is_on_sale: Optional[bool] = None
+    is_on_sale: Optional[bool] = None,
+    search_mode: str = Query("regex", pattern="^(regex|text)$"),
+    sort_by: str = "created_at"
 ):
-    """Đếm tổng số sản phẩm (cho pagination)"""
-    
-    # Count approved products OR legacy products (without approval_status)
-    query = {
-        "$or": [
-            {"approval_status": ProductApprovalStatus.APPROVED.value},
-            {"approval_status": {"$exists": False}},  # Legacy products
-            {"approval_status": None}  # Also handle None values
-        ]
-    }
-    
-    if category_id:
-        query["category_id"] = category_id
-    
-    if search:
-        # Use regex for case-insensitive search
-        # Combine with existing query using $and
-        search_query = {
-            "$or": [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}},
-                {"tags": {"$in": [search.lower()]}}
-            ]
-        }
-        # Merge search with existing query
-        original_query = query.copy()
-        query = {"$and": [original_query, search_query]}
+    """Đếm tổng số sản phẩm (cho pagination), nhận cùng search_mode/sort_by với GET /products"""
     
-    if min_price is not None or max_price is not None:
-        query["price"] = {}
-        if min_price is not None:
-            query["price"]["$gte"] = min_price
-        if max_price is not None:
-            query["price"]["$lte"] = max_price
+    query = build_product_query(
+        category_id, search, min_price, max_price, brand,
+        is_featured, is_on_sale, text_search=use_text_search(search, search_mode, sort_by)
+    )
     
-    if brand:
-        query["brand"] = brand
+    count = await products_collection.count_documents(query)
     
-    if is_featured is not None:
-        query["is_featured"] = is_featured
+    return {"total": count}
+
+# Mốc giá (VND) cho facet khoảng giá
+PRICE_BUCKET_BOUNDARIES = [0, 1_000_000, 5_000_000, 10_000_000, 20_000_000, 50_000_000]
+
+@router.get("/products/browse")
+async def browse_products(
+    category_id: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    brand: Optional[str] = None,
+    is_featured: Optional[bool] = None,
+    is_on_sale: Optional[bool] = None,
+    search_mode: str = Query("regex", pattern="^(regex|text)$"),
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Danh sách sản phẩm + tổng số + facet (brand, category, khoảng giá, on-sale)
+    trong 1 aggregation $facet (thay cho gọi /products rồi /products/count)
+    """
     
-    if is_on_sale is not None:
-        query["is_on_sale"] = is_on_sale
+    text_search = use_text_search(search, search_mode, sort_by)
+    query = build_product_query(
+        category_id, search, min_price, max_price, brand,
+        is_featured, is_on_sale, text_search=text_search
+    )
     
-    count = products_collection.count_documents(query)
+    pipeline = [{"$match": query}]
+    
+    if sort_by == "score" and text_search:
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        sort_stage = {"score": -1, "_id": -1}
+    else:
+        if sort_by == "score":
+            sort_by, sort_order = "created_at", "desc"
+        sort_direction = -1 if sort_order == "desc" else 1
+        sort_stage = {sort_by: sort_direction, "_id": sort_direction}
+    
+    pipeline.append({
+        "$facet": {
+            "items": [
+                {"$sort": sort_stage},
+                {"$skip": (page - 1) * limit},
+                {"$limit": limit}
+            ],
+            "total": [{"$count": "count"}],
+            "brands": [
+                {"$group": {"_id": "$brand", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "categories": [
+                {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "price_ranges": [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKET_BOUNDARIES,
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "on_sale": [
+                {"$group": {"_id": "$is_on_sale", "count": {"$sum": 1}}}
+            ]
+        }
+    })
     
-    return {"total": count}
+    result = await products_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
+    
+    total = facets["total"][0]["count"] if facets.get("total") else 0
+    
+    price_ranges = []
+    for bucket in facets.get("price_ranges", []):
+        if bucket["_id"] == "other":
+            min_value, max_value = PRICE_BUCKET_BOUNDARIES[-1], None
+        else:
+            min_value = bucket["_id"]
+            index = PRICE_BUCKET_BOUNDARIES.index(min_value)
+            max_value = PRICE_BUCKET_BOUNDARIES[index + 1]
+        price_ranges.append({"min": min_value, "max": max_value, "count": bucket["count"]})
+    
+    on_sale_count = sum(row["count"] for row in facets.get("on_sale", []) if row["_id"] is True)
+    
+    return {
+        "items": await build_product_responses(facets.get("items", [])),
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit,
+        "facets": {
+            "brands": [
+                {"value": row["_id"], "count": row["count"]}
+                for row in facets.get("brands", []) if row["_id"]
+            ],
+            "categories": [
+                {"value": row["_id"], "count": row["count"]}
+                for row in facets.get("categories", []) if row["_id"]
+            ],
+            "price_ranges": price_ranges,
+            "on_sale": {"true": on_sale_count, "false": total - on_sale_count}
+        }
+    }
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(product_id: str):
@@ -360,15 +557,12 @@ async def get_product(product_id: str):
     F10: Product Detail
     """
     
-    # Find product - allow approved OR legacy products (without approval_status)
-    product = products_collection.find_one({
-        "_id": product_id,
-        "$or": [
-            {"approval_status": ProductApprovalStatus.APPROVED.value},
-            {"approval_status": {"$exists": False}},
-            {"approval_status": None}
-        ]
-    })
+    cached = product_cache.get(product_id)
+    if cached is not None:
+        record_view(product_id)
+        return cached
+    
+    product = await products_collection.find_one(public_product_filter(_id=product_id))
     
     if not product:
         raise HTTPException(
@@ -376,50 +570,13 @@ async def get_product(product_id: str):
             detail="Product not found"
         )
     
-    # Increment view count
-    products_collection.update_one(
-        {"_id": product_id},
-        {"$inc": {"view_count": 1}}
-    )
+    # Increment view count (buffered, flush định kỳ bằng bulk_write)
+    record_view(product_id)
     
     # Enrich with seller info
-    seller_name = None
-    if product.get("seller_id"):
-        seller = users_collection.find_one({"_id": product["seller_id"]})
-        if seller:
-            seller_name = seller.get("full_name")
-    
-    return ProductResponse(
-        id=product["_id"],
-        name=product["name"],
-        slug=product["slug"],
-        description=product["description"],
-        short_description=product.get("short_description"),
-        category_id=product["category_id"],
-        brand=product.get("brand"),
-        price=product["price"],
-        compare_price=product.get("compare_price"),
-        cost_price=product.get("cost_price"),
-        stock=product["stock"],
-        sku=product.get("sku"),
-        images=product.get("images", []),
-        variants=product.get("variants", []),
-        tags=product.get("tags", []),
-        is_featured=product.get("is_featured", False),
-        is_on_sale=product.get("is_on_sale", False),
-        meta_title=product.get("meta_title"),
-        meta_description=product.get("meta_description"),
-        seller_id=product.get("seller_id"),
-        store_name=product.get("store_name"),
-        approval_status=product.get("approval_status"),
-        rating=product.get("rating", 0.0),
-        review_count=product.get("review_count", 0),
-        sold_count=product.get("sold_count", 0),
-        view_count=product.get("view_count", 0),
-        created_at=product["created_at"],
-        updated_at=product["updated_at"],
-        seller_name=seller_name
-    )
+    responses = await build_product_responses([product], image_width=DETAIL_IMAGE_WIDTH)
+    product_cache.set(product_id, responses[0])
+    return responses[0]
 
 # ==================== ADMIN PRODUCT ROUTES MOVED TO admin.py ====================
 # Admin product management endpoints are now in app/admin.py to avoid routing conflicts
@@ -435,8 +592,12 @@ async def get_related_products(
 ):
     """Lấy sản phẩm liên quan (cùng danh mục)"""
     
+    cached = related_products_cache.get((product_id, limit))
+    if cached is not None:
+        return cached
+    
     # Get current product
-    product = products_collection.find_one({"_id": product_id})
+    product = await products_collection.find_one({"_id": product_id})
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -444,62 +605,20 @@ async def get_related_products(
         )
     
     # Find products in same category, exclude current product
-    query = {
-        "category_id": product["category_id"],
-        "_id": {"$ne": product_id},
-        "$or": [
-            {"approval_status": ProductApprovalStatus.APPROVED.value},
-            {"approval_status": {"$exists": False}},
-            {"approval_status": None}
-        ]
-    }
+    query = public_product_filter(
+        category_id=product["category_id"],
+        _id={"$ne": product_id}
+    )
     
-    related = list(
+    related = await (
         products_collection
         .find(query)
         .limit(limit)
+        .to_list(length=None)
     )
     
-    result = []
-    for prod in related:
-        seller_name = None
-        if prod.get("seller_id"):
-            seller = users_collection.find_one({"_id": prod["seller_id"]})
-            if seller:
-                seller_name = seller.get("full_name")
-        
-        result.append(ProductResponse(
-            id=prod["_id"],
-            name=prod["name"],
-            slug=prod["slug"],
-            description=prod["description"],
-            short_description=prod.get("short_description"),
-            category_id=prod["category_id"],
-            brand=prod.get("brand"),
-            price=prod["price"],
-            compare_price=prod.get("compare_price"),
-            cost_price=prod.get("cost_price"),
-            stock=prod["stock"],
-            sku=prod.get("sku"),
-            images=prod.get("images", []),
-            variants=prod.get("variants", []),
-            tags=prod.get("tags", []),
-            is_featured=prod.get("is_featured", False),
-            is_on_sale=prod.get("is_on_sale", False),
-            meta_title=prod.get("meta_title"),
-            meta_description=prod.get("meta_description"),
-            seller_id=prod.get("seller_id"),
-            store_name=prod.get("store_name"),
-            approval_status=prod.get("approval_status"),
-            rating=prod.get("rating", 0.0),
-            review_count=prod.get("review_count", 0),
-            sold_count=prod.get("sold_count", 0),
-            view_count=prod.get("view_count", 0),
-            created_at=prod["created_at"],
-            updated_at=prod["updated_at"],
-            seller_name=seller_name
-        ))
-    
+    result = await build_product_responses(related)
+    related_products_cache.set((product_id, limit), result)
     return result
 
 @router.get("/products/{product_id}/reviews")
@@ -511,7 +630,7 @@ async def get_product_reviews(
     """Lấy đánh giá của sản phẩm"""
     
     # Check if product exists
-    if not products_collection.find_one({"_id": product_id}):
+    if not await products_collection.find_one({"_id": product_id}):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
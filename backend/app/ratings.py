@@ -0,0 +1,112 @@
+"""
+Rating aggregates: tổng hợp đánh giá được cập nhật incremental trên product
+
+Mỗi product lưu:
+    rating_stats: {sum, count, "1": n, "2": n, "3": n, "4": n, "5": n}
+cùng với rating (trung bình, làm tròn 1 chữ số) và review_count.
+
+Mỗi lần tạo / sửa / xóa review chỉ cần 1 $inc vào rating_stats rồi set lại
+rating từ kết quả, nên chi phí không phụ thuộc số review của sản phẩm.
+Product chưa có rating_stats (chưa có review nào) được $inc từ 0.
+"""
+from pymongo import ReturnDocument, UpdateOne
+
+from .database import products_collection
+from .cache import invalidate_product
+
+RATING_STARS = ["5", "4", "3", "2", "1"]
+
+def rating_increments(rating: int, sign: int = 1) -> dict:
+    """$inc của 1 review vào rating_stats (sign=-1 để trừ ra)"""
+    return {
+        "rating_stats.sum": sign * rating,
+        "rating_stats.count": sign,
+        f"rating_stats.{rating}": sign
+    }
+
+def rating_summary(rating_stats: dict) -> dict:
+    """total_reviews / average_rating / rating_distribution từ rating_stats"""
+    rating_stats = rating_stats or {}
+    count = max(rating_stats.get("count", 0), 0)
+    return {
+        "total_reviews": count,
+        "average_rating": round(rating_stats.get("sum", 0) / count, 1) if count else 0,
+        "rating_distribution": {star: max(rating_stats.get(star, 0), 0) for star in RATING_STARS}
+    }
+
+async def _apply_rating_increments(product_id: str, inc: dict):
+    product = await products_collection.find_one_and_update(
+        {"_id": product_id},
+        {"$inc": inc},
+        projection={"rating_stats": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not product:
+        return
+
+    stats = product.get("rating_stats", {})
+    summary = rating_summary(stats)
+    # Chỉ ghi nếu rating_stats chưa bị thay đổi tiếp; nếu có, lần cập nhật sau sẽ ghi
+    await products_collection.update_one(
+        {"_id": product_id, "rating_stats.sum": stats.get("sum"), "rating_stats.count": stats.get("count")},
+        {"$set": {"rating": summary["average_rating"], "review_count": summary["total_reviews"]}}
+    )
+    invalidate_product(product_id)
+
+async def record_review_added(product_id: str, rating: int):
+    """Cộng review mới vào rating của sản phẩm"""
+    await _apply_rating_increments(product_id, rating_increments(rating))
+
+async def record_review_removed(product_id: str, rating: int):
+    """Trừ review đã xóa khỏi rating của sản phẩm"""
+    await _apply_rating_increments(product_id, rating_increments(rating, -1))
+
+async def record_review_rating_changed(product_id: str, old_rating: int, new_rating: int):
+    """Chuyển 1 review từ số sao cũ sang số sao mới"""
+    if old_rating == new_rating:
+        return
+    await _apply_rating_increments(product_id, {
+        "rating_stats.sum": new_rating - old_rating,
+        f"rating_stats.{old_rating}": -1,
+        f"rating_stats.{new_rating}": 1
+    })
+
+def rebuild_rating_stats_sync(sync_db) -> int:
+    """Build lại rating_stats của mọi sản phẩm có review (dùng cho script backfill), trả về số sản phẩm"""
+    pipeline = [
+        {"$group": {
+            "_id": {"product_id": "$product_id", "rating": "$rating"},
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": "$_id.product_id",
+            "stars": {"$push": {"k": {"$toString": "$_id.rating"}, "v": "$count"}},
+            "sum": {"$sum": {"$multiply": ["$_id.rating", "$count"]}},
+            "count": {"$sum": "$count"}
+        }}
+    ]
+
+    operations = []
+    count = 0
+    for row in sync_db["reviews"].aggregate(pipeline):
+        rating_stats = {star: 0 for star in RATING_STARS}
+        rating_stats.update({star["k"]: star["v"] for star in row["stars"]})
+        rating_stats["sum"] = row["sum"]
+        rating_stats["count"] = row["count"]
+        summary = rating_summary(rating_stats)
+        operations.append(UpdateOne(
+            {"_id": row["_id"]},
+            {"$set": {
+                "rating_stats": rating_stats,
+                "rating": summary["average_rating"],
+                "review_count": summary["total_reviews"]
+            }}
+        ))
+        count += 1
+        if len(operations) >= 1000:
+            sync_db["products"].bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        sync_db["products"].bulk_write(operations, ordered=False)
+    return count
@@ -8,6 +8,9 @@ from .database import (
     get_next_sequence, log_activity
 )
 from .auth import get_current_user, get_current_admin
+from .ratings import (
+    rating_summary, record_review_added, record_review_removed, record_review_rating_changed
+)
 
 router = APIRouter(prefix="/api/reviews", tags=["Reviews"])
 
@@ -23,7 +26,7 @@ async def create_review(
     """
     
     # Kiểm tra sản phẩm tồn tại
-    product = products_collection.find_one({"_id": review.product_id})
+    product = await products_collection.find_one({"_id": review.product_id})
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -31,7 +34,7 @@ async def create_review(
         )
     
     # Kiểm tra user đã mua sản phẩm này chưa
-    purchased_order = orders_collection.find_one({
+    purchased_order = await orders_collection.find_one({
         "user_id": current_user["_id"],
         "status": "delivered",
         "items.product_id": review.product_id
@@ -44,7 +47,7 @@ async def create_review(
         )
     
     # Kiểm tra đã đánh giá chưa
-    existing_review = reviews_collection.find_one({
+    existing_review = await reviews_collection.find_one({
         "user_id": current_user["_id"],
         "product_id": review.product_id
     })
@@ -57,19 +60,19 @@ async def create_review(
     
     # Tạo review
     review_dict = review.dict()
-    review_dict["_id"] = f"review_{get_next_sequence('reviews')}"
+    review_dict["_id"] = f"review_{await get_next_sequence('reviews')}"
     review_dict["user_id"] = current_user["_id"]
     review_dict["is_verified_purchase"] = True
     review_dict["helpful_count"] = 0
     review_dict["created_at"] = datetime.utcnow()
     review_dict["admin_reply"] = None
     
-    reviews_collection.insert_one(review_dict)
+    await reviews_collection.insert_one(review_dict)
     
-    # Cập nhật rating và review_count của sản phẩm
-    update_product_rating(review.product_id)
+    # Cập nhật rating và review_count của sản phẩm ($inc rating_stats)
+    await record_review_added(review.product_id, review.rating)
     
-    log_activity(current_user["_id"], "REVIEW_CREATED", {
+    await log_activity(current_user["_id"], "REVIEW_CREATED", {
         "review_id": review_dict["_id"],
         "product_id": review.product_id,
         "rating": review.rating
@@ -98,18 +101,19 @@ async def get_product_reviews(
     # Sort direction
     sort_direction = -1  # Descending
     
-    reviews = list(
+    reviews = await (
         reviews_collection
         .find({"product_id": product_id})
         .sort(sort_by, sort_direction)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
     for review in reviews:
         # Lấy thông tin user từ user_id
-        user = users_collection.find_one({"_id": review["user_id"]})
+        user = await users_collection.find_one({"_id": review["user_id"]})
         if user:
             review["user_name"] = user.get("full_name") or user.get("name") or user.get("email", "Anonymous")
             review["user_avatar"] = user.get("avatar")
@@ -134,12 +138,13 @@ async def get_my_reviews(
     
     skip = (page - 1) * limit
     
-    reviews = list(
+    reviews = await (
         reviews_collection
         .find({"user_id": current_user["_id"]})
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
@@ -163,7 +168,7 @@ async def can_review_product(
     """
     
     # Kiểm tra đã mua và giao thành công
-    purchased_order = orders_collection.find_one({
+    purchased_order = await orders_collection.find_one({
         "user_id": current_user["_id"],
         "status": "delivered",
         "items.product_id": product_id
@@ -176,7 +181,7 @@ async def can_review_product(
         }
     
     # Kiểm tra đã đánh giá chưa
-    existing_review = reviews_collection.find_one({
+    existing_review = await reviews_collection.find_one({
         "user_id": current_user["_id"],
         "product_id": product_id
     })
@@ -203,7 +208,7 @@ async def update_review(
     Cập nhật đánh giá (chỉ user tạo review mới được sửa)
     """
     
-    review = reviews_collection.find_one({"_id": review_id})
+    review = await reviews_collection.find_one({"_id": review_id})
     
     if not review:
         raise HTTPException(
@@ -222,16 +227,17 @@ async def update_review(
     update_data = {k: v for k, v in review_update.dict().items() if v is not None}
     
     if update_data:
-        reviews_collection.update_one(
+        # Trả về document trước khi update để biết số sao cũ
+        previous = await reviews_collection.find_one_and_update(
             {"_id": review_id},
             {"$set": update_data}
         )
         
         # Cập nhật rating sản phẩm nếu rating thay đổi
-        if "rating" in update_data:
-            update_product_rating(review["product_id"])
+        if "rating" in update_data and previous:
+            await record_review_rating_changed(review["product_id"], previous["rating"], update_data["rating"])
     
-    updated_review = reviews_collection.find_one({"_id": review_id})
+    updated_review = await reviews_collection.find_one({"_id": review_id})
     updated_review["id"] = updated_review["_id"]
     return ReviewResponse(**updated_review)
 
@@ -244,7 +250,7 @@ async def delete_review(
     Xóa đánh giá (user hoặc admin)
     """
     
-    review = reviews_collection.find_one({"_id": review_id})
+    review = await reviews_collection.find_one({"_id": review_id})
     
     if not review:
         raise HTTPException(
@@ -261,10 +267,11 @@ async def delete_review(
     
     product_id = review["product_id"]
     
-    reviews_collection.delete_one({"_id": review_id})
+    result = await reviews_collection.delete_one({"_id": review_id})
     
-    # Cập nhật rating sản phẩm
-    update_product_rating(product_id)
+    # Cập nhật rating sản phẩm (chỉ khi thực sự xóa, tránh trừ 2 lần)
+    if result.deleted_count:
+        await record_review_removed(product_id, review["rating"])
     
     return {"message": "Đã xóa đánh giá thành công"}
 
@@ -277,7 +284,7 @@ async def mark_review_helpful(
     Đánh dấu đánh giá hữu ích
     """
     
-    review = reviews_collection.find_one({"_id": review_id})
+    review = await reviews_collection.find_one({"_id": review_id})
     
     if not review:
         raise HTTPException(
@@ -286,7 +293,7 @@ async def mark_review_helpful(
         )
     
     # Tăng helpful_count
-    reviews_collection.update_one(
+    await reviews_collection.update_one(
         {"_id": review_id},
         {"$inc": {"helpful_count": 1}}
     )
@@ -303,7 +310,7 @@ async def reply_to_review(
     Admin trả lời đánh giá
     """
     
-    review = reviews_collection.find_one({"_id": review_id})
+    review = await reviews_collection.find_one({"_id": review_id})
     
     if not review:
         raise HTTPException(
@@ -311,7 +318,7 @@ async def reply_to_review(
             detail="Không tìm thấy đánh giá"
         )
     
-    reviews_collection.update_one(
+    await reviews_collection.update_one(
         {"_id": review_id},
         {"$set": {"admin_reply": reply}}
     )
@@ -324,58 +331,6 @@ async def get_review_stats(product_id: str):
     Thống kê đánh giá của sản phẩm
     """
     
-    reviews = list(reviews_collection.find({"product_id": product_id}))
-    
-    if not reviews:
-        return {
-            "total_reviews": 0,
-            "average_rating": 0,
-            "rating_distribution": {
-                "5": 0,
-                "4": 0,
-                "3": 0,
-                "2": 0,
-                "1": 0
-            }
-        }
-    
-    # Calculate stats
-    total_reviews = len(reviews)
-    total_rating = sum(r["rating"] for r in reviews)
-    average_rating = total_rating / total_reviews
-    
-    # Rating distribution
-    rating_dist = {"5": 0, "4": 0, "3": 0, "2": 0, "1": 0}
-    for review in reviews:
-        rating_dist[str(review["rating"])] += 1
-    
-    return {
-        "total_reviews": total_reviews,
-        "average_rating": round(average_rating, 1),
-        "rating_distribution": rating_dist
-    }
-
-def update_product_rating(product_id: str):
-    """
-    Cập nhật rating và review_count của sản phẩm
-    """
-    
-    reviews = list(reviews_collection.find({"product_id": product_id}))
+    product = await products_collection.find_one({"_id": product_id}, {"rating_stats": 1})
     
-    if not reviews:
-        products_collection.update_one(
-            {"_id": product_id},
-            {"$set": {"rating": 0, "review_count": 0}}
-        )
-        return
-    
-    total_rating = sum(r["rating"] for r in reviews)
-    average_rating = total_rating / len(reviews)
-    
-    products_collection.update_one(
-        {"_id": product_id},
-        {"$set": {
-            "rating": round(average_rating, 1),
-            "review_count": len(reviews)
-        }}
-    )
+    return rating_summary(product.get("rating_stats") if product else None)
@@ -0,0 +1,192 @@
+"""
+Order rollups: số liệu dashboard được tổng hợp sẵn theo giờ và theo ngày (UTC)
+
+Mỗi document trong order_rollups:
+    {_id: "hour:2024-01-31T09" | "day:2024-01-31", granularity, bucket,
+     revenue, order_count, items,
+     by_status: {status: {count, revenue, items}}, by_payment_method: {method: {count, revenue}}}
+
+Bucket tính theo created_at của order nên khi đổi trạng thái chỉ chuyển số liệu
+giữa các status trong đúng bucket đó. Dashboard đọc rollup nên chi phí chỉ phụ
+thuộc độ dài khoảng thời gian, không phụ thuộc số đơn hàng.
+
+Rollup được cập nhật inline cùng lúc ghi order (trong cùng transaction nếu MongoDB
+hỗ trợ), không qua job queue: job bị mất khi shutdown sẽ làm lệch số liệu vĩnh viễn.
+"""
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .database import order_rollups_collection
+
+def _enum_value(value, default: str) -> str:
+    if value is None:
+        return default
+    return getattr(value, "value", value)
+
+def _as_utc_naive(dt) -> Optional[datetime]:
+    if isinstance(dt, str):
+        try:
+            dt = datetime.fromisoformat(dt.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(dt, datetime):
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def _buckets(created_at: datetime):
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+    day = hour.replace(hour=0)
+    return [
+        ("hour", hour, f"hour:{hour.strftime('%Y-%m-%dT%H')}"),
+        ("day", day, f"day:{day.strftime('%Y-%m-%d')}")
+    ]
+
+def _rollup_ops(created_at: datetime, inc: dict) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": rollup_id},
+            {"$inc": inc, "$setOnInsert": {"granularity": granularity, "bucket": bucket}},
+            upsert=True
+        )
+        for granularity, bucket, rollup_id in _buckets(created_at)
+    ]
+
+def order_rollup_increments(order: dict, sign: int = 1) -> dict:
+    """$inc của 1 order vào rollup (sign=-1 để trừ ra)"""
+    total = float(order.get("total", 0) or 0)
+    status = _enum_value(order.get("status"), "pending")
+    payment_method = _enum_value(order.get("payment_method"), "unknown")
+    items = sum(int(item.get("quantity", 0) or 0) for item in order.get("items", []))
+
+    return {
+        "revenue": sign * total,
+        "order_count": sign,
+        "items": sign * items,
+        f"by_status.{status}.count": sign,
+        f"by_status.{status}.revenue": sign * total,
+        f"by_status.{status}.items": sign * items,
+        f"by_payment_method.{payment_method}.count": sign,
+        f"by_payment_method.{payment_method}.revenue": sign * total
+    }
+
+async def record_order_created(order: dict, session=None):
+    """Cộng order mới vào rollup giờ + ngày"""
+    created_at = _as_utc_naive(order.get("created_at"))
+    if created_at is None:
+        return
+    await order_rollups_collection.bulk_write(
+        _rollup_ops(created_at, order_rollup_increments(order)),
+        ordered=False,
+        session=session
+    )
+
+async def record_order_status_change(order: dict, old_status, new_status, session=None):
+    """Chuyển số liệu của order từ status cũ sang status mới trong bucket của nó"""
+    old_status = _enum_value(old_status, "pending")
+    new_status = _enum_value(new_status, "pending")
+    if old_status == new_status:
+        return
+
+    created_at = _as_utc_naive(order.get("created_at"))
+    if created_at is None:
+        return
+
+    total = float(order.get("total", 0) or 0)
+    items = sum(int(item.get("quantity", 0) or 0) for item in order.get("items", []))
+    inc = {
+        f"by_status.{old_status}.count": -1,
+        f"by_status.{old_status}.revenue": -total,
+        f"by_status.{old_status}.items": -items,
+        f"by_status.{new_status}.count": 1,
+        f"by_status.{new_status}.revenue": total,
+        f"by_status.{new_status}.items": items
+    }
+    await order_rollups_collection.bulk_write(_rollup_ops(created_at, inc), ordered=False, session=session)
+
+def _breakdown_stage(field: str) -> list:
+    return [
+        {"$project": {"entry": {"$objectToArray": f"${field}"}}},
+        {"$unwind": "$entry"},
+        {"$group": {
+            "_id": "$entry.k",
+            "count": {"$sum": "$entry.v.count"},
+            "revenue": {"$sum": "$entry.v.revenue"},
+            "items": {"$sum": "$entry.v.items"}
+        }}
+    ]
+
+async def get_rollup_summary(start: datetime, end: datetime, granularity: str = "hour") -> dict:
+    """
+    Tổng revenue/order/items và breakdown theo status, payment method của các bucket
+    có thời điểm bắt đầu trong [start, end). Các khoảng liền nhau không đếm trùng;
+    sai số tối đa 1 bucket ở đầu khoảng.
+    """
+    start = _as_utc_naive(start)
+    end = _as_utc_naive(end)
+
+    pipeline = [
+        {"$match": {"granularity": granularity, "bucket": {"$gte": start, "$lt": end}}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "revenue": {"$sum": "$revenue"},
+                "order_count": {"$sum": "$order_count"},
+                "items": {"$sum": "$items"}
+            }}],
+            "by_status": _breakdown_stage("by_status"),
+            "by_payment_method": _breakdown_stage("by_payment_method")
+        }}
+    ]
+
+    result = await order_rollups_collection.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {}
+    totals = facets["totals"][0] if facets.get("totals") else {}
+
+    return {
+        "revenue": totals.get("revenue", 0),
+        "order_count": totals.get("order_count", 0),
+        "items": totals.get("items", 0),
+        "by_status": {
+            row["_id"]: {"count": row["count"], "revenue": row["revenue"], "items": row["items"]}
+            for row in facets.get("by_status", []) if row["count"]
+        },
+        "by_payment_method": {
+            row["_id"]: {"count": row["count"], "revenue": row["revenue"]}
+            for row in facets.get("by_payment_method", []) if row["count"]
+        }
+    }
+
+async def get_daily_rollups(start: datetime, end: datetime) -> List[dict]:
+    """Rollup theo ngày trong [start, end] (cho chart)"""
+    start = _as_utc_naive(start).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = _as_utc_naive(end)
+    return await (
+        order_rollups_collection
+        .find({"granularity": "day", "bucket": {"$gte": start, "$lte": end}})
+        .sort("bucket", 1)
+        .to_list(length=None)
+    )
+
+def rebuild_rollups_sync(sync_db) -> int:
+    """Build lại toàn bộ order_rollups từ orders (dùng cho script backfill), trả về số order"""
+    rollups = sync_db["order_rollups"]
+    rollups.delete_many({})
+
+    operations = []
+    count = 0
+    for order in sync_db["orders"].find({}, {"total": 1, "status": 1, "payment_method": 1, "items.quantity": 1, "created_at": 1}):
+        created_at = _as_utc_naive(order.get("created_at"))
+        if created_at is None:
+            continue
+        operations.extend(_rollup_ops(created_at, order_rollup_increments(order)))
+        count += 1
+        if len(operations) >= 1000:
+            rollups.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        rollups.bulk_write(operations, ordered=False)
+    return count
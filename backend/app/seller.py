@@ -12,6 +12,9 @@ from .database import (
     get_next_sequence
 )
 from .auth import get_current_seller
+from .products import build_product_responses, invalidate_category_counts
+from .cache import invalidate_product
+from .images import attach_renditions
 
 router = APIRouter(prefix="/api/seller", tags=["Seller"])
 
@@ -33,20 +36,16 @@ async def get_seller_products(
     
     skip = (page - 1) * limit
     
-    products = list(
+    products = await (
         products_collection
         .find(query)
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
-    result = []
-    for product in products:
-        product["id"] = product["_id"]
-        result.append(ProductResponse(**product))
-    
-    return result
+    return await build_product_responses(products)
 
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
@@ -56,7 +55,7 @@ async def create_product(
     """Seller tạo sản phẩm mới (chờ admin duyệt)"""
     
     # Check if category exists
-    category = categories_collection.find_one({"_id": product_data.category_id})
+    category = await categories_collection.find_one({"_id": product_data.category_id})
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -64,7 +63,7 @@ async def create_product(
         )
     
     # Check if slug already exists
-    if products_collection.find_one({"slug": product_data.slug}):
+    if await products_collection.find_one({"slug": product_data.slug}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Product slug already exists"
@@ -72,8 +71,9 @@ async def create_product(
     
     # Create product
     product_dict = product_data.dict()
-    product_dict["_id"] = f"product_{get_next_sequence('products')}"
+    product_dict["_id"] = f"product_{await get_next_sequence('products')}"
     product_dict["seller_id"] = current_seller["_id"]
+    product_dict["images"] = attach_renditions(product_dict.get("images"))
     product_dict["store_name"] = current_seller.get("store_name", "Unknown Store")
     product_dict["approval_status"] = ProductApprovalStatus.PENDING  # Chờ duyệt
     product_dict["rating"] = 0.0
@@ -83,16 +83,17 @@ async def create_product(
     product_dict["created_at"] = datetime.utcnow()
     product_dict["updated_at"] = datetime.utcnow()
     
-    products_collection.insert_one(product_dict)
+    await products_collection.insert_one(product_dict)
+    invalidate_category_counts()
     
     # Log activity
-    log_activity(current_seller["_id"], "SELLER_PRODUCT_CREATED", {
+    await log_activity(current_seller["_id"], "SELLER_PRODUCT_CREATED", {
         "product_id": product_dict["_id"],
         "product_name": product_data.name
     })
     
-    product_dict["id"] = product_dict["_id"]
-    return ProductResponse(**product_dict)
+    responses = await build_product_responses([product_dict])
+    return responses[0]
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
 async def update_product(
@@ -102,7 +103,7 @@ async def update_product(
 ):
     """Seller cập nhật sản phẩm (nếu đã approved, sẽ về pending sau khi update)"""
     
-    product = products_collection.find_one({
+    product = await products_collection.find_one({
         "_id": product_id,
         "seller_id": current_seller["_id"]
     })
@@ -116,26 +117,33 @@ async def update_product(
     # Update product
     update_data = product_update.dict(exclude_unset=True)
     
+    if "images" in update_data:
+        update_data["images"] = attach_renditions(update_data["images"])
+    
     # If product was approved and is being updated, set back to pending
     if product.get("approval_status") == ProductApprovalStatus.APPROVED and update_data:
         update_data["approval_status"] = ProductApprovalStatus.PENDING
     
     update_data["updated_at"] = datetime.utcnow()
     
-    products_collection.update_one(
+    await products_collection.update_one(
         {"_id": product_id},
         {"$set": update_data}
     )
     
+    invalidate_product(product_id)
+    if "category_id" in update_data:
+        invalidate_category_counts()
+    
     # Get updated product
-    updated_product = products_collection.find_one({"_id": product_id})
-    updated_product["id"] = updated_product["_id"]
+    updated_product = await products_collection.find_one({"_id": product_id})
     
-    log_activity(current_seller["_id"], "SELLER_PRODUCT_UPDATED", {
+    await log_activity(current_seller["_id"], "SELLER_PRODUCT_UPDATED", {
         "product_id": product_id
     })
     
-    return ProductResponse(**updated_product)
+    responses = await build_product_responses([updated_product])
+    return responses[0]
 
 @router.delete("/products/{product_id}")
 async def delete_product(
@@ -144,7 +152,7 @@ async def delete_product(
 ):
     """Seller xóa sản phẩm"""
     
-    product = products_collection.find_one({
+    product = await products_collection.find_one({
         "_id": product_id,
         "seller_id": current_seller["_id"]
     })
@@ -155,9 +163,11 @@ async def delete_product(
             detail="Product not found"
         )
     
-    products_collection.delete_one({"_id": product_id})
+    await products_collection.delete_one({"_id": product_id})
+    invalidate_product(product_id)
+    invalidate_category_counts()
     
-    log_activity(current_seller["_id"], "SELLER_PRODUCT_DELETED", {
+    await log_activity(current_seller["_id"], "SELLER_PRODUCT_DELETED", {
         "product_id": product_id
     })
     
@@ -175,7 +185,7 @@ async def get_product_reviews(
     """Seller xem đánh giá của sản phẩm"""
     
     # Check if product belongs to seller
-    product = products_collection.find_one({
+    product = await products_collection.find_one({
         "_id": product_id,
         "seller_id": current_seller["_id"]
     })
@@ -188,18 +198,19 @@ async def get_product_reviews(
     
     # Get reviews
     skip = (page - 1) * limit
-    reviews = list(
+    reviews = await (
         reviews_collection
         .find({"product_id": product_id})
         .sort("created_at", -1)
         .skip(skip)
         .limit(limit)
+        .to_list(length=None)
     )
     
     result = []
     for review in reviews:
         # Enrich with user info
-        user = users_collection.find_one({"_id": review.get("user_id")})
+        user = await users_collection.find_one({"_id": review.get("user_id")})
         if user:
             review["user_name"] = user.get("full_name", "Anonymous")
             review["user_avatar"] = user.get("avatar")
@@ -218,34 +229,30 @@ async def get_seller_stats(current_seller: dict = Depends(get_current_seller)):
     seller_id = current_seller["_id"]
     
     # Product stats - Handle enum values correctly
-    total_products = products_collection.count_documents({"seller_id": seller_id})
-    pending_products = products_collection.count_documents({
+    total_products = await products_collection.count_documents({"seller_id": seller_id})
+    pending_products = await products_collection.count_documents({
         "seller_id": seller_id,
         "approval_status": ProductApprovalStatus.PENDING.value
     })
-    approved_products = products_collection.count_documents({
+    approved_products = await products_collection.count_documents({
         "seller_id": seller_id,
         "approval_status": ProductApprovalStatus.APPROVED.value
     })
-    rejected_products = products_collection.count_documents({
+    rejected_products = await products_collection.count_documents({
         "seller_id": seller_id,
         "approval_status": ProductApprovalStatus.REJECTED.value
     })
     
-    # Order stats (orders containing seller's products)
-    seller_orders = []
-    all_orders = orders_collection.find({"status": {"$ne": "cancelled"}})
-    for order in all_orders:
-        items = order.get("items", [])
-        for item in items:
-            # Check if product belongs to seller
-            product = products_collection.find_one({"_id": item.get("product_id")})
-            if product and product.get("seller_id") == seller_id:
-                seller_orders.append(order)
-                break
-    
-    total_orders = len(seller_orders)
-    total_revenue = sum(order.get("total", 0) for order in seller_orders)
+    # Order stats (orders containing seller's products, dùng index items.seller_id)
+    pipeline = [
+        {"$match": {"items.seller_id": seller_id, "status": {"$ne": "cancelled"}}},
+        {"$group": {"_id": None, "total_orders": {"$sum": 1}, "total_revenue": {"$sum": "$total"}}}
+    ]
+    order_stats = await orders_collection.aggregate(pipeline).to_list(length=1)
+    order_stats = order_stats[0] if order_stats else {}
+    
+    total_orders = order_stats.get("total_orders", 0)
+    total_revenue = order_stats.get("total_revenue", 0)
     
     return {
         "total_products": total_products,
@@ -0,0 +1,146 @@
+"""
+Lưu file upload: giới hạn dung lượng khi nhận body, copy theo chunk ra đĩa trên thread pool, dedup theo hash
+
+- Starlette đọc + spool toàn bộ body multipart trước khi handler chạy, nên giới hạn
+  dung lượng nằm ở UploadSizeLimitMiddleware: từ chối ngay theo Content-Length và
+  đếm byte khi nhận body (request chunked), vượt giới hạn thì dừng đọc và trả 413.
+- Không ghi file (blocking I/O) trên event loop: copy + hash từ file spool ra uploads/
+  chạy trong 1 lần asyncio.to_thread. Kích thước file vẫn được kiểm tra lại khi copy.
+- Tên file = sha256 nội dung + extension, nên upload lại cùng 1 ảnh dùng lại file cũ.
+  File được ghi ra file tạm rồi os.replace nên không bao giờ thấy file ghi dở.
+"""
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+
+UPLOAD_ROOT = "uploads"
+UPLOAD_BASE_URL = os.getenv("UPLOAD_BASE_URL", "http://localhost:8000")
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Route nhận multipart upload (file ảnh) -> áp giới hạn body của UploadSizeLimitMiddleware
+UPLOAD_ROUTES = (
+    "/api/upload/image",
+    "/api/admin/upload/image",
+    "/api/chat/messages",
+    "/api/chat/admin/messages",
+)
+# Body = file + các form field + boundary/header của multipart
+MAX_UPLOAD_BODY_SIZE = MAX_IMAGE_SIZE + 64 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+def _too_large_error(max_size: int, status_code: int = status.HTTP_400_BAD_REQUEST) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=f"File size must be less than {max_size // (1024 * 1024)}MB"
+    )
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware giới hạn body của UPLOAD_ROUTES trước khi Starlette parse multipart
+    - Content-Length vượt giới hạn: trả 413 ngay, không đọc body
+    - Không có Content-Length: đếm byte mỗi lần receive, vượt giới hạn thì raise 413
+      (HTTPException nên FastAPI trả response bình thường) và không đọc tiếp
+    Cần add trước CORSMiddleware để response 413 vẫn có header CORS.
+    """
+
+    def __init__(self, app, max_body_size: int = MAX_UPLOAD_BODY_SIZE, paths=UPLOAD_ROUTES):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            error = _too_large_error(MAX_IMAGE_SIZE, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _too_large_error(MAX_IMAGE_SIZE, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def _file_extension(file: UploadFile) -> str:
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if re.fullmatch(r"\.[a-z0-9]{1,5}", extension):
+        return extension
+    return mimetypes.guess_extension(file.content_type or "") or ""
+
+def _copy_to_disk(source, upload_dir: str, extension: str, max_size: int) -> tuple:
+    """Copy theo chunk + tính sha256 (chạy trên thread), trả về (filename, size, deduplicated)"""
+    os.makedirs(upload_dir, exist_ok=True)
+    temp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        source.seek(0)
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+
+        filename = f"{digest.hexdigest()[:32]}{extension}"
+        file_path = os.path.join(upload_dir, filename)
+        if os.path.exists(file_path):
+            os.remove(temp_path)
+            return filename, size, True
+
+        os.replace(temp_path, file_path)
+        return filename, size, False
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+async def save_upload(file: UploadFile, subdir: str, max_size: int = MAX_IMAGE_SIZE) -> dict:
+    """
+    Lưu file upload vào uploads/{subdir}, trả về {url, filename, size, deduplicated}
+    400 nếu file vượt quá max_size (body quá lớn đã bị UploadSizeLimitMiddleware chặn với 413).
+    """
+    too_large = _too_large_error(max_size)
+
+    # file.size chỉ là gợi ý từ client: dùng để từ chối sớm, vẫn kiểm tra khi copy
+    if file.size is not None and file.size > max_size:
+        raise too_large
+
+    try:
+        filename, size, deduplicated = await asyncio.to_thread(
+            _copy_to_disk, file.file, os.path.join(UPLOAD_ROOT, subdir), _file_extension(file), max_size
+        )
+    except UploadTooLarge:
+        raise too_large
+
+    return {
+        "url": f"{UPLOAD_BASE_URL}/{UPLOAD_ROOT}/{subdir}/{filename}",
+        "filename": filename,
+        "size": size,
+        "deduplicated": deduplicated
+    }
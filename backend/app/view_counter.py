@@ -0,0 +1,72 @@
+"""
+Buffered view counter cho trang chi tiết sản phẩm
+
+get_product chỉ cộng dồn lượt xem trong bộ nhớ; task nền flush định kỳ bằng
+1 bulk_write ($inc theo từng sản phẩm), và flush lần cuối khi shutdown.
+"""
+from pymongo import UpdateOne
+from collections import defaultdict
+from typing import Dict
+import asyncio
+import os
+
+from .database import products_collection
+
+# Chu kỳ flush (giây)
+VIEW_COUNT_FLUSH_INTERVAL = float(os.getenv("VIEW_COUNT_FLUSH_INTERVAL", "5"))
+
+_pending_views: Dict[str, int] = defaultdict(int)
+_flush_task = None
+
+def record_view(product_id: str):
+    """Ghi nhận 1 lượt xem (không chạm DB)"""
+    _pending_views[product_id] += 1
+
+async def flush_view_counts() -> int:
+    """Flush toàn bộ lượt xem đang buffer, trả về số sản phẩm được cập nhật"""
+    global _pending_views
+
+    if not _pending_views:
+        return 0
+
+    # Swap buffer để các request mới ghi vào buffer rỗng trong lúc đang flush
+    batch, _pending_views = _pending_views, defaultdict(int)
+
+    operations = [
+        UpdateOne({"_id": product_id}, {"$inc": {"view_count": count}})
+        for product_id, count in batch.items()
+    ]
+
+    try:
+        await products_collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        # Trả lại buffer để lần flush sau thử lại
+        for product_id, count in batch.items():
+            _pending_views[product_id] += count
+        print(f"[WARNING] Failed to flush view counts: {e}")
+        return 0
+
+    return len(operations)
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(VIEW_COUNT_FLUSH_INTERVAL)
+        await flush_view_counts()
+
+def start_view_counter():
+    """Khởi động task flush định kỳ (gọi ở startup)"""
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+async def stop_view_counter():
+    """Dừng task và flush phần còn lại (gọi ở shutdown)"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_view_counts()
@@ -0,0 +1,57 @@
+"""
+Migration: gắn seller_id vào từng item của các order cũ
+
+Order tạo trước khi có items.seller_id không có field này nên thống kê seller
+(query theo index items.seller_id) sẽ bỏ sót. Script này tra seller_id từ products
+(1 query $in mỗi batch) và ghi lại items bằng bulk_write.
+
+Chạy 1 lần sau khi nâng cấp: python backfill_order_seller_ids.py
+"""
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from app.database import sync_db
+
+orders_collection = sync_db["orders"]
+products_collection = sync_db["products"]
+
+BATCH_SIZE = 500
+
+def _flush(orders: list) -> int:
+    product_ids = list({item.get("product_id") for order in orders for item in order.get("items", [])})
+    sellers = {
+        product["_id"]: product.get("seller_id")
+        for product in products_collection.find({"_id": {"$in": product_ids}}, {"seller_id": 1})
+    }
+
+    operations = []
+    for order in orders:
+        items = order.get("items", [])
+        for item in items:
+            item["seller_id"] = sellers.get(item.get("product_id"))
+        operations.append(UpdateOne({"_id": order["_id"]}, {"$set": {"items": items}}))
+
+    if operations:
+        orders_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def backfill_order_seller_ids():
+    """Backfill items.seller_id cho order cũ và tạo multikey index"""
+
+    updated = 0
+    batch = []
+    for order in orders_collection.find(
+        {"items": {"$elemMatch": {"seller_id": {"$exists": False}}}},
+        {"items": 1}
+    ):
+        batch.append(order)
+        if len(batch) >= BATCH_SIZE:
+            updated += _flush(batch)
+            batch = []
+    if batch:
+        updated += _flush(batch)
+    print(f"[OK] Backfilled items.seller_id on {updated} orders")
+
+    orders_collection.create_index([("items.seller_id", ASCENDING), ("created_at", DESCENDING)])
+    print("[OK] Index (items.seller_id, created_at) ready")
+
+if __name__ == "__main__":
+    backfill_order_seller_ids()
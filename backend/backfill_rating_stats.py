@@ -0,0 +1,16 @@
+"""
+Migration: build rating_stats (sum, count, số review theo sao) cho sản phẩm
+
+Rating sản phẩm được cập nhật incremental bằng $inc vào rating_stats. Sản phẩm có
+review từ trước khi nâng cấp cần build rating_stats 1 lần từ collection reviews,
+nếu không $inc sẽ bắt đầu từ 0 và bỏ qua các review cũ.
+
+Chạy 1 lần sau khi nâng cấp: python backfill_rating_stats.py
+Nên chạy khi backend đang tắt để không lẫn với các cập nhật incremental.
+"""
+from app.database import sync_db
+from app.ratings import rebuild_rating_stats_sync
+
+if __name__ == "__main__":
+    count = rebuild_rating_stats_sync(sync_db)
+    print(f"[OK] Rebuilt rating_stats for {count} products")
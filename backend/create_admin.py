@@ -15,7 +15,7 @@ async def create_admin_user():
     
     # Check if admin already exists
     admin_email = "admin@techmart.com"
-    existing_admin = users_collection.find_one({"email": admin_email})
+    existing_admin = await users_collection.find_one({"email": admin_email})
     
     if existing_admin:
         print(f"✅ Admin user already exists: {admin_email}")
@@ -36,7 +36,7 @@ async def create_admin_user():
         "addresses": []
     }
     
-    users_collection.insert_one(admin_user)
+    await users_collection.insert_one(admin_user)
     
     print("=" * 60)
     print("✅ ADMIN USER CREATED SUCCESSFULLY!")
@@ -2,7 +2,6 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
-import uuid
 
 # Import all routers
 from app.auth import router as auth_router
@@ -16,6 +15,11 @@ from app.analytics import router as analytics_router
 from app.coupons import router as coupons_router
 from app.reviews import router as reviews_router
 from app.chat import router as chat_router
+from app.view_counter import start_view_counter, stop_view_counter
+from app.jobs import start_job_queue, stop_job_queue
+from app.database import start_activity_log_writer, stop_activity_log_writer
+from app.password_pool import stop_password_pool
+from app.uploads import UploadSizeLimitMiddleware
 
 app = FastAPI(
     title="TechMart E-Commerce API",
@@ -37,13 +41,17 @@ ALLOWED_ORIGINS = [
     "http://127.0.0.1:5175",
 ]
 
+# Giới hạn body của route upload trước khi multipart được parse
+# (add trước CORSMiddleware -> nằm bên trong, response 413 vẫn có header CORS)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,  # Enable cookies and auth headers
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor"],  # Credentialed requests không nhận wildcard
     max_age=600,  # Cache preflight requests for 10 minutes
 )
 
@@ -95,7 +103,9 @@ app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 # Add general upload endpoint
 from fastapi import UploadFile, File, HTTPException, Depends
 from app.auth import get_current_user
-import uuid
+from app.uploads import save_upload
+from app.images import generate_renditions, stop_image_pool
+from app.jobs import submit_job
 
 @app.post("/api/upload/image")
 async def upload_image(
@@ -111,39 +121,38 @@ async def upload_image(
             detail="File must be an image"
         )
     
-    # Validate file size (max 5MB)
-    if file.size > 5 * 1024 * 1024:
-        raise HTTPException(
-            status_code=400,
-            detail="File size must be less than 5MB"
-        )
-    
     try:
-        # Create upload directory
-        upload_dir = "uploads/products"
-        os.makedirs(upload_dir, exist_ok=True)
+        # Stream ra đĩa (giới hạn 5MB, dedup theo hash)
+        saved = await save_upload(file, "products")
         
-        # Generate unique filename
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
+        # Thumbnail / medium / large + WebP sinh nền
+        await submit_job(generate_renditions, saved["url"])
         
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Return URL
-        image_url = f"http://localhost:8000/uploads/products/{unique_filename}"
-        
-        return {"url": image_url, "filename": unique_filename}
+        return {"url": saved["url"], "filename": saved["filename"]}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to upload image: {str(e)}"
         )
 
+# Background tasks
+@app.on_event("startup")
+async def startup_event():
+    start_view_counter()
+    start_job_queue()
+    start_activity_log_writer()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_job_queue()
+    stop_image_pool()
+    await stop_view_counter()
+    await stop_activity_log_writer()
+    stop_password_pool()
+
 # Include all routers
 app.include_router(auth_router)  # /api/auth/*
 app.include_router(products_router)  # /api/products/*, /api/categories/*
@@ -0,0 +1,37 @@
+"""
+Migration: chuẩn hóa approval_status cho sản phẩm cũ
+
+Sản phẩm tạo trước khi có luồng duyệt (seed data, admin cũ) không có approval_status
+hoặc bằng null. Script này backfill thành "approved" để query public chỉ cần
+{"approval_status": "approved"} và dùng được compound index
+(approval_status, category_id, created_at).
+
+Chạy 1 lần: python migrate_approval_status.py
+"""
+from pymongo import ASCENDING, DESCENDING
+from app.database import sync_db
+from app.models import ProductApprovalStatus
+
+products_collection = sync_db["products"]
+
+def migrate_approval_status():
+    """Backfill approval_status cho sản phẩm legacy và tạo compound index"""
+    
+    # {"approval_status": None} match cả field không tồn tại lẫn giá trị null
+    result = products_collection.update_many(
+        {"approval_status": None},
+        {"$set": {"approval_status": ProductApprovalStatus.APPROVED.value}}
+    )
+    print(f"[OK] Backfilled approval_status on {result.modified_count} legacy products")
+    
+    products_collection.create_index([
+        ("approval_status", ASCENDING), ("category_id", ASCENDING), ("created_at", DESCENDING)
+    ])
+    print("[OK] Index (approval_status, category_id, created_at) ready")
+    
+    remaining = products_collection.count_documents({"approval_status": None})
+    if remaining:
+        print(f"[WARNING] {remaining} products still have no approval_status")
+
+if __name__ == "__main__":
+    migrate_approval_status()
@@ -1,6 +1,9 @@
 """Script nhanh để tạo nhiều sản phẩm"""
 from datetime import datetime, timedelta
-from app.database import products_collection, categories_collection, get_next_sequence
+from app.database import sync_db, get_next_sequence_sync as get_next_sequence
+
+products_collection = sync_db["products"]
+categories_collection = sync_db["categories"]
 import random
 
 # Dữ liệu sản phẩm theo danh mục
@@ -98,6 +101,7 @@ def create_all():
                 "review_count": random.randint(10, 200),
                 "sold_count": random.randint(50, 1000),
                 "view_count": random.randint(500, 10000),
+                "approval_status": "approved",
                 "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 60)),
                 "updated_at": datetime.utcnow()
             })
@@ -0,0 +1,13 @@
+"""
+Build lại collection order_rollups (số liệu dashboard) từ toàn bộ orders
+
+Chạy lần đầu sau khi nâng cấp, hoặc khi cần đối soát lại số liệu:
+    python rebuild_order_rollups.py
+Nên chạy khi backend đang tắt để không lẫn với các cập nhật incremental.
+"""
+from app.database import sync_db
+from app.rollups import rebuild_rollups_sync
+
+if __name__ == "__main__":
+    count = rebuild_rollups_sync(sync_db)
+    print(f"[OK] Rebuilt order rollups from {count} orders")
@@ -4,7 +4,9 @@ Chạy: python seed_coupons.py
 """
 
 from datetime import datetime, timedelta
-from app.database import coupons_collection, get_next_sequence
+from app.database import sync_db, get_next_sequence_sync as get_next_sequence
+
+coupons_collection = sync_db["coupons"]
 
 def create_sample_coupons():
     """Tạo mã giảm giá mẫu"""
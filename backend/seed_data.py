@@ -4,13 +4,15 @@ Chạy: python seed_data.py
 """
 
 from datetime import datetime, timedelta
-from app.database import (
-    db, users_collection, categories_collection, products_collection,
-    coupons_collection, get_next_sequence
-)
+from app.database import sync_db as db, get_next_sequence_sync as get_next_sequence
 from app.auth import hash_password
 import random
 
+users_collection = db["users"]
+categories_collection = db["categories"]
+products_collection = db["products"]
+coupons_collection = db["coupons"]
+
 def clear_database():
     """Xoa tat ca du lieu cu"""
     print("[INFO] Dang xoa du lieu cu...")
@@ -347,6 +349,7 @@ def create_products(categories):
             "review_count": random.randint(10, 100),
             "sold_count": random.randint(50, 500),
             "view_count": random.randint(1000, 5000),
+            "approval_status": "approved",
             "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 30)),
             "updated_at": datetime.utcnow()
         }
@@ -418,6 +421,7 @@ def create_products(categories):
             "review_count": random.randint(5, 50),
             "sold_count": random.randint(20, 200),
             "view_count": random.randint(500, 3000),
+            "approval_status": "approved",
             "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 30)),
             "updated_at": datetime.utcnow()
         }
@@ -481,6 +485,7 @@ def create_products(categories):
             "review_count": random.randint(20, 150),
             "sold_count": random.randint(100, 1000),
             "view_count": random.randint(2000, 8000),
+            "approval_status": "approved",
             "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 30)),
             "updated_at": datetime.utcnow()
         }
@@ -601,6 +606,7 @@ def create_products(categories):
                 "review_count": random.randint(5, 200),
                 "sold_count": random.randint(10, 1000),
                 "view_count": random.randint(100, 10000),
+                "approval_status": "approved",
                 "created_at": datetime.utcnow() - timedelta(days=random.randint(1, 60)),
                 "updated_at": datetime.utcnow()
             }
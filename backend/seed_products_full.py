@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta, UTC
-from app.database import products_collection, categories_collection, get_next_sequence
+from app.database import sync_db, get_next_sequence_sync as get_next_sequence
+
+products_collection = sync_db["products"]
+categories_collection = sync_db["categories"]
 import random
 
 # Danh sách sản phẩm chi tiết cho từng danh mục
@@ -360,6 +363,7 @@ def create_products_from_data():
                 "review_count": random.randint(10, 200),
                 "sold_count": random.randint(50, 1000),
                 "view_count": random.randint(500, 10000),
+                "approval_status": "approved",
                 "created_at": datetime.now(UTC) - timedelta(days=random.randint(1, 60)),
                 "updated_at": datetime.now(UTC)
             }
@@ -0,0 +1,22 @@
+"""
+Test không cần MongoDB thật: app.database kết nối + tạo collection ngay khi import,
+nên thay client bằng mongomock (pip install mongomock mongomock-motor) nếu có cài.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import mongomock
+    import mongomock_motor
+    import motor.motor_asyncio
+    import pymongo
+
+    _mock_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: _mock_client
+    motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: mongomock_motor.AsyncMongoMockClient(
+        mock_mongo_client=_mock_client
+    )
+except ImportError:
+    print("[WARNING] mongomock not installed, tests need a running MongoDB")
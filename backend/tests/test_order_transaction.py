@@ -0,0 +1,152 @@
+"""
+Checkout transaction: retry khi commit gặp TransientTransactionError (write conflict),
+không retry khi hết hàng, sinh lại order number khi trùng
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app import orders, rollups
+
+
+class FakeSession:
+    def __init__(self, transient_commit_failures=0):
+        self.in_transaction = False
+        self.transactions_started = 0
+        self.commits = 0
+        self.aborts = 0
+        self._transient_commit_failures = transient_commit_failures
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self):
+        self.in_transaction = True
+        self.transactions_started += 1
+
+    async def commit_transaction(self):
+        if self._transient_commit_failures:
+            self._transient_commit_failures -= 1
+            self.in_transaction = False
+            raise OperationFailure(
+                "WriteConflict", code=112,
+                details={"errorLabels": ["TransientTransactionError"]}
+            )
+        self.in_transaction = False
+        self.commits += 1
+
+    async def abort_transaction(self):
+        self.in_transaction = False
+        self.aborts += 1
+
+
+class FakeClient:
+    def __init__(self, session):
+        self.session = session
+
+    async def start_session(self):
+        return self.session
+
+
+class FakeBulkResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeCollection:
+    def __init__(self, matched_count=None):
+        self.inserted = []
+        self.bulk_sessions = []
+        self.matched_count = matched_count
+
+    async def bulk_write(self, ops, ordered=True, session=None):
+        self.bulk_sessions.append(session)
+        matched = len(ops) if self.matched_count is None else self.matched_count
+        return FakeBulkResult(matched)
+
+    async def insert_one(self, document, session=None):
+        self.inserted.append(document)
+
+    async def update_one(self, *args, session=None, **kwargs):
+        return None
+
+
+def setup_checkout(monkeypatch, session, products):
+    orders_collection = FakeCollection()
+    monkeypatch.setattr(orders, "client", FakeClient(session))
+    monkeypatch.setattr(orders, "products_collection", products)
+    monkeypatch.setattr(orders, "orders_collection", orders_collection)
+    monkeypatch.setattr(orders, "coupons_collection", FakeCollection())
+    monkeypatch.setattr(orders, "carts_collection", FakeCollection())
+    monkeypatch.setattr(rollups, "order_rollups_collection", FakeCollection())
+    return orders_collection
+
+
+def test_rollup_is_written_inside_checkout_transaction(monkeypatch):
+    session = FakeSession()
+    setup_checkout(monkeypatch, session, FakeCollection())
+    order = {"_id": "order_1", "user_id": "user_1", "total": 1000, "items": [{"quantity": 1}],
+             "created_at": datetime(2026, 1, 1, 9, 30)}
+
+    asyncio.run(orders.place_order_transactional(order, {"prod_1": 1}, None))
+
+    assert rollups.order_rollups_collection.bulk_sessions == [session]
+    assert session.commits == 1
+
+
+def test_transient_commit_error_is_retried(monkeypatch):
+    session = FakeSession(transient_commit_failures=1)
+    orders_collection = setup_checkout(monkeypatch, session, FakeCollection())
+    order = {"_id": "order_1", "user_id": "user_1"}
+
+    asyncio.run(orders.place_order_transactional(order, {"prod_1": 1}, "coupon_1"))
+
+    assert session.transactions_started == 2
+    assert session.commits == 1
+    assert orders_collection.inserted[-1] is order
+
+
+def test_stock_shortage_aborts_without_retry(monkeypatch):
+    session = FakeSession()
+    orders_collection = setup_checkout(monkeypatch, session, FakeCollection(matched_count=0))
+
+    async def shortage(quantities):
+        return HTTPException(status_code=400, detail="Not enough stock")
+    monkeypatch.setattr(orders, "stock_shortage_error", shortage)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(orders.place_order_transactional({"_id": "order_1", "user_id": "user_1"}, {"prod_1": 1}, None))
+
+    assert exc_info.value.status_code == 400
+    assert session.transactions_started == 1
+    assert session.aborts == 1
+    assert session.commits == 0
+    assert orders_collection.inserted == []
+
+
+def test_duplicate_order_number_is_regenerated(monkeypatch):
+    session = FakeSession()
+    orders_collection = setup_checkout(monkeypatch, session, FakeCollection())
+    taken = {"ORD202601010000000010000"}
+    numbers = iter(["ORD202601010000000010000", "ORD202601010000000010001"])
+    monkeypatch.setattr(orders, "generate_order_number", lambda: next(numbers))
+
+    async def insert_one(document, session=None):
+        if document["order_number"] in taken:
+            raise DuplicateKeyError("E11000 duplicate key error")
+        orders_collection.inserted.append(dict(document))
+    orders_collection.insert_one = insert_one
+
+    order = {"user_id": "user_1"}
+    orders.assign_order_number(order)
+    asyncio.run(orders.place_order_transactional(order, {"prod_1": 1}, None))
+
+    assert session.transactions_started == 2
+    assert session.aborts == 1
+    assert orders_collection.inserted[-1]["_id"] == "order_202601010000000010001"
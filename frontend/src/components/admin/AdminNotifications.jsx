@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { FaBell, FaTimes, FaShoppingCart, FaCheckCircle } from 'react-icons/fa'
-import api from '../../services/api'
+import { notificationService } from '../../services/notificationService'
 import { toast } from 'react-hot-toast'
 
 const AdminNotifications = () => {
@@ -11,7 +11,6 @@ const AdminNotifications = () => {
   const [isLoading, setIsLoading] = useState(false)
   const dropdownRef = useRef(null)
   const audioRef = useRef(null)
-  const previousUnreadCountRef = useRef(0)
   const navigate = useNavigate()
 
   // Play notification sound
@@ -42,46 +41,12 @@ const AdminNotifications = () => {
   const fetchNotifications = async () => {
     try {
       setIsLoading(true)
-      const [notificationsRes, countRes] = await Promise.all([
-        api.get('/notifications', { params: { limit: 20, unread_only: false } }),
-        api.get('/notifications/unread-count')
+      const [newNotifications, newUnreadCount] = await Promise.all([
+        notificationService.getNotifications({ limit: 20, unread_only: false }),
+        notificationService.getUnreadCount()
       ])
-      
-      const newNotifications = notificationsRes.data || []
-      const newUnreadCount = countRes.data?.unread_count || 0
-      
-      // Check if there's a new notification (unread count increased)
-      if (newUnreadCount > previousUnreadCountRef.current && previousUnreadCountRef.current > 0) {
-        // New notification arrived!
-        playNotificationSound()
-        
-        // Show toast for new order notifications
-        const newNotifs = newNotifications.filter(n => !n.is_read && n.type === 'order')
-        if (newNotifs.length > 0) {
-          const latest = newNotifs[0]
-          toast.success(
-            <div>
-              <div className="font-bold">🆕 {latest.title}</div>
-              <div className="text-sm">{latest.message}</div>
-            </div>,
-            {
-              duration: 5000,
-              position: 'top-right',
-              style: {
-                background: 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)',
-                color: 'white',
-                borderRadius: '12px',
-                padding: '16px',
-                boxShadow: '0 10px 25px rgba(0,0,0,0.2)'
-              }
-            }
-          )
-        }
-      }
-      
       setNotifications(newNotifications)
       setUnreadCount(newUnreadCount)
-      previousUnreadCountRef.current = newUnreadCount
     } catch (error) {
       console.error('Error fetching notifications:', error)
     } finally {
@@ -89,23 +54,45 @@ const AdminNotifications = () => {
     }
   }
 
-  // Real-time polling
-  useEffect(() => {
-    fetchNotifications()
-    
-    // Poll every 3 seconds for real-time updates
-    const interval = setInterval(fetchNotifications, 3000)
+  // New notification pushed by the server
+  const handleNewNotification = ({ notification, unread_delta }) => {
+    setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)].slice(0, 20))
+    setUnreadCount(count => count + unread_delta)
+    playNotificationSound()
     
-    // Listen for order placement events
-    const handleOrderPlaced = () => {
-      setTimeout(fetchNotifications, 1000)
+    // Show toast for new order notifications
+    if (notification.type === 'order') {
+      toast.success(
+        <div>
+          <div className="font-bold">🆕 {notification.title}</div>
+          <div className="text-sm">{notification.message}</div>
+        </div>,
+        {
+          duration: 5000,
+          position: 'top-right',
+          style: {
+            background: 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)',
+            color: 'white',
+            borderRadius: '12px',
+            padding: '16px',
+            boxShadow: '0 10px 25px rgba(0,0,0,0.2)'
+          }
+        }
+      )
     }
-    window.addEventListener('orderPlaced', handleOrderPlaced)
+  }
+
+  // Real-time updates qua SSE (server push, không polling)
+  useEffect(() => {
+    fetchNotifications()
     
-    return () => {
-      clearInterval(interval)
-      window.removeEventListener('orderPlaced', handleOrderPlaced)
-    }
+    return notificationService.subscribe({
+      onNotification: handleNewNotification,
+      onUnreadCount: ({ unread_count, unread_delta }) => {
+        setUnreadCount(count => unread_count !== undefined ? unread_count : Math.max(0, count + unread_delta))
+      },
+      onResync: fetchNotifications
+    })
   }, [])
 
   // Close dropdown when clicking outside
@@ -125,8 +112,9 @@ const AdminNotifications = () => {
   // Mark notification as read
   const markAsRead = async (notificationId) => {
     try {
-      await api.patch(`/notifications/${notificationId}/read`)
-      fetchNotifications()
+      await notificationService.markAsRead(notificationId)
+      // Unread count giảm qua notification stream
+      setNotifications(prev => prev.map(n => n.id === notificationId ? { ...n, is_read: true } : n))
     } catch (error) {
       console.error('Error marking notification as read:', error)
     }
@@ -137,9 +125,9 @@ const AdminNotifications = () => {
     try {
       const unreadNotifs = notifications.filter(n => !n.is_read)
       await Promise.all(
-        unreadNotifs.map(n => api.patch(`/notifications/${n.id}/read`))
+        unreadNotifs.map(n => notificationService.markAsRead(n.id))
       )
-      fetchNotifications()
+      setNotifications(prev => prev.map(n => ({ ...n, is_read: true })))
       toast.success('Đã đánh dấu tất cả đã đọc')
     } catch (error) {
       console.error('Error marking all as read:', error)
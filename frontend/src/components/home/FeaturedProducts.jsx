@@ -158,7 +158,7 @@ const FeaturedProducts = () => {
               <Link to={`/products/${product.id}`} className="block">
                 <div className="relative h-80 overflow-hidden rounded-t-2xl bg-gray-100">
                   <img
-                    src={primaryImage?.url || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80'}
+                    src={primaryImage?.display_url || primaryImage?.url || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80'}
                     alt={product.name}
                     className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-500"
                     onError={(e) => {
@@ -4,8 +4,8 @@ import { FaSearch, FaShoppingCart, FaUser, FaBars, FaTimes, FaHeart, FaBell, FaS
 import { useAuth } from '../../contexts/AuthContext'
 import { useCart } from '../../contexts/CartContext'
 import { ROUTES } from '../../utils/constants'
-import api from '../../services/api'
 import { productService } from '../../services/productService'
+import { notificationService } from '../../services/notificationService'
 
 const Header = () => {
   const [isMenuOpen, setIsMenuOpen] = useState(false)
@@ -64,53 +64,24 @@ const Header = () => {
     }
   }
 
-  // Fetch notifications with sound detection
+  // Realtime notifications qua SSE (server push, không polling)
   useEffect(() => {
     if (isAuthenticated() && user) {
-      let previousUnreadCount = 0
+      notificationService.getNotifications({ limit: 20 })
+        .then(setNotifications)
+        .catch((error) => console.error('Error fetching notifications:', error))
       
-      const fetchWithSoundCheck = async () => {
-        const oldCount = previousUnreadCount
-        const [notificationsRes, countRes] = await Promise.all([
-          api.get('/notifications', { params: { limit: 20 } }),
-          api.get('/notifications/unread-count')
-        ])
-        const newNotifications = notificationsRes.data || []
-        const newUnreadCount = countRes.data?.unread_count || 0
-        
-        // Check if new notification arrived (unread count increased)
-        if (newUnreadCount > oldCount && oldCount >= 0) {
+      return notificationService.subscribe({
+        onNotification: ({ notification, unread_delta }) => {
+          setNotifications(prev => [notification, ...prev.filter(n => n.id !== notification.id)].slice(0, 20))
+          setUnreadCount(count => count + unread_delta)
           playNotificationSound()
-        }
-        
-        setNotifications(newNotifications)
-        setUnreadCount(newUnreadCount)
-        previousUnreadCount = newUnreadCount
-      }
-      
-      fetchWithSoundCheck()
-      const interval = setInterval(fetchWithSoundCheck, 5000) // Refresh every 5 seconds for real-time
-      
-      // Listen for order placement event to refresh notifications immediately
-      const handleOrderPlaced = () => {
-        console.log('🔄 Order placed, refreshing notifications...')
-        let retries = 0
-        const maxRetries = 5
-        const checkNotifications = () => {
-          retries++
-          fetchWithSoundCheck()
-          if (retries < maxRetries) {
-            setTimeout(checkNotifications, 1000)
-          }
-        }
-        setTimeout(checkNotifications, 500)
-      }
-      window.addEventListener('orderPlaced', handleOrderPlaced)
-      
-      return () => {
-        clearInterval(interval)
-        window.removeEventListener('orderPlaced', handleOrderPlaced)
-      }
+        },
+        onUnreadCount: ({ unread_count, unread_delta }) => {
+          setUnreadCount(count => unread_count !== undefined ? unread_count : Math.max(0, count + unread_delta))
+        },
+        onResync: () => fetchNotifications()
+      })
     } else {
       // Clear notifications if logged out
       setNotifications([])
@@ -122,15 +93,12 @@ const Header = () => {
     if (!isAuthenticated() || !user) return
     
     try {
-      const [notificationsRes, countRes] = await Promise.all([
-        api.get('/notifications', { params: { limit: 10 } }),
-        api.get('/notifications/unread-count')
+      const [newNotifications, newUnreadCount] = await Promise.all([
+        notificationService.getNotifications({ limit: 20 }),
+        notificationService.getUnreadCount()
       ])
-      console.log('📬 Fetched notifications:', notificationsRes.data.length)
-      console.log('📊 Unread count:', countRes.data.unread_count)
-      console.log('📋 Notifications:', notificationsRes.data)
-      setNotifications(notificationsRes.data || [])
-      setUnreadCount(countRes.data?.unread_count || 0)
+      setNotifications(newNotifications)
+      setUnreadCount(newUnreadCount)
     } catch (error) {
       console.error('Error fetching notifications:', error)
       // Don't show toast on every fetch, only log
@@ -138,10 +106,10 @@ const Header = () => {
   }
 
   const handleNotificationClick = async (notification) => {
-    // Mark as read
+    // Mark as read (unread count giảm qua notification stream)
     try {
-      await api.patch(`/notifications/${notification.id}/read`)
-      fetchNotifications()
+      await notificationService.markAsRead(notification.id)
+      setNotifications(prev => prev.map(n => n.id === notification.id ? { ...n, is_read: true } : n))
     } catch (error) {
       console.error('Error marking notification as read:', error)
     }
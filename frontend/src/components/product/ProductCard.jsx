@@ -25,6 +25,7 @@ const ProductCard = ({ product, viewMode = "grid" }) => {
   const id = product.id;
   const name = product.name;
   const image =
+    product.images?.[0]?.display_url ||
     product.images?.[0]?.url ||
     product.image ||
     "https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80";
@@ -117,7 +117,7 @@ const QuickAddModal = ({ product, isOpen, onClose }) => {
                 {/* Main Image */}
                 <div className="relative aspect-square rounded-2xl overflow-hidden bg-gray-100 mb-4">
                   <img
-                    src={product.images?.[selectedImage]?.url || product.image || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80'}
+                    src={product.images?.[selectedImage]?.display_url || product.images?.[selectedImage]?.url || product.image || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80'}
                     alt={product.name}
                     className="w-full h-full object-cover"
                     onError={(e) => {
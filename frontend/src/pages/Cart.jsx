@@ -256,6 +256,7 @@ const Cart = () => {
                       >
                         <img
                           src={
+                            item.images?.[0]?.display_url ||
                             item.images?.[0]?.url ||
                             item.image ||
                             "https://images.unsplash.com/photo-1505740420928-5e560c06d30e"
@@ -15,7 +15,6 @@ const Chat = () => {
   const [sending, setSending] = useState(false);
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
-  const pollIntervalRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -42,25 +41,27 @@ const Chat = () => {
     loadChat();
   }, [isAuthenticated]);
 
+  // Realtime: tin nhắn mới được server push qua WebSocket (không polling)
   useEffect(() => {
     if (!conversation) return;
 
-    pollIntervalRef.current = setInterval(async () => {
-      try {
-        const msgs = await chatService.getMessages(conversation.id);
-        if (msgs.length > messages.length) {
+    return chatService.connectSocket({
+      onMessage: (message) => {
+        if (message.conversation_id !== conversation.id) return;
+        setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+        scrollToBottom();
+      },
+      onReconnect: async () => {
+        try {
+          const msgs = await chatService.getMessages(conversation.id);
           setMessages(msgs);
           scrollToBottom();
+        } catch (error) {
+          console.error('Error reloading messages:', error);
         }
-      } catch (error) {
-        console.error('Error polling messages:', error);
       }
-    }, 3000);
-
-    return () => {
-      if (pollIntervalRef.current) clearInterval(pollIntervalRef.current);
-    };
-  }, [conversation, messages.length]);
+    });
+  }, [conversation]);
 
   const handleImageSelect = (e) => {
     const file = e.target.files[0];
@@ -102,7 +103,8 @@ const Chat = () => {
         selectedImage
       );
 
-      setMessages(prev => prev.map(m => 
+      // Tin nhắn có thể đã tới qua WebSocket trước khi request trả về
+      setMessages(prev => prev.filter(m => m.id !== sent.id).map(m => 
         m.id === tempMessage.id ? { ...sent, sending: false } : m
       ));
 
@@ -218,7 +218,7 @@ const ProductDetail = () => {
   };
 
   const productImages = product.images?.length > 0 
-    ? product.images.map(img => img.url)
+    ? product.images.map(img => img.display_url || img.url)
     : ['https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=800&q=80'];
 
   return (
@@ -631,7 +631,7 @@ const ProductDetail = () => {
             <h2 className="text-3xl font-black text-gray-900 mb-8">Sản Phẩm Liên Quan</h2>
             <div className="grid grid-cols-2 md:grid-cols-4 gap-6">
               {displayRelatedProducts.map((relatedProduct) => {
-                const relatedImage = relatedProduct.images?.[0]?.url || relatedProduct.image || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=400&q=80';
+                const relatedImage = relatedProduct.images?.[0]?.display_url || relatedProduct.images?.[0]?.url || relatedProduct.image || 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=400&q=80';
                 return (
                   <Link
                     key={relatedProduct.id}
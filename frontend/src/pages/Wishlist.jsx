@@ -136,7 +136,7 @@ const Wishlist = () => {
         {/* Products Grid */}
         <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-3 gap-3 md:gap-6">
           {products.map((product) => {
-            const productImage = product.images?.[0]?.url || 
+            const productImage = product.images?.[0]?.display_url || product.images?.[0]?.url || 
                                 product.images?.[0] || 
                                 'https://images.unsplash.com/photo-1505740420928-5e560c06d30e?w=400&q=80';
             
@@ -14,52 +14,60 @@ const AdminChat = () => {
   const [sending, setSending] = useState(false);
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
-  const convPollRef = useRef(null);
-  const msgPollRef = useRef(null);
+  const selectedConvRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  // Load conversations
-  useEffect(() => {
-    const loadConversations = async () => {
-      try {
-        const convs = await chatService.adminGetConversations();
-        setConversations(convs);
-      } catch (error) {
-        console.error('Error loading conversations:', error);
-      }
-    };
+  const loadConversations = async () => {
+    try {
+      const convs = await chatService.adminGetConversations();
+      setConversations(convs);
+    } catch (error) {
+      console.error('Error loading conversations:', error);
+    }
+  };
 
+  const loadMessages = async (conversationId) => {
+    try {
+      const msgs = await chatService.adminGetMessages(conversationId);
+      setMessages(msgs);
+      scrollToBottom();
+    } catch (error) {
+      console.error('Error loading messages:', error);
+    }
+  };
+
+  // Load conversations + nhận tin nhắn mới của mọi conversation qua WebSocket (không polling)
+  useEffect(() => {
     loadConversations();
-    convPollRef.current = setInterval(loadConversations, 5000);
 
-    return () => {
-      if (convPollRef.current) clearInterval(convPollRef.current);
-    };
+    return chatService.connectSocket({
+      onMessage: async (message) => {
+        const current = selectedConvRef.current;
+        if (current && message.conversation_id === current.id) {
+          setMessages(prev => prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+          scrollToBottom();
+          // Đang mở conversation: tải lại để server đánh dấu tin nhắn của user là đã đọc
+          if (message.sender_role !== 'admin') await loadMessages(current.id);
+        }
+        // Tin nhắn mới cập nhật last message / unread count của danh sách
+        loadConversations();
+      },
+      onReconnect: () => {
+        loadConversations();
+        if (selectedConvRef.current) loadMessages(selectedConvRef.current.id);
+      }
+    });
   }, []);
 
   // Load messages for selected conversation
   useEffect(() => {
+    selectedConvRef.current = selectedConv;
     if (!selectedConv) return;
 
-    const loadMessages = async () => {
-      try {
-        const msgs = await chatService.adminGetMessages(selectedConv.id);
-        setMessages(msgs);
-        scrollToBottom();
-      } catch (error) {
-        console.error('Error loading messages:', error);
-      }
-    };
-
-    loadMessages();
-    msgPollRef.current = setInterval(loadMessages, 3000);
-
-    return () => {
-      if (msgPollRef.current) clearInterval(msgPollRef.current);
-    };
+    loadMessages(selectedConv.id);
   }, [selectedConv]);
 
   // Handle image selection
@@ -106,7 +114,8 @@ const AdminChat = () => {
         selectedImage
       );
 
-      setMessages(prev => prev.map(m => 
+      // Tin nhắn có thể đã tới qua WebSocket trước khi request trả về
+      setMessages(prev => prev.filter(m => m.id !== sent.id).map(m => 
         m.id === tempMessage.id ? { ...sent, sending: false } : m
       ));
 
@@ -1,4 +1,8 @@
 import api from './api';
+import { API_BASE_URL, STORAGE_KEYS } from '../utils/constants';
+
+const SOCKET_PING_INTERVAL = 25000;
+const SOCKET_RECONNECT_DELAY = 3000;
 
 export const chatService = {
   // Get or create conversation
@@ -72,5 +76,55 @@ export const chatService = {
       { params: { status } }
     );
     return response.data;
+  },
+
+  // Realtime: WebSocket /chat/ws, server push { type: 'message', message } khi có tin nhắn mới.
+  // Tự kết nối lại khi mất kết nối; onReconnect để tải lại tin nhắn bị lỡ. Trả về hàm đóng socket.
+  connectSocket: ({ onMessage, onReconnect }) => {
+    const token = localStorage.getItem(STORAGE_KEYS.AUTH_TOKEN);
+    if (!token) return () => {};
+
+    const url = `${API_BASE_URL.replace(/^http/, 'ws')}/chat/ws?token=${encodeURIComponent(token)}`;
+    let socket = null;
+    let pingTimer = null;
+    let reconnectTimer = null;
+    let closed = false;
+    let connectedBefore = false;
+
+    const connect = () => {
+      socket = new WebSocket(url);
+
+      socket.onopen = () => {
+        if (connectedBefore) onReconnect?.();
+        connectedBefore = true;
+        pingTimer = setInterval(() => {
+          if (socket.readyState === WebSocket.OPEN) socket.send('ping');
+        }, SOCKET_PING_INTERVAL);
+      };
+
+      socket.onmessage = (event) => {
+        if (event.data === 'pong') return;
+        try {
+          const payload = JSON.parse(event.data);
+          if (payload.type === 'message') onMessage?.(payload.message);
+        } catch (error) {
+          console.error('Invalid chat socket payload:', error);
+        }
+      };
+
+      socket.onclose = () => {
+        clearInterval(pingTimer);
+        if (!closed) reconnectTimer = setTimeout(connect, SOCKET_RECONNECT_DELAY);
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearInterval(pingTimer);
+      clearTimeout(reconnectTimer);
+      socket?.close();
+    };
   }
 };
@@ -0,0 +1,55 @@
+import api from './api'
+import { API_BASE_URL, STORAGE_KEYS } from '../utils/constants'
+
+export const notificationService = {
+  // Get notifications
+  getNotifications: async (params = {}) => {
+    const response = await api.get('/notifications', { params })
+    return response.data || []
+  },
+
+  // Get unread count
+  getUnreadCount: async () => {
+    const response = await api.get('/notifications/unread-count')
+    return response.data?.unread_count || 0
+  },
+
+  // Mark notification as read
+  markAsRead: async (notificationId) => {
+    const response = await api.patch(`/notifications/${notificationId}/read`)
+    return response.data
+  },
+
+  // Realtime: SSE /notifications/stream (thay cho polling unread-count)
+  //   onNotification({ notification, unread_delta }) khi có thông báo mới
+  //   onUnreadCount({ unread_count } | { unread_delta }) khi mới kết nối / đọc / xóa thông báo
+  //   onResync() khi server bỏ bớt event hoặc vừa kết nối lại: cần tải lại danh sách
+  // EventSource tự kết nối lại khi mất kết nối. Trả về hàm đóng stream.
+  subscribe: ({ onNotification, onUnreadCount, onResync }) => {
+    const token = localStorage.getItem(STORAGE_KEYS.AUTH_TOKEN)
+    if (!token || typeof EventSource === 'undefined') return () => {}
+
+    const source = new EventSource(`${API_BASE_URL}/notifications/stream?token=${encodeURIComponent(token)}`)
+    let connectedBefore = false
+
+    const listen = (event, handler) => {
+      source.addEventListener(event, (e) => {
+        try {
+          handler?.(JSON.parse(e.data))
+        } catch (error) {
+          console.error('Invalid notification stream payload:', error)
+        }
+      })
+    }
+
+    source.onopen = () => {
+      if (connectedBefore) onResync?.()
+      connectedBefore = true
+    }
+    listen('notification', onNotification)
+    listen('unread_count', onUnreadCount)
+    listen('resync', () => onResync?.())
+
+    return () => source.close()
+  }
+}